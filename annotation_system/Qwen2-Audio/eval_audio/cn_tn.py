@@ -933,20 +933,31 @@ class Percentage:
         return '百分之' + num2chn(self.percentage.strip().strip('%'))
 
 
+# patterns of normalize_nsw, compiled once
+DATE_PATTERN = re.compile(r"\D+((([089]\d|(19|20)\d{2})年)?(\d{1,2}月(\d{1,2}[日号])?)?)")
+MONEY_PATTERN = re.compile(r"\D+((\d+(\.\d+)?)[多余几]?" + CURRENCY_UNITS + r"(\d" + CURRENCY_UNITS + r"?)?)")
+MOBILE_PHONE_PATTERN = re.compile(r"\D((\+?86 ?)?1([38]\d|5[0-35-9]|7[678]|9[89])\d{8})\D")
+FIXED_PHONE_PATTERN = re.compile(r"\D((0(10|2[1-3]|[3-9]\d{2})-?)?[1-9]\d{6,7})\D")
+FRACTION_PATTERN = re.compile(r"(\d+/\d+)")
+PERCENTAGE_PATTERN = re.compile(r"(\d+(\.\d+)?%)")
+QUANTIFIER_PATTERN = re.compile(r"(\d+(\.\d+)?)[多余几]?" + COM_QUANTIFIERS)
+DIGIT_PATTERN = re.compile(r"(\d{4,32})")
+CARDINAL_PATTERN = re.compile(r"(\d+(\.\d+)?)")
+PARTICULAR_PATTERN = re.compile(r"(([a-zA-Z]+)二([a-zA-Z]+))")
+
+
 def normalize_nsw(raw_text):
     text = '^' + raw_text + '$'
 
     # 规范化日期
-    pattern = re.compile(r"\D+((([089]\d|(19|20)\d{2})年)?(\d{1,2}月(\d{1,2}[日号])?)?)")
-    matchers = pattern.findall(text)
+    matchers = DATE_PATTERN.findall(text)
     if matchers:
         #print('date')
         for matcher in matchers:
             text = text.replace(matcher[0], Date(date=matcher[0]).date2chntext(), 1)
 
     # 规范化金钱
-    pattern = re.compile(r"\D+((\d+(\.\d+)?)[多余几]?" + CURRENCY_UNITS + r"(\d" + CURRENCY_UNITS + r"?)?)")
-    matchers = pattern.findall(text)
+    matchers = MONEY_PATTERN.findall(text)
     if matchers:
         #print('money')
         for matcher in matchers:
@@ -958,23 +969,20 @@ def normalize_nsw(raw_text):
     # 移动：139、138、137、136、135、134、159、158、157、150、151、152、188、187、182、183、184、178、198
     # 联通：130、131、132、156、155、186、185、176
     # 电信：133、153、189、180、181、177
-    pattern = re.compile(r"\D((\+?86 ?)?1([38]\d|5[0-35-9]|7[678]|9[89])\d{8})\D")
-    matchers = pattern.findall(text)
+    matchers = MOBILE_PHONE_PATTERN.findall(text)
     if matchers:
         #print('telephone')
         for matcher in matchers:
             text = text.replace(matcher[0], TelePhone(telephone=matcher[0]).telephone2chntext(), 1)
     # 固话
-    pattern = re.compile(r"\D((0(10|2[1-3]|[3-9]\d{2})-?)?[1-9]\d{6,7})\D")
-    matchers = pattern.findall(text)
+    matchers = FIXED_PHONE_PATTERN.findall(text)
     if matchers:
         # print('fixed telephone')
         for matcher in matchers:
             text = text.replace(matcher[0], TelePhone(telephone=matcher[0]).telephone2chntext(fixed=True), 1)
 
     # 规范化分数
-    pattern = re.compile(r"(\d+/\d+)")
-    matchers = pattern.findall(text)
+    matchers = FRACTION_PATTERN.findall(text)
     if matchers:
         #print('fraction')
         for matcher in matchers:
@@ -982,32 +990,28 @@ def normalize_nsw(raw_text):
 
     # 规范化百分数
     text = text.replace('％', '%')
-    pattern = re.compile(r"(\d+(\.\d+)?%)")
-    matchers = pattern.findall(text)
+    matchers = PERCENTAGE_PATTERN.findall(text)
     if matchers:
         #print('percentage')
         for matcher in matchers:
             text = text.replace(matcher[0], Percentage(percentage=matcher[0]).percentage2chntext(), 1)
 
     # 规范化纯数+量词
-    pattern = re.compile(r"(\d+(\.\d+)?)[多余几]?" + COM_QUANTIFIERS)
-    matchers = pattern.findall(text)
+    matchers = QUANTIFIER_PATTERN.findall(text)
     if matchers:
         #print('cardinal+quantifier')
         for matcher in matchers:
             text = text.replace(matcher[0], Cardinal(cardinal=matcher[0]).cardinal2chntext(), 1)
 
     # 规范化数字编号
-    pattern = re.compile(r"(\d{4,32})")
-    matchers = pattern.findall(text)
+    matchers = DIGIT_PATTERN.findall(text)
     if matchers:
         #print('digit')
         for matcher in matchers:
             text = text.replace(matcher, Digit(digit=matcher).digit2chntext(), 1)
 
     # 规范化纯数
-    pattern = re.compile(r"(\d+(\.\d+)?)")
-    matchers = pattern.findall(text)
+    matchers = CARDINAL_PATTERN.findall(text)
     if matchers:
         #print('cardinal')
         for matcher in matchers:
@@ -1015,8 +1019,7 @@ def normalize_nsw(raw_text):
 
 
     # restore P2P, O2O, B2C, B2B etc
-    pattern = re.compile(r"(([a-zA-Z]+)二([a-zA-Z]+))")
-    matchers = pattern.findall(text)
+    matchers = PARTICULAR_PATTERN.findall(text)
     if matchers:
         # print('particular')
         for matcher in matchers:
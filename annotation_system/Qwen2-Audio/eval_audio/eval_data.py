@@ -0,0 +1,185 @@
+import io
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import librosa
+import numpy as np
+import requests
+import soundfile as sf
+import torch
+from transformers.pipelines.audio_utils import ffmpeg_read
+
+
+def read_audio(audio_path):
+    if audio_path.startswith("http://") or audio_path.startswith("https://"):
+        # We need to actually check for a real protocol, otherwise it's impossible to use a local file
+        # like http_huggingface_co.png
+        inputs = requests.get(audio_path).content
+    else:
+        with open(audio_path, "rb") as f:
+            inputs = f.read()
+    return inputs
+
+
+def load_audio(audio_path, sampling_rate):
+    """Mono float32 waveform at sampling_rate, decoded in process.
+
+    Formats libsndfile cannot read fall back to an ffmpeg subprocess.
+    """
+    inputs = read_audio(audio_path)
+    try:
+        wav, sr = sf.read(io.BytesIO(inputs), dtype='float32', always_2d=True)
+    except Exception:
+        return ffmpeg_read(inputs, sampling_rate=sampling_rate)
+    wav = wav.mean(axis=1)
+    if sr != sampling_rate:
+        wav = librosa.resample(wav, orig_sr=sr, target_sr=sampling_rate)
+    return wav
+
+
+def audio_duration(audio_path):
+    """Duration in seconds, from the header when libsndfile can read it."""
+    try:
+        if not audio_path.startswith(("http://", "https://")):
+            return sf.info(audio_path).duration
+    except Exception:
+        pass
+    return len(load_audio(audio_path, 16000)) / 16000
+
+
+def build_index(path, num_workers=16):
+    """Byte offset of every line of a jsonl file and the duration of its audio.
+
+    Cached in a sidecar <path>.index.json, rebuilt when the jsonl file changes.
+    """
+    index_path = path + '.index.json'
+    stat = os.stat(path)
+    if os.path.exists(index_path):
+        with open(index_path) as f:
+            index = json.load(f)
+        if index['size'] == stat.st_size and index['mtime'] == stat.st_mtime:
+            return index
+
+    offsets, audios = [], []
+    with open(path, 'rb') as f:
+        offset = 0
+        for line in f:
+            if line.strip():
+                offsets.append(offset)
+                audios.append(json.loads(line)['audio'])
+            offset += len(line)
+    with ThreadPoolExecutor(num_workers) as pool:
+        durations = list(pool.map(audio_duration, audios))
+
+    index = {'size': stat.st_size, 'mtime': stat.st_mtime, 'offsets': offsets, 'durations': durations}
+    tmp_path = index_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(index, f)
+    os.replace(tmp_path, index_path)
+    return index
+
+
+def load_index(path, num_workers=16):
+    """build_index on the first rank, the other ranks read its result."""
+    distributed = torch.distributed.is_available() and torch.distributed.is_initialized()
+    if not distributed or torch.distributed.get_rank() == 0:
+        index = build_index(path, num_workers)
+    if distributed:
+        torch.distributed.barrier()
+        if torch.distributed.get_rank() != 0:
+            index = build_index(path, num_workers)
+    return index
+
+
+class JsonlAudioDataset(torch.utils.data.Dataset):
+    """Lines of an evaluation jsonl file, read on access, with their decoded audio."""
+
+    def __init__(self, path, offsets, sampling_rate):
+        self.path = path
+        self.offsets = offsets
+        self.sampling_rate = sampling_rate
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, idx):
+        with open(self.path, 'rb') as f:
+            f.seek(self.offsets[idx])
+            data = json.loads(f.readline())
+        return {
+            'audio': data['audio'],
+            'waveform': load_audio(data['audio'], self.sampling_rate),
+            'prompt': "<|audio_bos|><|AUDIO|><|audio_eos|>" + data['prompt'],
+            'source': data['source'],
+            'gt': data['gt'],
+        }
+
+
+def collate_fn(inputs, processor):
+    input_texts = [_['prompt'] for _ in inputs]
+    source = [_['source'] for _ in inputs]
+    gt = [_['gt'] for _ in inputs]
+    audio_path = [_['audio'] for _ in inputs]
+    input_audios = [_['waveform'] for _ in inputs]
+    inputs = processor(text=input_texts, audios=input_audios, sampling_rate=processor.feature_extractor.sampling_rate, return_tensors="pt", padding=True)
+    return inputs, audio_path, source, gt
+
+
+class DurationBatchSampler(torch.utils.data.sampler.Sampler):
+    """Batches of similar duration under a padded duration budget, balanced across ranks.
+
+    Samples are sorted by duration and cut into batches of at most max_batch_size samples
+    whose padded duration (size x longest) stays within max_seconds. Batches are given
+    to the rank with the least total audio so far, longest batches first, so every rank
+    gets about the same amount of audio.
+    """
+
+    def __init__(self, durations, max_seconds=300., max_batch_size=32, rank=None, world_size=None):
+        if rank is None:
+            rank = torch.distributed.get_rank() if torch.distributed.is_initialized() else 0
+        if world_size is None:
+            world_size = torch.distributed.get_world_size() if torch.distributed.is_initialized() else 1
+        durations = np.asarray(durations, dtype=np.float64)
+        order = np.argsort(-durations, kind='stable')
+
+        batches, batch = [], []
+        for idx in order.tolist():
+            # sorted longest first, the first sample of a batch is its longest
+            if batch and (len(batch) >= max_batch_size or (len(batch) + 1) * durations[batch[0]] > max_seconds):
+                batches.append(batch)
+                batch = []
+            batch.append(idx)
+        if batch:
+            batches.append(batch)
+
+        loads = np.zeros(world_size)
+        self._batches = []
+        for batch in batches:
+            target = int(np.argmin(loads))
+            loads[target] += durations[batch].sum()
+            if target == rank:
+                self._batches.append(batch)
+        self.total_seconds = loads[rank]
+
+    def __iter__(self):
+        yield from self._batches
+
+    def __len__(self):
+        return len(self._batches)
+
+
+def build_data_loader(path, processor, max_seconds, max_batch_size, num_workers, index_workers=16):
+    index = load_index(path, index_workers)
+    dataset = JsonlAudioDataset(path, index['offsets'], processor.feature_extractor.sampling_rate)
+    batch_sampler = DurationBatchSampler(index['durations'], max_seconds, max_batch_size)
+    return torch.utils.data.DataLoader(
+        dataset=dataset,
+        batch_sampler=batch_sampler,
+        num_workers=num_workers,
+        pin_memory=torch.cuda.is_available(),
+        collate_fn=partial(collate_fn, processor=processor),
+        # the next batches are decoded while the current one is generated
+        prefetch_factor=2 if num_workers > 0 else None,
+    )
@@ -4,29 +4,10 @@ import json
 import os
 import random
 import time
-from functools import partial
 import re
-from evaluate_tokenizer import EvaluationTokenizer
-import editdistance as ed
 import torch
-from transformers.pipelines.audio_utils import ffmpeg_read
-import requests
-from whisper_normalizer.english import EnglishTextNormalizer
-from whisper_normalizer.basic import BasicTextNormalizer
-from cn_tn import TextNorm
-import zhconv
-english_normalizer = EnglishTextNormalizer()
-chinese_normalizer = TextNorm(
-        to_banjiao = False,
-        to_upper = False,
-        to_lower = False,
-        remove_fillers = False,
-        remove_erhua =False,
-        check_chars = False,
-        remove_space = False,
-        cc_mode = '',
-    )
-basic_normalizer = BasicTextNormalizer()
+from eval_data import build_data_loader
+from wer_scoring import score_utterances, summarize, tokenize
 
 from tqdm import tqdm
 
@@ -45,75 +26,6 @@ ds_collections = {
 }
 
 
-class AudioDataset(torch.utils.data.Dataset):
-
-    def __init__(self, ds):
-        path = ds['path']
-        self.datas = open(path).readlines()
-
-    def __len__(self):
-        return len(self.datas)
-
-    def __getitem__(self, idx):
-        data = json.loads(self.datas[idx].strip())
-        audio = data['audio']
-        source = data['source']
-        prompt = "<|audio_bos|><|AUDIO|><|audio_eos|>"+data['prompt']
-        gt = data['gt']
-
-        return {
-            'audio': audio,
-            'prompt': prompt,
-            'source': source,
-            'gt': gt
-        }
-
-def read_audio(audio_path):
-    if audio_path.startswith("http://") or audio_path.startswith("https://"):
-        # We need to actually check for a real protocol, otherwise it's impossible to use a local file
-        # like http_huggingface_co.png
-        inputs = requests.get(audio_path).content
-    else:
-        with open(audio_path, "rb") as f:
-            inputs = f.read()
-    return inputs
-
-def collate_fn(inputs, processor):
-    input_texts = [_['prompt'] for _ in inputs]
-    source = [_['source'] for _ in inputs]
-    gt = [_['gt'] for _ in inputs]
-    audio_path = [_['audio'] for _ in inputs]
-    input_audios = [ffmpeg_read(read_audio(_['audio']),sampling_rate=processor.feature_extractor.sampling_rate) for _ in inputs]
-    inputs = processor(text=input_texts, audios=input_audios, sampling_rate=processor.feature_extractor.sampling_rate, return_tensors="pt", padding=True)
-    return inputs, audio_path, source, gt
-
-
-class InferenceSampler(torch.utils.data.sampler.Sampler):
-
-    def __init__(self, size):
-        self._size = int(size)
-        assert size > 0
-        self._rank = torch.distributed.get_rank()
-        self._world_size = torch.distributed.get_world_size()
-        self._local_indices = self._get_local_indices(size, self._world_size,
-                                                      self._rank)
-
-    @staticmethod
-    def _get_local_indices(total_size, world_size, rank):
-        shard_size = total_size // world_size
-        left = total_size % world_size
-        shard_sizes = [shard_size + int(r < left) for r in range(world_size)]
-
-        begin = sum(shard_sizes[:rank])
-        end = min(sum(shard_sizes[:rank + 1]), total_size)
-        return range(begin, end)
-
-    def __iter__(self):
-        yield from self._local_indices
-
-    def __len__(self):
-        return len(self._local_indices)
-
 def remove_sp(text, language):
     gt = re.sub(r"<\|.*?\|>", " ", text)
     gt = re.sub(rf"\s+", r" ", gt)  # 将文本中的连续空格替换为单个空格
@@ -123,43 +35,14 @@ def remove_sp(text, language):
         gt = re.sub(rf"\s+", r"", gt)
     return gt
 
-def compute_wer(refs, hyps, language):
-    distance = 0
-    ref_length = 0
-    tokenizer = EvaluationTokenizer(
-            tokenizer_type="none",
-            lowercase=True,
-            punctuation_removal=True,
-            character_tokenization=False,
-        )
-    for i in range(len(refs)):
-        ref = refs[i]
-        pred = hyps[i]
-        if language in ["yue"]:
-            ref = zhconv.convert(ref, 'zh-cn')
-            pred = zhconv.convert(pred, 'zh-cn')
-        if language in ["en"]:
-            ref = english_normalizer(ref)
-            pred = english_normalizer(pred)
-        if language in ["zh"]:
-            ref = chinese_normalizer(ref)
-            pred = chinese_normalizer(pred)
-        else:
-            ref = basic_normalizer(ref)
-            pred = basic_normalizer(pred)
-        ref_items = tokenizer.tokenize(ref).split()
-        pred_items = tokenizer.tokenize(pred).split()
-        if language in ["zh", "yue"]:
-            ref_items = [x for x in "".join(ref_items)]
-            pred_items = [x for x in "".join(pred_items)]
-        if i==0:
-            print(f"ref: {ref}")
-            print(f"pred: {pred}")
-            print(f"ref_items:\n{ref_items}\n{len(ref_items)}\n{ref_items[0]}")
-            print(f"pred_items:\n{pred_items}\n{len(ref_items)}\n{ref_items[0]}")
-        distance += ed.eval(ref_items, pred_items)
-        ref_length += len(ref_items)
-    return distance/ref_length
+def compute_wer(refs, hyps, language, num_workers=None):
+    if refs:
+        print(f"ref: {refs[0]}")
+        print(f"pred: {hyps[0]}")
+        print(f"ref_items:\n{list(tokenize(refs[0], language))}")
+        print(f"pred_items:\n{list(tokenize(hyps[0], language))}")
+    records = score_utterances(refs, hyps, language, num_workers)
+    return summarize(records)['wer'], records
 
 
 if __name__ == '__main__':
@@ -169,35 +52,36 @@ if __name__ == '__main__':
     parser.add_argument('--dataset', type=str, default='')
     parser.add_argument('--batch-size', type=int, default=1)
     parser.add_argument('--num-workers', type=int, default=1)
+    parser.add_argument('--score-workers', type=int, default=min(8, os.cpu_count() or 1))
     parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max-seconds-per-batch', type=float, default=300.,
+                        help='padded audio duration of a batch, batch-size is the max number of samples')
+    parser.add_argument('--dist-backend', type=str, default='nccl' if torch.cuda.is_available() else 'gloo')
     args = parser.parse_args()
 
     torch.distributed.init_process_group(
-        backend='nccl',
+        backend=args.dist_backend,
         world_size=int(os.getenv('WORLD_SIZE', '1')),
         rank=int(os.getenv('RANK', '0')),
     )
 
-    torch.cuda.set_device(int(os.getenv('LOCAL_RANK', 0)))
+    device = 'cuda' if torch.cuda.is_available() else 'cpu'
+    if device == 'cuda':
+        torch.cuda.set_device(int(os.getenv('LOCAL_RANK', 0)))
 
     model = Qwen2AudioForConditionalGeneration.from_pretrained(
-        args.checkpoint, device_map='cuda', torch_dtype='auto', trust_remote_code=True).eval()
+        args.checkpoint, device_map=device, torch_dtype='auto', trust_remote_code=True).eval()
 
     processor = AutoProcessor.from_pretrained(args.checkpoint)
     processor.tokenizer.padding_side = 'left'
 
     random.seed(args.seed)
-    dataset = AudioDataset(
-        ds=ds_collections[args.dataset],
-    )
-    data_loader = torch.utils.data.DataLoader(
-        dataset=dataset,
-        sampler=InferenceSampler(len(dataset)),
-        batch_size=args.batch_size,
+    data_loader = build_data_loader(
+        ds_collections[args.dataset]['path'],
+        processor,
+        max_seconds=args.max_seconds_per_batch,
+        max_batch_size=args.batch_size,
         num_workers=args.num_workers,
-        pin_memory=True,
-        drop_last=False,
-        collate_fn=partial(collate_fn, processor=processor),
     )
 
     gts = []
@@ -205,7 +89,7 @@ if __name__ == '__main__':
     rets = []
     audio_paths = []
     for _, (inputs, audio_path, source, gt) in tqdm(enumerate(data_loader)):
-        inputs['input_ids'] = inputs['input_ids'].to('cuda')
+        inputs['input_ids'] = inputs['input_ids'].to(device)
         output_ids = model.generate(**inputs, max_new_tokens=256, min_new_tokens=1, do_sample=False)
         output_ids = output_ids[:, inputs.input_ids.size(1):]
         output = processor.batch_decode(output_ids, skip_special_tokens=True, clean_up_tokenization_spaces=False)
@@ -262,8 +146,14 @@ if __name__ == '__main__':
                 response = remove_sp(response, lan)
                 refs.append(gt)
                 hyps.append(response)
-            wer = compute_wer(refs, hyps, lan)
-            print(f"source: {source}  cnt: {len(refs)} wer: {wer:.4f}")
+            wer, records = compute_wer(refs, hyps, lan, args.score_workers)
+            for result, record in zip(results_list, records):
+                result.update(record)
+            summary = summarize(records)
+            print(f"source: {source}  cnt: {len(refs)} wer: {wer:.4f} "
+                  f"sub: {summary['sub']} del: {summary['del']} ins: {summary['ins']} ref_len: {summary['ref_len']}")
+        # the per utterance errors, next to the responses
+        json.dump(results, open(f'{args.dataset}_{time_prefix}_wer.json', 'w'))
 
 
     torch.distributed.barrier()
@@ -37,7 +37,8 @@ class EvaluationTokenizer(object):
         self.lowercase = lowercase
         self.punctuation_removal = punctuation_removal
         self.character_tokenization = character_tokenization
-        self.tokenizer = TOKENIZERS[tokenizer_type]
+        # one instance, the sacreBLEU tokenizers compile their regexes when created
+        self.tokenizer = TOKENIZERS[tokenizer_type]()
 
     @classmethod
     def remove_punctuation(cls, sent: str):
@@ -47,7 +48,7 @@ class EvaluationTokenizer(object):
         )
 
     def tokenize(self, sent: str):
-        tokenized = self.tokenizer()(sent)
+        tokenized = self.tokenizer(sent)
 
         if self.punctuation_removal:
             tokenized = self.remove_punctuation(tokenized)
@@ -0,0 +1,122 @@
+import os
+from collections import Counter
+from functools import lru_cache
+from multiprocessing import get_context
+
+from rapidfuzz.distance import Levenshtein
+import zhconv
+from cn_tn import TextNorm
+from evaluate_tokenizer import EvaluationTokenizer
+from whisper_normalizer.basic import BasicTextNormalizer
+from whisper_normalizer.english import EnglishTextNormalizer
+
+_normalizers = None
+
+
+def _get_normalizers():
+    """The normalizers of the current process, created once."""
+    global _normalizers
+    if _normalizers is None:
+        _normalizers = {
+            'en': EnglishTextNormalizer(),
+            'zh': TextNorm(
+                to_banjiao=False,
+                to_upper=False,
+                to_lower=False,
+                remove_fillers=False,
+                remove_erhua=False,
+                check_chars=False,
+                remove_space=False,
+                cc_mode='',
+            ),
+            'basic': BasicTextNormalizer(),
+            'tokenizer': EvaluationTokenizer(
+                tokenizer_type="none",
+                lowercase=True,
+                punctuation_removal=True,
+                character_tokenization=False,
+            ),
+        }
+    return _normalizers
+
+
+@lru_cache(maxsize=1 << 16)
+def tokenize(text, language):
+    """Normalized words of a text, characters for zh and yue."""
+    normalizers = _get_normalizers()
+    if language in ["yue"]:
+        text = zhconv.convert(text, 'zh-cn')
+    if language in ["en"]:
+        text = normalizers['en'](text)
+    if language in ["zh"]:
+        text = normalizers['zh'](text)
+    else:
+        text = normalizers['basic'](text)
+    items = normalizers['tokenizer'].tokenize(text).split()
+    if language in ["zh", "yue"]:
+        items = [x for x in "".join(items)]
+    return tuple(items)
+
+
+def align(ref_items, hyp_items):
+    """Substitutions, deletions and insertions of a minimum edit distance alignment."""
+    tags = Counter(op.tag for op in Levenshtein.editops(ref_items, hyp_items))
+    return tags['replace'], tags['delete'], tags['insert']
+
+
+def _tokenize_chunk(texts, language):
+    return [tokenize(text, language) for text in texts]
+
+
+def _align_chunk(pairs):
+    return [align(ref_items, hyp_items) for ref_items, hyp_items in pairs]
+
+
+def _map_chunks(pool, fn, items, chunk_size, *args):
+    chunks = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+    if pool is None:
+        results = [fn(chunk, *args) for chunk in chunks]
+    else:
+        results = pool.starmap(fn, [(chunk,) + args for chunk in chunks])
+    return [r for result in results for r in result]
+
+
+def score_utterances(refs, hyps, language, num_workers=None, chunk_size=256):
+    """Per utterance error breakdown of hyps against refs.
+
+    Every distinct text is normalized once and every distinct pair aligned once, in a
+    pool of num_workers processes (inline for small sets or num_workers <= 1).
+    Returns a list of {"ref_len", "sub", "del", "ins", "errors"}.
+    """
+    if num_workers is None:
+        num_workers = min(8, os.cpu_count() or 1)
+    texts = list(dict.fromkeys(list(refs) + list(hyps)))
+    # starting the workers costs about a second, small sets are scored inline
+    use_pool = num_workers > 1 and len(texts) > 16 * chunk_size
+    # spawned, the callers hold CUDA and NCCL state that must not be forked
+    pool = get_context('spawn').Pool(num_workers) if use_pool else None
+    try:
+        items = dict(zip(texts, _map_chunks(pool, _tokenize_chunk, texts, chunk_size, language)))
+        pairs = list(dict.fromkeys((items[ref], items[hyp]) for ref, hyp in zip(refs, hyps)))
+        counts = dict(zip(pairs, _map_chunks(pool, _align_chunk, pairs, chunk_size)))
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    records = []
+    for ref, hyp in zip(refs, hyps):
+        sub, dele, ins = counts[(items[ref], items[hyp])]
+        records.append({
+            'ref_len': len(items[ref]), 'sub': sub, 'del': dele, 'ins': ins, 'errors': sub + dele + ins,
+        })
+    return records
+
+
+def summarize(records):
+    """Corpus error rate and total substitutions, deletions and insertions."""
+    ref_len = sum(r['ref_len'] for r in records)
+    summary = {k: sum(r[k] for r in records) for k in ('sub', 'del', 'ins', 'errors')}
+    summary['ref_len'] = ref_len
+    summary['wer'] = summary['errors'] / ref_len if ref_len else 0.
+    return summary
@@ -520,6 +520,9 @@ class EnglishTextNormalizer:
             r"'ve\b": " have",
             r"'m\b": " am",
         }
+        # compiled once, not looked up in the re cache for every string
+        self.ignore_patterns = re.compile(self.ignore_patterns)
+        self.replacers = {re.compile(pattern): replacement for pattern, replacement in self.replacers.items()}
         self.standardize_numbers = EnglishNumberNormalizer()
         self.standardize_spellings = EnglishSpellingNormalizer()
 
@@ -528,11 +531,11 @@ class EnglishTextNormalizer:
 
         s = re.sub(r"[<\[][^>\]]*[>\]]", "", s)  # remove words between brackets
         s = re.sub(r"\(([^)]+?)\)", "", s)  # remove words between parenthesis
-        s = re.sub(self.ignore_patterns, "", s)
+        s = self.ignore_patterns.sub("", s)
         s = re.sub(r"\s+'", "'", s)  # when there's a space before an apostrophe
 
         for pattern, replacement in self.replacers.items():
-            s = re.sub(pattern, replacement, s)
+            s = pattern.sub(replacement, s)
 
         s = re.sub(r"(\d),(\d)", r"\1\2", s)  # remove commas between digits
         s = re.sub(r"\.([^0-9]|$)", r" \1", s)  # remove periods not followed by numbers
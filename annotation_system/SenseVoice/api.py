@@ -1,16 +1,23 @@
 # Set the device with environment, default is cuda:0
 # export SENSEVOICE_DEVICE=cuda:1
+# Requests are batched by one inference worker, tuned with
+# SENSEVOICE_MAX_WAIT_MS (10), SENSEVOICE_MAX_FRAMES (30000, 10ms frames of the padded batch),
+# SENSEVOICE_MAX_BATCH (32) and SENSEVOICE_DECODE_WORKERS (4)
 
 import os, re
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from fastapi import FastAPI, File, Form
 from fastapi.responses import HTMLResponse
 from typing_extensions import Annotated
 from typing import List
 from enum import Enum
+import torch
 import torchaudio
 from model import SenseVoiceSmall
 from funasr.utils.postprocess_utils import rich_transcription_postprocess
 from io import BytesIO
+from utils.batching import MicroBatcher
 
 
 class Language(str, Enum):
@@ -27,10 +34,49 @@ m, kwargs = SenseVoiceSmall.from_pretrained(model=model_dir, device=os.getenv("S
 m.eval()
 
 regex = r"<\|.*\|>"
+sample_rate = 16000
+
+
+def decode_audio(file: bytes) -> torch.Tensor:
+    with BytesIO(file) as file_io:
+        waveform, audio_fs = torchaudio.load(file_io)
+    waveform = waveform.mean(0)
+    if audio_fs != sample_rate:
+        waveform = torchaudio.functional.resample(waveform, audio_fs, sample_rate)
+    return waveform
+
+
+def infer_batch(waveforms, language, use_itn, ban_emo_unk):
+    with torch.no_grad():
+        res = m.inference(
+            data_in=waveforms,
+            language=language, # "zh", "en", "yue", "ja", "ko", "nospeech"
+            use_itn=use_itn,
+            ban_emo_unk=ban_emo_unk,
+            key=[str(i) for i in range(len(waveforms))],
+            fs=sample_rate,
+            **kwargs,
+        )
+    return res[0]
+
+
+decode_pool = ThreadPoolExecutor(max_workers=int(os.getenv("SENSEVOICE_DECODE_WORKERS", 4)))
+batcher = MicroBatcher(
+    infer_batch,
+    max_wait_ms=float(os.getenv("SENSEVOICE_MAX_WAIT_MS", 10)),
+    max_frames=int(os.getenv("SENSEVOICE_MAX_FRAMES", 30000)),
+    max_batch_size=int(os.getenv("SENSEVOICE_MAX_BATCH", 32)),
+)
 
 app = FastAPI()
 
 
+@app.on_event("shutdown")
+def shutdown():
+    batcher.stop()
+    decode_pool.shutdown()
+
+
 @app.get("/", response_class=HTMLResponse)
 async def root():
     return """
@@ -46,35 +92,43 @@ async def root():
     </html>
     """
 
+@app.get("/api/v1/metrics")
+async def metrics():
+    return batcher.metrics()
+
+
 @app.post("/api/v1/asr")
-async def turn_audio_to_text(files: Annotated[List[bytes], File(description="wav or mp3 audios in 16KHz")], keys: Annotated[str, Form(description="name of each audio joined with comma")], lang: Annotated[Language, Form(description="language of audio content")] = "auto"):
-    audios = []
-    audio_fs = 0
-    for file in files:
-        file_io = BytesIO(file)
-        data_or_path_or_list, audio_fs = torchaudio.load(file_io)
-        data_or_path_or_list = data_or_path_or_list.mean(0)
-        audios.append(data_or_path_or_list)
-        file_io.close()
+async def turn_audio_to_text(
+    files: Annotated[List[bytes], File(description="wav or mp3 audios in 16KHz")],
+    keys: Annotated[str, Form(description="name of each audio joined with comma")],
+    lang: Annotated[Language, Form(description="language of audio content")] = "auto",
+    use_itn: Annotated[bool, Form(description="inverse text normalization with punctuation")] = False,
+    ban_emo_unk: Annotated[bool, Form(description="never output the unknown emotion")] = False,
+):
+    # decoding runs in threads and inference in the batching worker, off the event loop
+    loop = asyncio.get_running_loop()
+    audios = await asyncio.gather(
+        *[loop.run_in_executor(decode_pool, decode_audio, file) for file in files]
+    )
     if lang == "":
         lang = "auto"
     if keys == "":
         key = ["wav_file_tmp_name"]
     else:
         key = keys.split(",")
-    res = m.inference(
-        data_in=audios,
-        language=lang, # "zh", "en", "yue", "ja", "ko", "nospeech"
-        use_itn=False,
-        ban_emo_unk=False,
-        key=key,
-        fs=audio_fs,
-        **kwargs,
-    )
+    futures = [
+        batcher.submit(audio, language=Language(lang).value, use_itn=use_itn, ban_emo_unk=ban_emo_unk)
+        for audio in audios
+    ]
+    res = await asyncio.gather(*[asyncio.wrap_future(future) for future in futures])
     if len(res) == 0:
         return {"result": []}
-    for it in res[0]:
+    result = []
+    for i, it in enumerate(res):
+        it = dict(it)
+        it["key"] = key[i % len(key)]
         it["raw_text"] = it["text"]
         it["clean_text"] = re.sub(regex, "", it["text"], 0, re.MULTILINE)
         it["text"] = rich_transcription_postprocess(it["text"])
-    return {"result": res[0]}
+        result.append(it)
+    return {"result": result}
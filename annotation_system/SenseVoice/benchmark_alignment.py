@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8 -*-
+# Copyright FunASR (https://github.com/FunAudioLLM/SenseVoice). All Rights Reserved.
+#  MIT License  (https://opensource.org/licenses/MIT)
+
+"""
+Speed and memory of the CTC forced alignment (utils/ctc_alignment.py) used for the
+timestamps of SenseVoiceSmall.inference(output_timestamp=True), on random emissions of
+long utterances (60ms frames). The whole batch aligned in one call is compared to the
+rows aligned one by one, and both are checked to give the same alignments.
+
+    python benchmark_alignment.py --minutes 10 --batch_sizes 1 4 8 --device cpu
+"""
+
+import argparse
+import time
+
+import torch
+
+from utils.ctc_alignment import ctc_forced_align
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--minutes", type=float, default=10)
+    parser.add_argument("--batch_sizes", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--tokens_per_sec", type=float, default=4)
+    parser.add_argument("--vocab_size", type=int, default=1000)
+    parser.add_argument("--device", default="cpu")
+    args = parser.parse_args()
+
+    torch.manual_seed(0)
+    max_frames = int(args.minutes * 60 / 0.06)
+
+    # TorchScript optimizes the recursion during the first calls
+    for _ in range(3):
+        log_probs = torch.randn(2, 200, args.vocab_size, device=args.device).log_softmax(-1)
+        ctc_forced_align(
+            log_probs,
+            torch.randint(1, args.vocab_size, (2, 20), device=args.device),
+            torch.tensor([200, 150]),
+            torch.tensor([20, 10]),
+        )
+
+    for batch_size in args.batch_sizes:
+        # the first row has the full length, the others between half and full length
+        input_lengths = torch.randint(max_frames // 2, max_frames + 1, (batch_size,))
+        input_lengths[0] = max_frames
+        target_lengths = (input_lengths.float() * 0.06 * args.tokens_per_sec).long()
+        log_probs = torch.randn(batch_size, max_frames, args.vocab_size, device=args.device)
+        log_probs = log_probs.log_softmax(-1)
+        targets = torch.full((batch_size, int(target_lengths.max())), -1, device=args.device)
+        for i in range(batch_size):
+            targets[i, : target_lengths[i]] = torch.randint(
+                1, args.vocab_size, (int(target_lengths[i]),), device=args.device
+            )
+
+        beg = time.perf_counter()
+        batch_align = ctc_forced_align(log_probs, targets, input_lengths, target_lengths)
+        batch_time = time.perf_counter() - beg
+
+        beg = time.perf_counter()
+        for i in range(batch_size):
+            row_align = ctc_forced_align(
+                log_probs[i : i + 1, : input_lengths[i]],
+                targets[i : i + 1, : max(int(target_lengths[i]), 1)],
+                input_lengths[i : i + 1],
+                target_lengths[i : i + 1],
+            )
+            assert torch.equal(row_align[0], batch_align[i, : input_lengths[i]])
+        row_time = time.perf_counter() - beg
+
+        num_states = 2 * targets.size(1) + 1
+        print(
+            f"batch_size={batch_size}, {max_frames} frames, {targets.size(1)} tokens: "
+            f"batched {batch_time:.2f}s, row by row {row_time:.2f}s, "
+            f"backpointers {batch_size * max_frames * num_states / 2**20:.0f}MB "
+            f"(int64: {batch_size * max_frames * num_states * 8 / 2**20:.0f}MB)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8 -*-
+# Copyright FunASR (https://github.com/FunAudioLLM/SenseVoice). All Rights Reserved.
+#  MIT License  (https://opensource.org/licenses/MIT)
+
+"""
+Throughput of the batched ONNX runtime (utils/model_bin.py) against the PyTorch
+SenseVoiceSmall.inference path, in audio seconds decoded per second.
+The ONNX model is exported first with export.py.
+
+    python benchmark_onnx.py --wavs wav.list --batch_sizes 1 8 16 --device cpu
+"""
+
+import argparse
+import os
+import time
+
+import librosa
+
+from model import SenseVoiceSmall
+from utils.model_bin import SenseVoiceSmallONNX
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model_dir", default="iic/SenseVoiceSmall")
+    parser.add_argument("--wavs", required=True, help="file with one wav path per line")
+    parser.add_argument("--batch_sizes", type=int, nargs="+", default=[1, 8, 16])
+    parser.add_argument("--device", default="cpu", help="cpu or cuda:0")
+    parser.add_argument("--quantize", action="store_true")
+    parser.add_argument("--num_workers", type=int, default=4)
+    args = parser.parse_args()
+
+    with open(args.wavs) as f:
+        wavs = [line.strip() for line in f if line.strip()]
+    audio_dur = sum(librosa.get_duration(path=wav) for wav in wavs)
+    print(f"{len(wavs)} wavs, {audio_dur:.1f}s of audio")
+
+    m, kwargs = SenseVoiceSmall.from_pretrained(model=args.model_dir, device=args.device)
+    m.eval()
+    model_path = kwargs.get("output_dir", os.path.dirname(kwargs.get("init_param")))
+    device_id = args.device.split(":")[-1] if args.device.startswith("cuda") else "-1"
+
+    for batch_size in args.batch_sizes:
+        beg = time.perf_counter()
+        for i in range(0, len(wavs), batch_size):
+            m.inference(data_in=wavs[i : i + batch_size], language="auto", use_itn=False, **kwargs)
+        elapsed = time.perf_counter() - beg
+        print(f"torch batch_size={batch_size}: {elapsed:.2f}s, {audio_dur / elapsed:.1f} audio s/s")
+
+        model_bin = SenseVoiceSmallONNX(
+            model_path,
+            batch_size=batch_size,
+            device_id=device_id,
+            quantize=args.quantize,
+            num_workers=args.num_workers,
+        )
+        beg = time.perf_counter()
+        model_bin(wavs, [0], [15])
+        elapsed = time.perf_counter() - beg
+        print(f"onnx  batch_size={batch_size}: {elapsed:.2f}s, {audio_dur / elapsed:.1f} audio s/s")
+
+
+if __name__ == "__main__":
+    main()
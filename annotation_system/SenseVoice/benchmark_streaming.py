@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8 -*-
+# Copyright FunASR (https://github.com/FunAudioLLM/SenseVoice). All Rights Reserved.
+#  MIT License  (https://opensource.org/licenses/MIT)
+
+"""
+Latency and accuracy of the streaming recognizer (utils/streaming.py) against offline
+SenseVoiceSmall.inference on local wavs. The audio is fed in pieces of --piece_ms as
+if it came live; the character error rate is measured against the offline text.
+
+    python benchmark_streaming.py --wavs wav.list --chunk_size 10 --lookahead 5 --device cpu
+"""
+
+import argparse
+import re
+import time
+
+import librosa
+import numpy as np
+import torch
+
+from model import SenseVoiceSmall
+from utils.streaming import StreamingSenseVoice
+
+regex = r"<\|.*?\|>"
+
+
+def edit_distance(ref, hyp):
+    dist = np.arange(len(hyp) + 1)
+    for i in range(1, len(ref) + 1):
+        prev, dist[0] = dist[0], i
+        for j in range(1, len(hyp) + 1):
+            cur = min(dist[j] + 1, dist[j - 1] + 1, prev + (ref[i - 1] != hyp[j - 1]))
+            prev, dist[j] = dist[j], cur
+    return int(dist[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model_dir", default="iic/SenseVoiceSmall")
+    parser.add_argument("--wavs", required=True, help="file with one wav path per line")
+    parser.add_argument("--device", default="cpu", help="cpu or cuda:0")
+    parser.add_argument("--language", default="auto")
+    parser.add_argument("--piece_ms", type=int, default=100, help="audio fed per call")
+    parser.add_argument("--chunk_size", type=int, default=10, help="LFR frames (60ms) per chunk")
+    parser.add_argument("--lookahead", type=int, default=5, help="LFR frames of right context")
+    parser.add_argument("--look_back", type=int, default=-1, help="chunks of history, -1 for all")
+    args = parser.parse_args()
+
+    with open(args.wavs) as f:
+        wavs = [line.strip() for line in f if line.strip()]
+
+    m, kwargs = SenseVoiceSmall.from_pretrained(model=args.model_dir, device=args.device)
+    m.eval()
+    recognizer = StreamingSenseVoice(
+        m,
+        kwargs,
+        chunk_size=args.chunk_size,
+        lookahead=args.lookahead,
+        look_back=args.look_back,
+        language=args.language,
+    )
+
+    piece = 16 * args.piece_ms
+    audio_dur, offline_time, stream_time = 0.0, 0.0, 0.0
+    call_times, first_token_delays = [], []
+    errors, ref_chars = 0, 0
+    for wav in wavs:
+        waveform, _ = librosa.load(wav, sr=16000)
+        audio_dur += len(waveform) / 16000
+
+        beg = time.perf_counter()
+        with torch.no_grad():
+            res = m.inference(data_in=waveform, language=args.language, use_itn=False, **kwargs)
+        offline_time += time.perf_counter() - beg
+        offline_text = re.sub(regex, "", res[0][0]["text"])
+
+        first_token_delay = None
+        for st in range(0, max(len(waveform), 1), piece):
+            is_final = st + piece >= len(waveform)
+            beg = time.perf_counter()
+            partial = recognizer.accept_waveform(waveform[st : st + piece], is_final=is_final)
+            call_times.append(time.perf_counter() - beg)
+            stream_time += call_times[-1]
+            # the 4 tag tokens come first, the first text token is the 5th
+            if first_token_delay is None and len(partial["token_int"]) > 4:
+                first_token_delay = min(st + piece, len(waveform)) / 16000
+        if first_token_delay is not None:
+            first_token_delays.append(first_token_delay)
+        stream_text = re.sub(regex, "", partial["text"])
+
+        errors += edit_distance(offline_text, stream_text)
+        ref_chars += len(offline_text)
+        print(f"{wav}\n  offline: {offline_text}\n  stream:  {stream_text}")
+
+    call_ms = np.array(call_times) * 1000
+    print(f"{len(wavs)} wavs, {audio_dur:.1f}s of audio")
+    print(f"offline RTF {offline_time / audio_dur:.3f}, streaming RTF {stream_time / audio_dur:.3f}")
+    print(
+        f"chunk latency {(args.chunk_size + args.lookahead) * 60}ms, compute per {args.piece_ms}ms "
+        f"piece: mean {call_ms.mean():.1f}ms, p90 {np.percentile(call_ms, 90):.1f}ms, "
+        f"max {call_ms.max():.1f}ms"
+    )
+    if first_token_delays:
+        print(f"first text token after {np.mean(first_token_delays):.2f}s of audio on average")
+    print(f"CER against offline decoding: {errors / max(ref_chars, 1) * 100:.2f}%")
+
+
+if __name__ == "__main__":
+    main()
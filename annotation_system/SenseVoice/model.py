@@ -40,9 +40,9 @@ class SinusoidalPositionEncoder(torch.nn.Module):
         encoding = torch.cat([torch.sin(scaled_time), torch.cos(scaled_time)], dim=2)
         return encoding.type(dtype)
 
-    def forward(self, x):
+    def forward(self, x, start_idx: int = 0):
         batch_size, timesteps, input_dim = x.size()
-        positions = torch.arange(1, timesteps + 1, device=x.device)[None, :]
+        positions = torch.arange(start_idx + 1, start_idx + timesteps + 1, device=x.device)[None, :]
         position_encoding = self.encode(positions, input_dim, x.dtype).to(x.device)
 
         return x + position_encoding
@@ -240,25 +240,26 @@ class MultiHeadedAttentionSANM(nn.Module):
 
         """
         q_h, k_h, v_h, v = self.forward_qkv(x)
-        if chunk_size is not None and look_back > 0 or look_back == -1:
-            if cache is not None:
-                k_h_stride = k_h[:, :, : -(chunk_size[2]), :]
-                v_h_stride = v_h[:, :, : -(chunk_size[2]), :]
-                k_h = torch.cat((cache["k"], k_h), dim=2)
-                v_h = torch.cat((cache["v"], v_h), dim=2)
-
-                cache["k"] = torch.cat((cache["k"], k_h_stride), dim=2)
-                cache["v"] = torch.cat((cache["v"], v_h_stride), dim=2)
+        fsmn_inputs = v
+        if chunk_size is not None:
+            # the last chunk_size[2] frames are look-ahead, they are fed again with the next chunk
+            cache = {} if cache is None else cache
+            left_context = self.pad_fn.padding[0]
+            if "fsmn" in cache:
+                fsmn_inputs = torch.cat((cache["fsmn"], v), dim=1)
+            if left_context > 0:
+                fsmn_stride = fsmn_inputs[:, : fsmn_inputs.size(1) - chunk_size[2], :]
+                cache["fsmn"] = fsmn_stride[:, -left_context:, :]
+            if look_back > 0 or look_back == -1:
+                if "k" in cache:
+                    k_h = torch.cat((cache["k"], k_h), dim=2)
+                    v_h = torch.cat((cache["v"], v_h), dim=2)
+                cache["k"] = k_h[:, :, : k_h.size(2) - chunk_size[2], :]
+                cache["v"] = v_h[:, :, : v_h.size(2) - chunk_size[2], :]
                 if look_back != -1:
                     cache["k"] = cache["k"][:, :, -(look_back * chunk_size[1]) :, :]
                     cache["v"] = cache["v"][:, :, -(look_back * chunk_size[1]) :, :]
-            else:
-                cache_tmp = {
-                    "k": k_h[:, :, : -(chunk_size[2]), :],
-                    "v": v_h[:, :, : -(chunk_size[2]), :],
-                }
-                cache = cache_tmp
-        fsmn_memory = self.forward_fsmn(v, None)
+        fsmn_memory = self.forward_fsmn(fsmn_inputs, None)[:, -v.size(1) :, :]
         q_h = q_h * self.d_k ** (-0.5)
         scores = torch.matmul(q_h, k_h.transpose(-2, -1))
         att_outs = self.forward_attention(v_h, scores, None)
@@ -576,6 +577,45 @@ class SenseVoiceEncoderSmall(nn.Module):
         xs_pad = self.tp_norm(xs_pad)
         return xs_pad, olens
 
+    def forward_chunk(
+        self,
+        xs_pad: torch.Tensor,
+        cache: dict = None,
+        chunk_size: tuple = (0, 10, 5),
+        look_back: int = -1,
+    ):
+        """Encode one chunk of a stream, chunk_size being (0, chunk, look-ahead) in frames.
+
+        The last chunk_size[2] frames of the output only see a partial right context, they
+        are encoded again with the next chunk. cache holds the position and the per-layer
+        attention and FSMN caches, and is updated in place.
+        """
+        if cache is None:
+            num_layers = len(self.encoders0) + len(self.encoders) + len(self.tp_encoders)
+            cache = {"start_idx": 0, "layers": [None] * num_layers}
+        layer_caches = cache["layers"]
+
+        xs_pad = xs_pad * self.output_size() ** 0.5
+        xs_pad = self.embed(xs_pad, cache["start_idx"])
+
+        layer_idx = 0
+        for encoder_layer in list(self.encoders0) + list(self.encoders):
+            xs_pad, layer_caches[layer_idx] = encoder_layer.forward_chunk(
+                xs_pad, layer_caches[layer_idx], chunk_size, look_back
+            )
+            layer_idx += 1
+        xs_pad = self.after_norm(xs_pad)
+
+        for encoder_layer in self.tp_encoders:
+            xs_pad, layer_caches[layer_idx] = encoder_layer.forward_chunk(
+                xs_pad, layer_caches[layer_idx], chunk_size, look_back
+            )
+            layer_idx += 1
+        xs_pad = self.tp_norm(xs_pad)
+
+        cache["start_idx"] += xs_pad.size(1) - chunk_size[2]
+        return xs_pad, cache
+
 
 @tables.register("model_classes", "SenseVoiceSmall")
 class SenseVoiceSmall(nn.Module):
@@ -864,10 +904,35 @@ class SenseVoiceSmall(nn.Module):
             key = key[0]
         if len(key) < b:
             key = key * b
+        token_ints = []
         for i in range(b):
             x = ctc_logits[i, : encoder_out_lens[i].item(), :]
             yseq = x.argmax(dim=-1)
             yseq = torch.unique_consecutive(yseq, dim=-1)
+            mask = yseq != self.blank_id
+            token_ints.append(yseq[mask].tolist())
+
+        if output_timestamp:
+            # align the text tokens of the whole batch at once, without the 4 query frames
+            logits_speech = self.ctc.softmax(encoder_out)[:, 4:, :]
+            pred = logits_speech.argmax(-1)
+            logits_speech[:, :, self.blank_id] = logits_speech[:, :, self.blank_id].masked_fill(
+                pred == self.blank_id, 0
+            )
+            text_lens = [max(len(token_int) - 4, 0) for token_int in token_ints]
+            targets = torch.full((b, max(text_lens)), self.ignore_id, dtype=torch.long)
+            for i, token_int in enumerate(token_ints):
+                targets[i, : text_lens[i]] = torch.tensor(token_int[4:], dtype=torch.long)
+            aligns = ctc_forced_align(
+                logits_speech.float(),
+                targets.to(logits_speech.device),
+                (encoder_out_lens - 4).long(),
+                torch.tensor(text_lens, dtype=torch.long),
+                ignore_id=self.ignore_id,
+            )
+
+        for i in range(b):
+            token_int = token_ints[i]
 
             ibest_writer = None
             if kwargs.get("output_dir") is not None:
@@ -875,9 +940,6 @@ class SenseVoiceSmall(nn.Module):
                     self.writer = DatadirWriter(kwargs.get("output_dir"))
                 ibest_writer = self.writer[f"1best_recog"]
 
-            mask = yseq != self.blank_id
-            token_int = yseq[mask].tolist()
-
             # Change integer-ids to tokens
             text = tokenizer.decode(token_int)
             if ibest_writer is not None:
@@ -888,20 +950,7 @@ class SenseVoiceSmall(nn.Module):
                 timestamp = []
                 tokens = tokenizer.text2tokens(text)[4:]
 
-                logits_speech = self.ctc.softmax(encoder_out)[i, 4:encoder_out_lens[i].item(), :]
-
-                pred = logits_speech.argmax(-1).cpu()
-                logits_speech[pred==self.blank_id, self.blank_id] = 0
-
-                align = ctc_forced_align(
-                    logits_speech.unsqueeze(0).float(),
-                    torch.Tensor(token_int[4:]).unsqueeze(0).long().to(logits_speech.device),
-                    (encoder_out_lens-4).long(),
-                    torch.tensor(len(token_int)-4).unsqueeze(0).long().to(logits_speech.device),
-                    ignore_id=self.ignore_id,
-                )
-
-                pred = groupby(align[0, :encoder_out_lens[0]])
+                pred = groupby(aligns[i, : encoder_out_lens[i] - 4].tolist())
                 _start = 0
                 token_id = 0
                 ts_max = encoder_out_lens[i] - 4
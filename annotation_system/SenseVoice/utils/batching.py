@@ -0,0 +1,167 @@
+# -*- encoding: utf-8 -*-
+# Copyright FunASR (https://github.com/FunAudioLLM/SenseVoice). All Rights Reserved.
+#  MIT License  (https://opensource.org/licenses/MIT)
+
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, NamedTuple, Tuple
+
+import numpy as np
+
+
+class _Request(NamedTuple):
+    waveform: Any
+    options: Tuple
+    num_frames: int
+    future: Future
+    enqueue_time: float
+
+
+class MicroBatcher:
+    """Dynamic batching of single-utterance requests for one inference worker.
+
+    Requests are queued with `submit` and drained by a dedicated thread. A batch is
+    closed when `max_wait_ms` has passed since its first request, when the padded batch
+    would exceed `max_frames` (10ms frames) or when it holds `max_batch_size` requests.
+    Only requests with the same options (e.g. language, use_itn, ban_emo_unk) share a
+    batch; the others wait for the next batch in arrival order.
+
+    `infer_fn(waveforms, **options)` returns one result per waveform, in order.
+    """
+
+    def __init__(
+        self,
+        infer_fn: Callable[..., List],
+        max_wait_ms: float = 10,
+        max_frames: int = 30000,
+        max_batch_size: int = 32,
+        frame_shift: int = 160,
+        history: int = 1000,
+    ):
+        self.infer_fn = infer_fn
+        self.max_wait = max_wait_ms / 1000
+        self.max_frames = max_frames
+        self.max_batch_size = max_batch_size
+        self.frame_shift = frame_shift
+
+        self.queue = queue.Queue()
+        self.pending = deque()
+        self.lock = threading.Lock()
+        self.num_requests = 0
+        self.num_batches = 0
+        self.num_errors = 0
+        self.queue_times = deque(maxlen=history)
+        self.infer_times = deque(maxlen=history)
+        self.total_times = deque(maxlen=history)
+        self.batch_sizes = deque(maxlen=history)
+
+        self.running = True
+        self.worker = threading.Thread(target=self.run, name="asr-batcher", daemon=True)
+        self.worker.start()
+
+    def submit(self, waveform, **options) -> Future:
+        future = Future()
+        num_frames = max(1, len(waveform) // self.frame_shift)
+        self.queue.put(
+            _Request(waveform, tuple(sorted(options.items())), num_frames, future, time.perf_counter())
+        )
+        return future
+
+    def stop(self):
+        self.running = False
+        self.queue.put(None)
+        self.worker.join()
+
+    def next_batch(self) -> List[_Request]:
+        # wait for the first request, then collect more until max_wait has passed
+        while not self.pending:
+            request = self.queue.get()
+            if request is None:
+                return []
+            self.pending.append(request)
+        deadline = self.pending[0].enqueue_time + self.max_wait
+        while len(self.pending) < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            try:
+                request = self.queue.get(timeout=timeout) if timeout > 0 else self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if request is None:
+                self.running = False
+                break
+            self.pending.append(request)
+            if not self.fits():
+                break
+
+        # the oldest request picks the options, matching requests join while they fit
+        options = self.pending[0].options
+        batch, rest = [], deque()
+        max_frames = 0
+        for request in self.pending:
+            padded = (len(batch) + 1) * max(max_frames, request.num_frames)
+            if (
+                request.options == options
+                and len(batch) < self.max_batch_size
+                and (not batch or padded <= self.max_frames)
+            ):
+                batch.append(request)
+                max_frames = max(max_frames, request.num_frames)
+            else:
+                rest.append(request)
+        self.pending = rest
+        return batch
+
+    def fits(self) -> bool:
+        options = self.pending[0].options
+        frames = [r.num_frames for r in self.pending if r.options == options]
+        return len(frames) * max(frames) <= self.max_frames
+
+    def run(self):
+        while self.running or self.pending:
+            batch = self.next_batch()
+            if not batch:
+                continue
+            start = time.perf_counter()
+            try:
+                results = self.infer_fn([r.waveform for r in batch], **dict(batch[0].options))
+                if len(results) != len(batch):
+                    raise RuntimeError(f"Expected {len(batch)} results, got {len(results)}")
+            except Exception as e:
+                with self.lock:
+                    self.num_errors += len(batch)
+                for request in batch:
+                    request.future.set_exception(e)
+                continue
+            end = time.perf_counter()
+            with self.lock:
+                self.num_batches += 1
+                self.num_requests += len(batch)
+                self.batch_sizes.append(len(batch))
+                for request in batch:
+                    self.queue_times.append(start - request.enqueue_time)
+                    self.infer_times.append(end - start)
+                    self.total_times.append(end - request.enqueue_time)
+            for request, result in zip(batch, results):
+                request.future.set_result(result)
+
+    def metrics(self) -> Dict:
+        def percentiles(times):
+            if not times:
+                return {}
+            p50, p90, p99 = np.percentile(np.array(times) * 1000, [50, 90, 99]).tolist()
+            return {"p50_ms": round(p50, 2), "p90_ms": round(p90, 2), "p99_ms": round(p99, 2)}
+
+        with self.lock:
+            return {
+                "queue_size": self.queue.qsize() + len(self.pending),
+                "num_requests": self.num_requests,
+                "num_batches": self.num_batches,
+                "num_errors": self.num_errors,
+                "mean_batch_size": round(float(np.mean(self.batch_sizes)), 2) if self.batch_sizes else 0,
+                "queue_latency": percentiles(self.queue_times),
+                "infer_latency": percentiles(self.infer_times),
+                "total_latency": percentiles(self.total_times),
+            }
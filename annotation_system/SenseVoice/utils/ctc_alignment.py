@@ -1,5 +1,72 @@
 import torch
 
+
+@torch.jit.script
+def _viterbi(
+    log_probs: torch.Tensor,
+    ext_targets: torch.Tensor,
+    diff_labels: torch.Tensor,
+    input_lengths: torch.Tensor,
+    block_size: int = 256,
+):
+    batch_size, input_time_size = log_probs.size(0), log_probs.size(1)
+    num_states = ext_targets.size(1)
+    neg_inf = float("-inf")
+
+    # two -inf columns in front, so that the previous states are shifted views
+    padded_score = torch.full(
+        (batch_size, num_states + 2), neg_inf, device=log_probs.device, dtype=log_probs.dtype
+    )
+    padded_score[:, 2:4] = log_probs[:, 0].gather(-1, ext_targets[:, :2])
+    skip_mask = ~diff_labels
+    # 0: stay, 1: from the previous state, 2: skip the blank in between
+    backpointers = torch.zeros(
+        (batch_size, input_time_size, num_states), device=log_probs.device, dtype=torch.int8
+    )
+
+    emissions = log_probs[:, :0, :0]
+    for t in range(1, input_time_size):
+        if (t - 1) % block_size == 0:
+            # the emissions of the target states, gathered for a block of frames at once
+            block = log_probs[:, t : t + block_size]
+            emissions = block.gather(-1, ext_targets.unsqueeze(1).expand(-1, block.size(1), -1))
+        best_score = padded_score[:, 2:]
+        prev1 = padded_score[:, 1:-1]
+        prev2 = padded_score[:, :-2].masked_fill(skip_mask, neg_inf)
+
+        # ties keep the lowest index, as max over the stacked candidates does
+        prev_max_idx = (prev1 > best_score).to(torch.int8)
+        prev_max_value = torch.maximum(best_score, prev1)
+        prev_max_idx.masked_fill_(prev2 > prev_max_value, 2)
+        prev_max_value = torch.maximum(prev_max_value, prev2)
+
+        score = emissions[:, (t - 1) % block_size] + prev_max_value
+        # rows past their input length keep the score of their last frame
+        active = (input_lengths > t).unsqueeze(-1)
+        padded_score[:, 2:] = torch.where(active, score, best_score)
+        backpointers[:, t] = prev_max_idx
+
+    return padded_score[:, 2:], backpointers
+
+
+@torch.jit.script
+def _backtrack(
+    backpointers: torch.Tensor,
+    last_state: torch.Tensor,
+    input_lengths: torch.Tensor,
+):
+    batch_size, input_time_size = backpointers.size(0), backpointers.size(1)
+    path = torch.zeros((batch_size, input_time_size), device=backpointers.device, dtype=torch.long)
+    state = last_state
+    for t in range(input_time_size - 1, -1, -1):
+        active = input_lengths > t
+        path[:, t] = torch.where(active, state, torch.zeros_like(state))
+        if t > 0:
+            step = backpointers[:, t].gather(-1, state.unsqueeze(-1)).squeeze(-1).long()
+            state = torch.where(active, state - step, state)
+    return path
+
+
 def ctc_forced_align(
     log_probs: torch.Tensor,
     targets: torch.Tensor,
@@ -10,6 +77,10 @@ def ctc_forced_align(
 ) -> torch.Tensor:
     """Align a CTC label sequence to an emission.
 
+    Every row of the batch is aligned with its own input and target lengths, frames past
+    the input length are aligned to blank. The Viterbi recursion runs in TorchScript and
+    keeps int8 backpointers, (B, T, 2L+1) bytes.
+
     Args:
         log_probs (Tensor): log probability of CTC emission output.
             Tensor of shape `(B, T, C)`. where `B` is the batch size, `T` is the input length,
@@ -23,11 +94,11 @@ def ctc_forced_align(
         blank_id (int, optional): The index of blank symbol in CTC emission. (Default: 0)
         ignore_id (int, optional): The index of ignore symbol in CTC emission. (Default: -1)
     """
-    targets[targets == ignore_id] = blank
-
-    batch_size, input_time_size, _ = log_probs.size()
-    bsz_indices = torch.arange(batch_size, device=input_lengths.device)
+    targets = targets.masked_fill(targets == ignore_id, blank)
+    input_lengths = input_lengths.to(log_probs.device).long()
+    target_lengths = target_lengths.to(log_probs.device).long()
 
+    batch_size = log_probs.size(0)
     _t_a_r_g_e_t_s_ = torch.cat(
         (
             torch.stack((torch.full_like(targets, blank), targets), dim=-1).flatten(start_dim=1),
@@ -41,36 +112,17 @@ def ctc_forced_align(
             _t_a_r_g_e_t_s_[:, 2:] != _t_a_r_g_e_t_s_[:, :-2],
         ),
         dim=1,
-    )
-
-    neg_inf = torch.tensor(float("-inf"), device=log_probs.device, dtype=log_probs.dtype)
-    padding_num = 2
-    padded_t = padding_num + _t_a_r_g_e_t_s_.size(-1)
-    best_score = torch.full((batch_size, padded_t), neg_inf, device=log_probs.device, dtype=log_probs.dtype)
-    best_score[:, padding_num + 0] = log_probs[:, 0, blank]
-    best_score[:, padding_num + 1] = log_probs[bsz_indices, 0, _t_a_r_g_e_t_s_[:, 1]]
-
-    backpointers = torch.zeros((batch_size, input_time_size, padded_t), device=log_probs.device, dtype=targets.dtype)
-
-    for t in range(1, input_time_size):
-        prev = torch.stack(
-            (best_score[:, 2:], best_score[:, 1:-1], torch.where(diff_labels, best_score[:, :-2], neg_inf))
-        )
-        prev_max_value, prev_max_idx = prev.max(dim=0)
-        best_score[:, padding_num:] = log_probs[:, t].gather(-1, _t_a_r_g_e_t_s_) + prev_max_value
-        backpointers[:, t, padding_num:] = prev_max_idx
-
-    l1l2 = best_score.gather(
-        -1, torch.stack((padding_num + target_lengths * 2 - 1, padding_num + target_lengths * 2), dim=-1)
-    )
+    )[:, : _t_a_r_g_e_t_s_.size(1)]
 
-    path = torch.zeros((batch_size, input_time_size), device=best_score.device, dtype=torch.long)
-    path[bsz_indices, input_lengths - 1] = padding_num + target_lengths * 2 - 1 + l1l2.argmax(dim=-1)
+    best_score, backpointers = _viterbi(log_probs, _t_a_r_g_e_t_s_, diff_labels, input_lengths)
 
-    for t in range(input_time_size - 1, 0, -1):
-        target_indices = path[:, t]
-        prev_max_idx = backpointers[bsz_indices, t, target_indices]
-        path[:, t - 1] += target_indices - prev_max_idx
+    # the path ends on the last label or the blank after it
+    last_label = (target_lengths * 2 - 1).clamp(min=0)
+    last_label_score = best_score.gather(-1, last_label.unsqueeze(-1)).squeeze(-1)
+    last_label_score = last_label_score.masked_fill(target_lengths == 0, float("-inf"))
+    last_blank_score = best_score.gather(-1, (target_lengths * 2).unsqueeze(-1)).squeeze(-1)
+    last_state = torch.where(last_blank_score > last_label_score, target_lengths * 2, last_label)
 
-    alignments = _t_a_r_g_e_t_s_.gather(dim=-1, index=(path - padding_num).clamp(min=0))
+    path = _backtrack(backpointers, last_state, input_lengths)
+    alignments = _t_a_r_g_e_t_s_.gather(dim=-1, index=path)
     return alignments
@@ -2,6 +2,7 @@
 from pathlib import Path
 from typing import Any, Dict, Iterable, List, NamedTuple, Set, Tuple, Union
 import copy
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
 import kaldi_native_fbank as knf
@@ -11,6 +12,28 @@ root_dir = Path(__file__).resolve().parent
 logger_initialized = {}
 
 
+def splice_frames(inputs: np.ndarray, lfr_m: int, lfr_n: int, T_lfr: int) -> np.ndarray:
+    """
+    Stack lfr_m frames every lfr_n frames into T_lfr LFR frames, the frames past
+    the end being copies of the last frame
+    """
+    T, D = inputs.shape
+    if T_lfr <= 0:
+        return np.empty([0, lfr_m * D], dtype=np.float32)
+    num_padding = max(0, (T_lfr - 1) * lfr_n + lfr_m - T)
+    right_padding = np.repeat(inputs[-1:], num_padding, axis=0)
+    inputs = np.ascontiguousarray(np.concatenate((inputs, right_padding)))
+    # window i is the lfr_m * D contiguous values starting at frame i * lfr_n
+    row_stride, item_stride = inputs.strides
+    windows = np.lib.stride_tricks.as_strided(
+        inputs,
+        shape=(T_lfr, lfr_m * D),
+        strides=(lfr_n * row_stride, item_stride),
+        writeable=False,
+    )
+    return windows.astype(np.float32)
+
+
 class WavFrontend:
     """Conventional frontend structure for ASR."""
 
@@ -53,15 +76,49 @@ class WavFrontend:
     def fbank(self, waveform: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
         waveform = waveform * (1 << 15)
         self.fbank_fn = knf.OnlineFbank(self.opts)
-        self.fbank_fn.accept_waveform(self.opts.frame_opts.samp_freq, waveform.tolist())
-        frames = self.fbank_fn.num_frames_ready
-        mat = np.empty([frames, self.opts.mel_opts.num_bins])
-        for i in range(frames):
-            mat[i, :] = self.fbank_fn.get_frame(i)
-        feat = mat.astype(np.float32)
-        feat_len = np.array(mat.shape[0]).astype(np.int32)
+        self.fbank_fn.accept_waveform(self.opts.frame_opts.samp_freq, waveform)
+        feat = self.get_frames(self.fbank_fn, 0, self.fbank_fn.num_frames_ready)
+        feat_len = np.array(feat.shape[0]).astype(np.int32)
         return feat, feat_len
 
+    def fbank_lfr(self, waveform: np.ndarray) -> np.ndarray:
+        # same as fbank + apply_lfr, without touching self.fbank_fn, so it is safe in threads
+        fbank_fn = knf.OnlineFbank(self.opts)
+        fbank_fn.accept_waveform(self.opts.frame_opts.samp_freq, waveform * (1 << 15))
+        feat = self.get_frames(fbank_fn, 0, fbank_fn.num_frames_ready)
+        if self.lfr_m != 1 or self.lfr_n != 1:
+            feat = self.apply_lfr(feat, self.lfr_m, self.lfr_n)
+        return feat
+
+    def get_frames(self, fbank_fn: knf.OnlineFbank, beg: int, end: int) -> np.ndarray:
+        if end <= beg:
+            return np.empty([0, self.opts.mel_opts.num_bins], dtype=np.float32)
+        return np.array([fbank_fn.get_frame(i) for i in range(beg, end)], dtype=np.float32)
+
+    def extract_feats(
+        self, waveform_list: List[np.ndarray], num_workers: int = 1
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Fbank, LFR and CMVN of a batch of waveforms, zero padded to [B, T, D]
+        """
+        if num_workers <= 1 or len(waveform_list) <= 1:
+            feats = [self.fbank_lfr(waveform) for waveform in waveform_list]
+        else:
+            with ThreadPoolExecutor(max_workers=num_workers) as executor:
+                feats = list(executor.map(self.fbank_lfr, waveform_list))
+        feats_len = np.array([feat.shape[0] for feat in feats], dtype=np.int32)
+
+        # CMVN once over all the frames of the batch, then scattered into the padded batch
+        feats = np.concatenate(feats)
+        if self.cmvn_file:
+            feats = self.apply_cmvn(feats)
+        feats_pad = np.zeros(
+            [len(feats_len), feats_len.max(initial=0), feats.shape[1]], dtype=np.float32
+        )
+        mask = np.arange(feats_pad.shape[1]) < feats_len[:, None]
+        feats_pad[mask] = feats
+        return feats_pad, feats_len
+
     def fbank_online(self, waveform: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
         waveform = waveform * (1 << 15)
         # self.fbank_fn = knf.OnlineFbank(self.opts)
@@ -91,36 +148,18 @@ class WavFrontend:
 
     @staticmethod
     def apply_lfr(inputs: np.ndarray, lfr_m: int, lfr_n: int) -> np.ndarray:
-        LFR_inputs = []
-
         T = inputs.shape[0]
         T_lfr = int(np.ceil(T / lfr_n))
-        left_padding = np.tile(inputs[0], ((lfr_m - 1) // 2, 1))
-        inputs = np.vstack((left_padding, inputs))
-        T = T + (lfr_m - 1) // 2
-        for i in range(T_lfr):
-            if lfr_m <= T - i * lfr_n:
-                LFR_inputs.append((inputs[i * lfr_n : i * lfr_n + lfr_m]).reshape(1, -1))
-            else:
-                # process last LFR frame
-                num_padding = lfr_m - (T - i * lfr_n)
-                frame = inputs[i * lfr_n :].reshape(-1)
-                for _ in range(num_padding):
-                    frame = np.hstack((frame, inputs[-1]))
-
-                LFR_inputs.append(frame)
-        LFR_outputs = np.vstack(LFR_inputs).astype(np.float32)
-        return LFR_outputs
+        left_padding = np.repeat(inputs[:1], (lfr_m - 1) // 2, axis=0)
+        inputs = np.concatenate((left_padding, inputs))
+        return splice_frames(inputs, lfr_m, lfr_n, T_lfr)
 
     def apply_cmvn(self, inputs: np.ndarray) -> np.ndarray:
         """
         Apply CMVN with mvn data
         """
-        frame, dim = inputs.shape
-        means = np.tile(self.cmvn[0:1, :dim], (frame, 1))
-        vars = np.tile(self.cmvn[1:2, :dim], (frame, 1))
-        inputs = (inputs + means) * vars
-        return inputs
+        dim = inputs.shape[-1]
+        return (inputs + self.cmvn[0, :dim]) * self.cmvn[1, :dim]
 
     def load_cmvn(
         self,
@@ -176,30 +215,20 @@ class WavFrontendOnline(WavFrontend):
         Apply lfr with data
         """
 
-        LFR_inputs = []
         T = inputs.shape[0]  # include the right context
         T_lfr = int(
             np.ceil((T - (lfr_m - 1) // 2) / lfr_n)
         )  # minus the right context: (lfr_m - 1) // 2
         splice_idx = T_lfr
-        for i in range(T_lfr):
-            if lfr_m <= T - i * lfr_n:
-                LFR_inputs.append((inputs[i * lfr_n : i * lfr_n + lfr_m]).reshape(1, -1))
-            else:  # process last LFR frame
-                if is_final:
-                    num_padding = lfr_m - (T - i * lfr_n)
-                    frame = (inputs[i * lfr_n :]).reshape(-1)
-                    for _ in range(num_padding):
-                        frame = np.hstack((frame, inputs[-1]))
-                    LFR_inputs.append(frame)
-                else:
-                    # update splice_idx and break the circle
-                    splice_idx = i
-                    break
+        # number of LFR frames without padding, i.e. lfr_m <= T - i * lfr_n
+        num_full = min(T_lfr, max(0, (T - lfr_m) // lfr_n + 1))
+        if not is_final and num_full < T_lfr:
+            # the last LFR frames wait for more input
+            splice_idx = T_lfr = num_full
         splice_idx = min(T - 1, splice_idx * lfr_n)
         lfr_splice_cache = inputs[splice_idx:, :]
-        LFR_outputs = np.vstack(LFR_inputs)
-        return LFR_outputs.astype(np.float32), lfr_splice_cache, splice_idx
+        LFR_outputs = splice_frames(inputs, lfr_m, lfr_n, T_lfr)
+        return LFR_outputs, lfr_splice_cache, splice_idx
 
     @staticmethod
     def compute_frame_num(
@@ -242,13 +271,9 @@ class WavFrontendOnline(WavFrontend):
                 )
                 waveform = waveform * (1 << 15)
 
-                self.fbank_fn.accept_waveform(self.opts.frame_opts.samp_freq, waveform.tolist())
-                frames = self.fbank_fn.num_frames_ready
-                mat = np.empty([frames, self.opts.mel_opts.num_bins])
-                for i in range(frames):
-                    mat[i, :] = self.fbank_fn.get_frame(i)
-                feat = mat.astype(np.float32)
-                feat_len = np.array(mat.shape[0]).astype(np.int32)
+                self.fbank_fn.accept_waveform(self.opts.frame_opts.samp_freq, waveform)
+                feat = self.get_frames(self.fbank_fn, 0, self.fbank_fn.num_frames_ready)
+                feat_len = np.array(feat.shape[0]).astype(np.int32)
                 feats.append(feat)
                 feats_lens.append(feat_len)
 
@@ -211,6 +211,10 @@ class OrtInferSession:
 
         self._verify_model(model_file)
         self.session = InferenceSession(model_file, sess_options=sess_opt, providers=EP_list)
+        if cuda_ep in self.session.get_providers():
+            self.device_type, self.device_id = "cuda", int(device_id)
+        else:
+            self.device_type, self.device_id = "cpu", 0
 
         if device_id != "-1" and cuda_ep not in self.session.get_providers():
             warnings.warn(
@@ -228,6 +232,22 @@ class OrtInferSession:
         except Exception as e:
             raise ONNXRuntimeError("ONNXRuntime inferece failed.") from e
 
+    def run_with_io_binding(self, input_content: List[np.ndarray]) -> List[np.ndarray]:
+        """
+        Same as __call__, with the inputs copied to the device once and the outputs
+        allocated on the device, so that the session does no extra host copies.
+        """
+        io_binding = self.session.io_binding()
+        for name, value in zip(self.get_input_names(), input_content):
+            io_binding.bind_cpu_input(name, np.ascontiguousarray(value))
+        for name in self.get_output_names():
+            io_binding.bind_output(name, self.device_type, self.device_id)
+        try:
+            self.session.run_with_iobinding(io_binding)
+        except Exception as e:
+            raise ONNXRuntimeError("ONNXRuntime inferece failed.") from e
+        return io_binding.copy_outputs_to_cpu()
+
     def get_input_names(
         self,
     ):
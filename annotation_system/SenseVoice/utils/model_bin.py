@@ -4,9 +4,9 @@
 #  MIT License  (https://opensource.org/licenses/MIT)
 
 import os.path
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import List, Union, Tuple
-import torch
 import librosa
 import numpy as np
 
@@ -41,6 +41,8 @@ class SenseVoiceSmallONNX:
         quantize: bool = False,
         intra_op_num_threads: int = 4,
         cache_dir: str = None,
+        num_workers: int = 4,
+        use_io_binding: bool = True,
         **kwargs,
     ):
         if quantize:
@@ -63,6 +65,8 @@ class SenseVoiceSmallONNX:
             model_file, device_id, intra_op_num_threads=intra_op_num_threads
         )
         self.batch_size = batch_size
+        self.num_workers = num_workers
+        self.use_io_binding = use_io_binding
         self.blank_id = 0
 
     def __call__(self, 
@@ -71,35 +75,58 @@ class SenseVoiceSmallONNX:
                  textnorm: List,
                  tokenizer=None,
                  **kwargs) -> List:
+        """
+        language and textnorm hold one id for all inputs or one id per input.
+        The results are returned in the input order.
+        """
         waveform_list = self.load_data(wav_content, self.frontend.opts.frame_opts.samp_freq)
         waveform_nums = len(waveform_list)
-        asr_res = []
+        language = self.expand_query(language, waveform_nums)
+        textnorm = self.expand_query(textnorm, waveform_nums)
+        # batch the waveforms by decreasing length to reduce the padding
+        sorted_idx = np.argsort([-len(waveform) for waveform in waveform_list], kind="stable")
+        asr_res = [None] * waveform_nums
         for beg_idx in range(0, waveform_nums, self.batch_size):
             end_idx = min(waveform_nums, beg_idx + self.batch_size)
-            feats, feats_len = self.extract_feat(waveform_list[beg_idx:end_idx])
+            batch_idx = sorted_idx[beg_idx:end_idx]
+            feats, feats_len = self.extract_feat([waveform_list[i] for i in batch_idx])
             ctc_logits, encoder_out_lens = self.infer(feats, 
                                  feats_len, 
-                                 np.array(language, dtype=np.int32), 
-                                 np.array(textnorm, dtype=np.int32)
+                                 language[batch_idx], 
+                                 textnorm[batch_idx]
                                  )
-            # back to torch.Tensor
-            ctc_logits = torch.from_numpy(ctc_logits).float()
-            # support batch_size=1 only currently
-            x = ctc_logits[0, : encoder_out_lens[0].item(), :]
-            yseq = x.argmax(dim=-1)
-            yseq = torch.unique_consecutive(yseq, dim=-1)
-
-            mask = yseq != self.blank_id
-            token_int = yseq[mask].tolist()
-            
-            if tokenizer is not None:
-                asr_res.append(tokenizer.tokens2text(token_int))
-            else:
-                asr_res.append(token_int)
+            for i, token_int in zip(batch_idx, self.ctc_greedy_search(ctc_logits, encoder_out_lens)):
+                if tokenizer is not None:
+                    asr_res[i] = tokenizer.tokens2text(token_int)
+                else:
+                    asr_res[i] = token_int
         return asr_res
 
+    @staticmethod
+    def expand_query(query: Union[int, List], nums: int) -> np.ndarray:
+        query = np.array(query, dtype=np.int32).reshape(-1)
+        if len(query) == 1:
+            return np.repeat(query, nums)
+        if len(query) != nums:
+            raise ValueError(f"Expected 1 or {nums} query ids, got {len(query)}")
+        return query
+
+    def ctc_greedy_search(self, ctc_logits: np.ndarray, encoder_out_lens: np.ndarray) -> List[List[int]]:
+        # argmax over the whole batch, then collapse repeats and drop blanks per row
+        yseqs = ctc_logits.argmax(axis=-1)
+        token_ints = []
+        for yseq, yseq_len in zip(yseqs, encoder_out_lens):
+            yseq = yseq[: int(yseq_len)]
+            keep = np.ones(len(yseq), dtype=bool)
+            keep[1:] = yseq[1:] != yseq[:-1]
+            yseq = yseq[keep]
+            token_ints.append(yseq[yseq != self.blank_id].tolist())
+        return token_ints
+
     def load_data(self, wav_content: Union[str, np.ndarray, List[str]], fs: int = None) -> List:
-        def load_wav(path: str) -> np.ndarray:
+        def load_wav(path: Union[str, np.ndarray]) -> np.ndarray:
+            if isinstance(path, np.ndarray):
+                return path
             waveform, _ = librosa.load(path, sr=fs)
             return waveform
 
@@ -110,21 +137,16 @@ class SenseVoiceSmallONNX:
             return [load_wav(wav_content)]
 
         if isinstance(wav_content, list):
-            return [load_wav(path) for path in wav_content]
+            if self.num_workers <= 1 or len(wav_content) <= 1:
+                return [load_wav(path) for path in wav_content]
+            # decoding and resampling release the GIL for the most part
+            with ThreadPoolExecutor(max_workers=self.num_workers) as executor:
+                return list(executor.map(load_wav, wav_content))
 
         raise TypeError(f"The type of {wav_content} is not in [str, np.ndarray, list]")
 
     def extract_feat(self, waveform_list: List[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
-        feats, feats_len = [], []
-        for waveform in waveform_list:
-            speech, _ = self.frontend.fbank(waveform)
-            feat, feat_len = self.frontend.lfr_cmvn(speech)
-            feats.append(feat)
-            feats_len.append(feat_len)
-
-        feats = self.pad_feats(feats, np.max(feats_len))
-        feats_len = np.array(feats_len).astype(np.int32)
-        return feats, feats_len
+        return self.frontend.extract_feats(waveform_list, self.num_workers)
 
     @staticmethod
     def pad_feats(feats: List[np.ndarray], max_feat_len: int) -> np.ndarray:
@@ -141,5 +163,7 @@ class SenseVoiceSmallONNX:
               feats_len: np.ndarray,
               language: np.ndarray,
               textnorm: np.ndarray,) -> Tuple[np.ndarray, np.ndarray]:
+        if self.use_io_binding:
+            return self.ort_infer.run_with_io_binding([feats, feats_len, language, textnorm])
         outputs = self.ort_infer([feats, feats_len, language, textnorm])
         return outputs
@@ -0,0 +1,105 @@
+# -*- encoding: utf-8 -*-
+# Copyright FunASR (https://github.com/FunAudioLLM/SenseVoice). All Rights Reserved.
+#  MIT License  (https://opensource.org/licenses/MIT)
+
+from typing import Dict, List, Union
+
+import numpy as np
+import torch
+
+from utils.frontend import WavFrontendOnline
+
+
+class StreamingSenseVoice:
+    """Chunk-by-chunk recognition of one audio stream with SenseVoiceSmall.
+
+    Audio is fed in pieces of any size with `accept_waveform`. Features are computed
+    incrementally by WavFrontendOnline, and the encoder runs on chunks of `chunk_size`
+    LFR frames (60ms each) plus `lookahead` frames of right context, keeping the per-layer
+    attention and FSMN caches between chunks (`look_back` chunks of history, -1 for all).
+    Every call returns the CTC greedy hypothesis of the frames encoded so far; the
+    language, emotion, event and itn tags come with the first chunk as in offline decoding.
+    """
+
+    def __init__(
+        self,
+        model,
+        kwargs: Dict,
+        chunk_size: int = 10,
+        lookahead: int = 5,
+        look_back: int = -1,
+        language: str = "auto",
+        use_itn: bool = False,
+        ban_emo_unk: bool = False,
+    ):
+        self.model = model
+        self.tokenizer = kwargs["tokenizer"]
+        self.device = next(model.parameters()).device
+        self.frontend = WavFrontendOnline(**kwargs["frontend_conf"])
+        self.chunk_size = chunk_size
+        self.lookahead = lookahead
+        self.look_back = look_back
+        self.ban_emo_unk = ban_emo_unk
+
+        textnorm = "withitn" if use_itn else "woitn"
+        query = [model.lid_dict.get(language, 0), 1, 2, model.textnorm_dict[textnorm]]
+        with torch.no_grad():
+            self.query = model.embed(torch.LongTensor([query]).to(self.device))
+        self.reset()
+
+    def reset(self):
+        self.frontend.cache_reset()
+        self.feats = None
+        self.cache = None
+        self.token_int = []
+        self.prev_token = None
+
+    def accept_waveform(self, waveform: Union[np.ndarray, List[float]], is_final: bool = False) -> Dict:
+        waveform = np.asarray(waveform, dtype=np.float32).reshape(1, -1)
+        if waveform.shape[1] or self.frontend.lfr_splice_cache:
+            feats, _ = self.frontend.extract_fbank(
+                waveform, np.array([waveform.shape[1]], dtype=np.int32), is_final
+            )
+            if feats.size:
+                feats = feats[0].astype(np.float32)
+                self.feats = feats if self.feats is None else np.concatenate((self.feats, feats))
+
+        num_feats = 0 if self.feats is None else self.feats.shape[0]
+        with torch.no_grad():
+            while num_feats >= self.chunk_size + self.lookahead:
+                self.encode_chunk(self.chunk_size, self.lookahead)
+                num_feats -= self.chunk_size
+            if is_final and (num_feats or self.cache is None):
+                self.encode_chunk(num_feats, 0)
+
+        result = {
+            "text": self.tokenizer.decode(self.token_int),
+            "token_int": list(self.token_int),
+            "is_final": is_final,
+        }
+        if is_final:
+            self.reset()
+        return result
+
+    def encode_chunk(self, num_chunk: int, num_lookahead: int):
+        if self.feats is None:
+            self.feats = np.zeros((0, self.query.size(-1)), dtype=np.float32)
+        x = torch.from_numpy(self.feats[: num_chunk + num_lookahead])[None].to(self.device)
+        num_out = num_chunk
+        if self.cache is None:
+            x = torch.cat((self.query, x), dim=1)
+            num_out += self.query.size(1)
+
+        encoder_out, self.cache = self.model.encoder.forward_chunk(
+            x, self.cache, (0, num_out, num_lookahead), self.look_back
+        )
+        ctc_logits = self.model.ctc.log_softmax(encoder_out[:, :num_out])
+        if self.ban_emo_unk:
+            ctc_logits[:, :, self.model.emo_dict["unk"]] = -float("inf")
+
+        # CTC greedy search, with repeats collapsed across chunks
+        for token in ctc_logits[0].argmax(dim=-1).tolist():
+            if token != self.prev_token and token != self.model.blank_id:
+                self.token_int.append(token)
+            self.prev_token = token
+        self.feats = self.feats[num_chunk:]
@@ -4,16 +4,17 @@ import contextlib
 
 import numpy as np
 import torch
-from torch.utils.data import Dataset, DataLoader, random_split
+from torch.utils.data import Dataset, DataLoader, Sampler, Subset, random_split
 
 logger = logging.getLogger(__name__)
 
-def load_dataset(data_path, labels=None, min_length=3, max_length=None):
+def load_dataset(data_path, labels=None, min_length=3, max_length=None, mmap=True):
     sizes = []
     offsets = []
     emo_labels = []
 
-    npy_data = np.load(data_path + ".npy")
+    # memory-mapped, the pages of the features are only read when a sample is used
+    npy_data = np.load(data_path + ".npy", mmap_mode="r" if mmap else None)
 
     offset = 0
     skipped = 0
@@ -68,7 +69,8 @@ class SpeechDataset(Dataset):
     def __getitem__(self, index):
         offset = self.offsets[index]
         end = self.sizes[index] + offset
-        feats = torch.from_numpy(self.feats[offset:end, :].copy()).float()
+        # a view of the (memory-mapped) features, copied once by the collator
+        feats = self.feats[offset:end, :]
 
         res = {"id": index, "feats": feats}
         if self.labels is not None:
@@ -85,18 +87,17 @@ class SpeechDataset(Dataset):
 
         feats = [s["feats"] for s in samples]
         sizes = [s.shape[0] for s in feats]
-        labels = torch.tensor([s["target"] for s in samples]) if samples[0]["target"] is not None else None
+        labels = torch.tensor([s["target"] for s in samples]) if samples[0].get("target") is not None else None
 
         target_size = max(sizes)
 
-        collated_feats = feats[0].new_zeros(
-            len(feats), target_size, feats[0].size(-1)
-        )
+        collated_feats = np.zeros((len(feats), target_size, feats[0].shape[-1]), dtype=np.float32)
 
         padding_mask = torch.BoolTensor(torch.Size([len(feats), target_size])).fill_(False)
         for i, (feat, size) in enumerate(zip(feats, sizes)):
             collated_feats[i, :size] = feat
             padding_mask[i, size:] = True
+        collated_feats = torch.from_numpy(collated_feats)
 
         res = {
             "id": torch.LongTensor([s["id"] for s in samples]),
@@ -130,71 +131,88 @@ def load_ssl_features(feature_path, label_dict, max_speech_seq_len=None):
 
     return iemocap_data
 
+class BucketBatchSampler(Sampler):
+    """Batches of samples of similar length, to cut the padding of the collator.
+
+    Every epoch, the samples are shuffled, sorted by length within pools of
+    `pool_batches` batches and cut into batches, and the batches are shuffled.
+    Without shuffle, the batches are cut from all samples sorted by length.
+    """
+    def __init__(self, sizes, batch_size, shuffle=True, pool_batches=50):
+        self.sizes = np.asarray(sizes)
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.pool_size = batch_size * pool_batches
+
+    def __iter__(self):
+        if self.shuffle:
+            order = torch.randperm(len(self.sizes)).numpy()
+            pools = [order[i:i + self.pool_size] for i in range(0, len(order), self.pool_size)]
+            order = np.concatenate([pool[np.argsort(self.sizes[pool], kind="stable")] for pool in pools])
+        else:
+            order = np.argsort(self.sizes, kind="stable")
+        batches = [order[i:i + self.batch_size].tolist() for i in range(0, len(order), self.batch_size)]
+        if self.shuffle:
+            batches = [batches[i] for i in torch.randperm(len(batches)).tolist()]
+        return iter(batches)
+
+    def __len__(self):
+        return (len(self.sizes) + self.batch_size - 1) // self.batch_size
+
+def make_dataloader(dataset, batch_size, shuffle, bucket_batches):
+    collator = dataset.dataset.collator if isinstance(dataset, Subset) else dataset.collator
+    if not bucket_batches:
+        return DataLoader(dataset, batch_size=batch_size, collate_fn=collator,
+                          num_workers=4, pin_memory=True, shuffle=shuffle)
+
+    if isinstance(dataset, Subset):
+        sizes = dataset.dataset.sizes[np.asarray(dataset.indices)]
+    else:
+        sizes = dataset.sizes
+    batch_sampler = BucketBatchSampler(sizes, batch_size, shuffle=shuffle)
+    return DataLoader(dataset, batch_sampler=batch_sampler, collate_fn=collator,
+                      num_workers=4, pin_memory=True)
+
 def train_valid_test_iemocap_dataloader(
         data, 
         batch_size,
         test_start, 
         test_end,
         eval_is_test=False,
+        bucket_batches=True,
     ):
+    # every split indexes the same features by offset and size, nothing is copied per fold
     feats = data['feats']
     sizes, offsets = data['sizes'], data['offsets']
     labels = data['labels']
 
-    test_sizes = sizes[test_start:test_end]
-    test_offsets = offsets[test_start:test_end]
-    test_labels = labels[test_start:test_end]
-
-    test_offset_start = test_offsets[0]
-    test_offset_end = test_offsets[-1] + test_sizes[-1]
-    test_feats = feats[test_offset_start:test_offset_end, :]
-    test_offsets = test_offsets - test_offset_start
-    
     test_dataset = SpeechDataset(
-        feats=test_feats,
-        sizes=test_sizes, 
-        offsets=test_offsets,
-        labels=test_labels,
+        feats=feats,
+        sizes=sizes[test_start:test_end],
+        offsets=offsets[test_start:test_end],
+        labels=labels[test_start:test_end],
     )
 
-    train_val_sizes = np.concatenate([sizes[:test_start], sizes[test_end:]])
-    train_val_offsets = np.concatenate([np.array([0]), np.cumsum(train_val_sizes)[:-1]], dtype=np.int64)
-    train_val_labels = [item for item in labels[:test_start] + labels[test_end:]]
-    train_val_feats = np.concatenate([feats[:test_offset_start, :], feats[test_offset_end:, :]], axis=0)
+    train_val_idx = np.r_[0:test_start, test_end:len(sizes)]
+    train_val_dataset = SpeechDataset(
+        feats=feats,
+        sizes=sizes[train_val_idx],
+        offsets=offsets[train_val_idx],
+        labels=[labels[i] for i in train_val_idx],
+    )
 
     if eval_is_test:
-        train_dataset = SpeechDataset(
-            feats=train_val_feats, 
-            sizes=train_val_sizes, 
-            offsets=train_val_offsets,
-            labels=train_val_labels,
-        )
+        train_dataset = train_val_dataset
         val_dataset = test_dataset
-        train_loader = DataLoader(train_dataset, batch_size=batch_size, collate_fn=train_dataset.collator, 
-                                num_workers=4, pin_memory=True, shuffle=True)
-        val_loader = DataLoader(val_dataset, batch_size=batch_size, collate_fn=val_dataset.collator, 
-                                num_workers=4, pin_memory=True, shuffle=False)
-    
     else:
         train_val_nums = data['num'] - (test_end - test_start)
         train_nums = int(0.8 * train_val_nums)
         val_nums = train_val_nums - train_nums
 
-        train_val_dataset = SpeechDataset(
-            feats=train_val_feats, 
-            sizes=train_val_sizes, 
-            offsets=train_val_offsets,
-            labels=train_val_labels,
-        )
-
         train_dataset, val_dataset = random_split(train_val_dataset, [train_nums, val_nums])
 
-        train_loader = DataLoader(train_dataset, batch_size=batch_size, collate_fn=train_val_dataset.collator, 
-                                num_workers=4, pin_memory=True, shuffle=True)
-        val_loader = DataLoader(val_dataset, batch_size=batch_size, collate_fn=train_val_dataset.collator, 
-                                num_workers=4, pin_memory=True, shuffle=False)
-    
-    test_loader = DataLoader(test_dataset, batch_size=batch_size, collate_fn=test_dataset.collator, 
-                                num_workers=4, pin_memory=True, shuffle=False)
+    train_loader = make_dataloader(train_dataset, batch_size, shuffle=True, bucket_batches=bucket_batches)
+    val_loader = make_dataloader(val_dataset, batch_size, shuffle=False, bucket_batches=bucket_batches)
+    test_loader = make_dataloader(test_dataset, batch_size, shuffle=False, bucket_batches=bucket_batches)
 
-    return train_loader, val_loader, test_loader
\ No newline at end of file
+    return train_loader, val_loader, test_loader
@@ -33,14 +33,15 @@ def train_iemocap(cfg: DictConfig):
     idx_sessions = [0, 1, 2, 3, 4]
 
     test_wa_avg, test_ua_avg, test_f1_avg = 0., 0., 0.
-    
+
+    # memory-mapped once, every fold indexes the same features
+    dataset = load_ssl_features(cfg.dataset.feat_path, label_dict)
+
     for fold in idx_sessions: # extract the $fold$th as test set
         logger.info(f"------Now it's {fold+1}th fold------")
 
         device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
         torch.cuda.empty_cache()
-        
-        dataset = load_ssl_features(cfg.dataset.feat_path, label_dict)
 
         test_len = n_samples[fold] 
         test_idx_start = sum(n_samples[:fold])
@@ -51,6 +52,7 @@ def train_iemocap(cfg: DictConfig):
             test_idx_start,
             test_idx_end,
             eval_is_test=cfg.dataset.eval_is_test,
+            bucket_batches=cfg.dataset.get('bucket_batches', True),
         )
 
         model = BaseModel(input_dim=768, output_dim=len(label_dict))
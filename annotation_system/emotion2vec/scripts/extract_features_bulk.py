@@ -0,0 +1,225 @@
+import argparse
+import glob
+import json
+import os
+import shutil
+from dataclasses import dataclass
+import numpy as np
+import soundfile as sf
+
+import torch
+import torch.nn.functional as F
+import fairseq
+
+def get_parser():
+    parser = argparse.ArgumentParser(
+        description="extract emotion2vec features of many wav files into one packed .npy + .lengths pair"
+    )
+    parser.add_argument('--manifest', help='fairseq .tsv manifest, wav.scp or list of wav paths')
+    parser.add_argument('--source_dir', help='directory searched recursively for wav files, instead of --manifest')
+    parser.add_argument('--save_path', help='output prefix, writes <save_path>.npy, .lengths and .names', required=True)
+    parser.add_argument('--model_dir', type=str, help='pretrained model', required=True)
+    parser.add_argument('--checkpoint_dir', type=str, help='checkpoint for pre-trained model', required=True)
+    parser.add_argument('--granularity', type=str, help='which granularity to use, frame or utterance', required=True)
+    parser.add_argument('--device', type=str, default='cuda' if torch.cuda.is_available() else 'cpu')
+    parser.add_argument('--max_tokens', type=int, default=1600000, help='max padded samples per batch')
+    parser.add_argument('--batch_size', type=int, default=64, help='max clips per batch')
+    parser.add_argument('--part_size', type=int, default=2000, help='clips per resumable part')
+    parser.add_argument('--num_workers', type=int, default=4, help='workers reading audio')
+
+    return parser
+
+@dataclass
+class UserDirModule:
+    user_dir: str
+
+
+def read_manifest(args):
+    """Return the (name, path, num_samples) of every wav file, in output order."""
+    if args.source_dir is not None:
+        paths = sorted(glob.glob(os.path.join(args.source_dir, '**', '*.wav'), recursive=True))
+        names = [os.path.relpath(p, args.source_dir) for p in paths]
+        return [(n, p, sf.info(p).frames) for n, p in zip(names, paths)]
+
+    with open(args.manifest) as f:
+        lines = [line.rstrip('\n') for line in f if line.strip()]
+    if args.manifest.endswith('.tsv'):
+        # fairseq manifest: root dir, then "relative_path<TAB>num_samples" lines
+        root = lines.pop(0).strip()
+        items = []
+        for line in lines:
+            rel_path, frames = line.split('\t')[:2]
+            items.append((rel_path, os.path.join(root, rel_path), int(frames)))
+        return items
+    items = []
+    for line in lines:
+        fields = line.split()
+        name, path = (fields[0], fields[1]) if len(fields) > 1 else (fields[0], fields[0])
+        items.append((name, path, sf.info(path).frames))
+    return items
+
+
+def make_parts(items, args):
+    """Length-sorted parts of the files, each a list of padded batches of indices."""
+    order = sorted(range(len(items)), key=lambda i: (items[i][2], i))
+    parts = []
+    for st in range(0, len(order), args.part_size):
+        batches, batch = [], []
+        for i in order[st:st + args.part_size]:
+            # sorted by length, so the current clip is the longest of the batch
+            if batch and (len(batch) >= args.batch_size or (len(batch) + 1) * items[i][2] > args.max_tokens):
+                batches.append(batch)
+                batch = []
+            batch.append(i)
+        if batch:
+            batches.append(batch)
+        parts.append(batches)
+    return parts
+
+
+class WavDataset(torch.utils.data.Dataset):
+    def __init__(self, items, normalize):
+        self.items = items
+        self.normalize = normalize
+
+    def __len__(self):
+        return len(self.items)
+
+    def __getitem__(self, index):
+        fname = self.items[index][1]
+        wav, sr = sf.read(fname, dtype='float32')
+        channel = sf.info(fname).channels
+        assert sr == 16e3, "Sample rate should be 16kHz, but got {}in file {}".format(sr, fname)
+        assert channel == 1, "Channel should be 1, but got {} in file {}".format(channel, fname)
+        source = torch.from_numpy(wav)
+        if self.normalize:
+            source = F.layer_norm(source, source.shape)
+        return index, source
+
+    @staticmethod
+    def collator(samples):
+        indices = [s[0] for s in samples]
+        sizes = [s[1].shape[0] for s in samples]
+        source = samples[0][1].new_zeros(len(samples), max(sizes))
+        padding_mask = torch.zeros(len(samples), max(sizes), dtype=torch.bool)
+        for i, (_, wav) in enumerate(samples):
+            source[i, :wav.shape[0]] = wav
+            padding_mask[i, wav.shape[0]:] = True
+        # like the one-file extraction, no mask when nothing is padded
+        return indices, source, padding_mask if padding_mask.any() else None
+
+
+def save_part(part_file, indices, feats):
+    lengths = np.array([f.shape[0] for f in feats], dtype=np.int64)
+    tmp_file = part_file + '.tmp.npz'
+    np.savez(tmp_file, indices=np.array(indices, dtype=np.int64), lengths=lengths,
+             feats=np.concatenate(feats, axis=0))
+    # renamed into place, so a part on disk is always complete
+    os.replace(tmp_file, part_file)
+
+
+def assemble(parts_dir, num_parts, items, save_path):
+    lengths = np.zeros(len(items), dtype=np.int64)
+    part_files = [os.path.join(parts_dir, 'part-%05d.npz' % i) for i in range(num_parts)]
+    dim = None
+    for part_file in part_files:
+        with np.load(part_file) as part:
+            lengths[part['indices']] = part['lengths']
+            dim = part['feats'].shape[1]
+    offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+
+    out = np.lib.format.open_memmap(save_path + '.npy.tmp', mode='w+', dtype=np.float32,
+                                    shape=(int(lengths.sum()), dim))
+    for part_file in part_files:
+        with np.load(part_file) as part:
+            feats, part_offset = part['feats'], 0
+            for index, length in zip(part['indices'], part['lengths']):
+                out[offsets[index]:offsets[index] + length] = feats[part_offset:part_offset + length]
+                part_offset += length
+    out.flush()
+    del out
+    os.replace(save_path + '.npy.tmp', save_path + '.npy')
+
+    with open(save_path + '.lengths', 'w') as l_f, open(save_path + '.names', 'w') as n_f:
+        for (name, _, _), length in zip(items, lengths):
+            print(length, file=l_f)
+            print(name, file=n_f)
+
+
+def main():
+    parser = get_parser()
+    args = parser.parse_args()
+    print(args)
+    assert (args.manifest is None) != (args.source_dir is None), "Give one of --manifest and --source_dir"
+    if args.granularity not in ('frame', 'utterance'):
+        raise ValueError("Unknown granularity: {}".format(args.granularity))
+
+    items = read_manifest(args)
+    parts = make_parts(items, args)
+    parts_dir = args.save_path + '.parts'
+    os.makedirs(parts_dir, exist_ok=True)
+
+    # a resumed run must cut the files into the same parts
+    plan = {'num_files': len(items), 'part_size': args.part_size, 'granularity': args.granularity,
+            'max_tokens': args.max_tokens, 'batch_size': args.batch_size}
+    plan_file = os.path.join(parts_dir, 'plan.json')
+    if os.path.exists(plan_file):
+        with open(plan_file) as f:
+            assert json.load(f) == plan, "{} was written with other options, remove it to start again".format(parts_dir)
+    else:
+        with open(plan_file, 'w') as f:
+            json.dump(plan, f)
+
+    part_files = [os.path.join(parts_dir, 'part-%05d.npz' % i) for i in range(len(parts))]
+    todo = [i for i in range(len(parts)) if not os.path.exists(part_files[i])]
+    print("{} files in {} parts, {} parts to extract".format(len(items), len(parts), len(todo)))
+
+    if todo:
+        model_path = UserDirModule(args.model_dir)
+        fairseq.utils.import_user_module(model_path)
+        model, cfg, task = fairseq.checkpoint_utils.load_model_ensemble_and_task([args.checkpoint_dir])
+        model = model[0]
+        model.eval()
+        model.to(args.device)
+
+        dataset = WavDataset(items, task.cfg.normalize)
+        batches = [batch for i in todo for batch in parts[i]]
+        loader = torch.utils.data.DataLoader(
+            dataset, batch_sampler=batches, collate_fn=WavDataset.collator,
+            num_workers=args.num_workers, pin_memory=args.device != 'cpu')
+
+        part_iter = iter(todo)
+        part_idx = next(part_iter)
+        num_batches, part_indices, part_feats = 0, [], []
+        with torch.no_grad():
+            for indices, source, padding_mask in loader:
+                source = source.to(args.device, non_blocking=True)
+                if padding_mask is not None:
+                    padding_mask = padding_mask.to(args.device, non_blocking=True)
+                res = model.extract_features(source, padding_mask=padding_mask, remove_extra_tokens=True)
+                feats = res['x'].float().cpu().numpy()
+                if res['padding_mask'] is not None:
+                    feat_lengths = (~res['padding_mask']).sum(-1).tolist()
+                else:
+                    feat_lengths = [feats.shape[1]] * len(indices)
+                for i, index in enumerate(indices):
+                    feat = feats[i, :feat_lengths[i]]
+                    if args.granularity == 'utterance':
+                        feat = np.mean(feat, axis=0, keepdims=True)
+                    part_indices.append(index)
+                    part_feats.append(feat)
+
+                num_batches += 1
+                if num_batches == len(parts[part_idx]):
+                    save_part(part_files[part_idx], part_indices, part_feats)
+                    print("saved {}".format(part_files[part_idx]))
+                    num_batches, part_indices, part_feats = 0, [], []
+                    part_idx = next(part_iter, None)
+
+    assemble(parts_dir, len(parts), items, args.save_path)
+    shutil.rmtree(parts_dir)
+    print("wrote {}.npy and {}.lengths".format(args.save_path, args.save_path))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+# Copyright 3D-Speaker (https://github.com/alibaba-damo-academy/3D-Speaker). All Rights Reserved.
+# Licensed under the Apache License, Version 2.0 (http://www.apache.org/licenses/LICENSE-2.0)
+
+"""
+Benchmark the runtime, peak memory and error of the dense, sparse and two-stage
+spectral clustering modes against the number of sub-segment embeddings N.
+Embeddings are simulated as noisy speaker centroids on the unit sphere, with speaker
+turns of random length. Since all sub-segments have the same duration, the
+segment-level speaker error after optimal label mapping equals the speaker
+confusion part of DER.
+Usage:
+    python local/benchmark_cluster.py --num_segs 2000 5000 15000 --num_spks 8
+"""
+
+import time
+import argparse
+import tracemalloc
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+from speakerlab.process.cluster import SpectralCluster
+
+parser = argparse.ArgumentParser(description='Spectral clustering benchmark.')
+parser.add_argument('--num_segs', nargs='+', type=int, default=[1000, 3000, 6000], help='Numbers of embeddings')
+parser.add_argument('--num_spks', default=8, type=int, help='Num of speakers')
+parser.add_argument('--emb_dim', default=192, type=int, help='Embedding dim')
+parser.add_argument('--noise', default=0.8, type=float, help='Within-speaker noise level')
+parser.add_argument('--pval', default=0.012, type=float, help='pval of SpectralCluster')
+parser.add_argument('--dense_max', default=8000, type=int, help='Skip the dense mode above this N')
+parser.add_argument('--seed', default=0, type=int, help='Random seed')
+
+
+def simulate(num_segs, num_spks, emb_dim, noise, rng):
+    centers = rng.standard_normal((num_spks, emb_dim))
+    centers /= np.linalg.norm(centers, axis=1, keepdims=True)
+    labels = []
+    while len(labels) < num_segs:
+        labels.extend([rng.integers(num_spks)] * rng.integers(5, 60))
+    labels = np.array(labels[:num_segs])
+    X = centers[labels] + noise * rng.standard_normal((num_segs, emb_dim)) / np.sqrt(emb_dim)
+    return X.astype(np.float32), labels
+
+
+def speaker_error(ref, hyp):
+    ref_set, hyp_set = np.unique(ref), np.unique(hyp)
+    cost = np.zeros((len(ref_set), len(hyp_set)))
+    for i, r in enumerate(ref_set):
+        for j, h in enumerate(hyp_set):
+            cost[i, j] = -np.sum((ref == r) & (hyp == h))
+    row, col = linear_sum_assignment(cost)
+    return 1 + cost[row, col].sum() / len(ref)
+
+
+def run(cluster, X):
+    tracemalloc.start()
+    st = time.time()
+    labels = cluster(X)
+    elapsed = time.time() - st
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return labels, elapsed, peak / 1024**2
+
+
+def main(args):
+    rng = np.random.default_rng(args.seed)
+    modes = {
+        'dense': SpectralCluster(max_num_spks=15, pval=args.pval),
+        'sparse': SpectralCluster(max_num_spks=15, pval=args.pval, sparse_line=0),
+        'two-stage': SpectralCluster(max_num_spks=15, pval=args.pval, sparse_line=0,
+                                     refine_line=0, refine_num_centers=1000),
+    }
+    print('%8s %10s %10s %12s %8s %6s' % ('N', 'mode', 'time(s)', 'peak(MiB)', 'error', '#spk'))
+    for num_segs in args.num_segs:
+        X, ref = simulate(num_segs, args.num_spks, args.emb_dim, args.noise, rng)
+        for name, cluster in modes.items():
+            if name == 'dense' and num_segs > args.dense_max:
+                continue
+            if name == 'two-stage' and num_segs <= cluster.refine_num_centers:
+                continue
+            hyp, elapsed, peak = run(cluster, X)
+            print('%8d %10s %10.2f %12.1f %8.4f %6d' % (
+                num_segs, name, elapsed, peak, speaker_error(ref, hyp), len(np.unique(hyp))))
+
+
+if __name__ == '__main__':
+    main(parser.parse_args())
@@ -0,0 +1,96 @@
+# Copyright 3D-Speaker (https://github.com/alibaba-damo-academy/3D-Speaker). All Rights Reserved.
+# Licensed under the Apache License, Version 2.0 (http://www.apache.org/licenses/LICENSE-2.0)
+
+"""
+Benchmark the subsegment embedding extraction of Diarization3Dspeaker with a FBank
+per subsegment (do_emb_extraction) against a FBank shared by the overlapping
+subsegments of each VAD region (do_emb_extraction_shared). The VAD regions are
+simulated as speech turns of random length separated by pauses, and the embedding
+model is a randomly initialized CAM++, so no pretrained model is downloaded. Both
+methods are also timed with the model replaced by a mean pooling of the frames, which
+isolates the FBank front-end. The largest absolute difference between the embeddings
+of both methods is reported.
+Usage:
+    python local/benchmark_emb_extraction.py --durations 60 300 --device cpu
+"""
+
+import time
+import argparse
+import numpy as np
+import torch
+
+from speakerlab.bin.infer_diarization import Diarization3Dspeaker
+from speakerlab.models.campplus.DTDNN import CAMPPlus
+from speakerlab.process.processor import FBank
+
+parser = argparse.ArgumentParser(description='Subsegment embedding extraction benchmark.')
+parser.add_argument('--durations', nargs='+', type=float, default=[60, 300], help='Audio durations in seconds')
+parser.add_argument('--min_turn', default=0.5, type=float, help='Shortest VAD region in seconds')
+parser.add_argument('--max_turn', default=12.0, type=float, help='Longest VAD region in seconds')
+parser.add_argument('--device', default='cpu', type=str, help='Device of the embedding model')
+parser.add_argument('--repeats', default=3, type=int, help='Runs per method, the fastest is reported')
+parser.add_argument('--seed', default=0, type=int, help='Random seed')
+
+
+def build_pipeline(device):
+    # Only the attributes used by the embedding extraction, without the modelscope models.
+    pipeline = Diarization3Dspeaker.__new__(Diarization3Dspeaker)
+    pipeline.device = torch.device(device)
+    pipeline.feature_extractor = FBank(80, 16000, mean_nor=True)
+    pipeline.embedding_model = CAMPPlus(feat_dim=80, embedding_size=192).to(pipeline.device).eval()
+    pipeline.region_feature_extractor = FBank(80, 16000, mean_nor=False)
+    pipeline.batchsize = 64
+    pipeline.fs = 16000
+    return pipeline
+
+
+def mean_pooling(feats):
+    return feats.mean(1)
+
+
+def simulate_vad(duration, min_turn, max_turn, rng):
+    vad_time = []
+    st = rng.uniform(0, 1)
+    while st + min_turn < duration:
+        ed = min(st + rng.uniform(min_turn, max_turn), duration)
+        vad_time.append([round(st, 3), round(ed, 3)])
+        st = ed + rng.uniform(0.2, 2.0)
+    return vad_time
+
+
+def run(fn, repeats):
+    best = float('inf')
+    for _ in range(repeats):
+        st = time.time()
+        embeddings = fn()
+        best = min(best, time.time() - st)
+    return embeddings, best
+
+
+def main(args):
+    rng = np.random.default_rng(args.seed)
+    torch.manual_seed(args.seed)
+    pipeline = build_pipeline(args.device)
+    embedding_model = pipeline.embedding_model
+    print('%10s %8s %8s %14s %14s %16s %16s %10s' % (
+        'dur(s)', '#region', '#subseg', 'per-seg(s)', 'shared(s)',
+        'fbank per-seg(s)', 'fbank shared(s)', 'max|diff|'))
+    for duration in args.durations:
+        wav = torch.from_numpy(rng.standard_normal((1, int(duration * pipeline.fs))).astype(np.float32) * 0.1)
+        vad_time = simulate_vad(duration, args.min_turn, args.max_turn, rng)
+        chunks = [c for (st, ed) in vad_time for c in pipeline.chunk(st, ed)]
+        times = []
+        for model in [embedding_model, mean_pooling]:
+            pipeline.embedding_model = model
+            ref, ref_time = run(lambda: pipeline.do_emb_extraction(chunks, wav), args.repeats)
+            hyp, hyp_time = run(lambda: pipeline.do_emb_extraction_shared(vad_time, chunks, wav), args.repeats)
+            if model is embedding_model:
+                diff = np.abs(ref - hyp).max()
+            times += [ref_time, hyp_time]
+        pipeline.embedding_model = embedding_model
+        print('%10.0f %8d %8d %14.2f %14.2f %16.3f %16.3f %10.2e' % (
+            duration, len(vad_time), len(chunks), *times, diff))
+
+
+if __name__ == '__main__':
+    main(parser.parse_args())
@@ -13,13 +13,17 @@ Processing pipeline:
     2. Active speaker detection (input: consecutive face frames, audio)
     3. Face quality assessment (input: video frames)
     4. Face recognition (input: video frames)
+The video is decoded in a thread and the face detection of the next shot runs in
+another thread, with the frames of a shot detected in one batch. The face tracks
+of a shot are cropped and scored by the active speaker detection in parallel.
 """
 
 
 import numpy as np
 from scipy.io import wavfile
 from scipy.interpolate import interp1d
-import os, time, torch, cv2, pickle, python_speech_features
+from concurrent.futures import ThreadPoolExecutor
+import os, time, queue, threading, torch, cv2, pickle, python_speech_features
 
 import vision_tools.face_detection as face_detection
 import vision_tools.active_speaker_detection as active_speaker_detection
@@ -27,6 +31,27 @@ import vision_tools.face_recognition as face_recognition
 import vision_tools.face_quality_assessment as face_quality_assessment
 
 
+class GrowableArray():
+    """Preallocated array along the first dim, doubled in place when full
+    instead of copied on every append."""
+    def __init__(self, shape, dtype, capacity=1024):
+        self.data = np.empty((capacity,) + tuple(shape), dtype=dtype)
+        self.size = 0
+
+    def extend(self, values):
+        values = np.asarray(values, dtype=self.data.dtype)
+        if self.size + len(values) > len(self.data):
+            capacity = max(2 * len(self.data), self.size + len(values))
+            data = np.empty((capacity,) + self.data.shape[1:], dtype=self.data.dtype)
+            data[:self.size] = self.data[:self.size]
+            self.data = data
+        self.data[self.size:self.size + len(values)] = values
+        self.size += len(values)
+
+    def array(self):
+        return self.data[:self.size]
+
+
 class VisionProcesser():
     def __init__(
         self, 
@@ -62,7 +87,7 @@ class VisionProcesser():
         self.face_embs_extractor = face_recognition.FaceRecIR101(onnx_dir, device, device_id)
 
         # store facial feats along with the necessary information.
-        self.active_facial_embs = {'frameI':np.empty((0,), dtype=int), 'feat':np.empty((0, 512), dtype=np.float32)}
+        self.active_facial_embs = {'frameI':GrowableArray((), int), 'feat':GrowableArray((512,), np.float32)}
 
         self.audio_vad = audio_vad
         self.out_video_path = out_video_path
@@ -74,6 +99,8 @@ class VisionProcesser():
         self.min_face_size = conf['min_face_size']
         self.face_det_stride = conf['face_det_stride']
         self.shot_stride = conf['shot_stride']
+        # threads for the per-track crop, asd and face embedding.
+        self.num_workers = conf.get('num_workers', 4)
 
         if self.out_video_path is not None:
             # save the active face detection results video (for debugging).
@@ -83,6 +110,73 @@ class VisionProcesser():
         self.elapsed_time = {'faceTime':[], 'trackTime':[], 'cropTime':[],'asdTime':[], 'visTime':[], 'featTime':[]}
 
     def run(self):
+        start_time = time.time()
+        # decoder thread -> face detection thread -> tracking, asd and face embedding.
+        shot_queue, det_queue = queue.Queue(maxsize=2), queue.Queue(maxsize=2)
+        threading.Thread(target=self.read_shots, args=(shot_queue,), daemon=True).start()
+        threading.Thread(target=self.detect_shots, args=(shot_queue, det_queue), daemon=True).start()
+        self.pool = ThreadPoolExecutor(max_workers=self.num_workers)
+        num_frames = 0
+        try:
+            while True:
+                item = det_queue.get()
+                if item is None:
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+                frames, audio, frame_st, dets, faceTime = item
+                self.elapsed_time['faceTime'].append(faceTime)
+                self.process_detected_shot(frames, audio, frame_st, dets)
+                num_frames += len(frames)
+        finally:
+            self.pool.shutdown()
+            self.pool = None
+
+        self.cap.release()
+        if self.out_video_path is not None:
+            self.v_out.release()
+
+        active_facial_embs = {'embeddings':self.active_facial_embs['feat'].array(), 'times': self.active_facial_embs['frameI'].array()*0.04}
+        pickle.dump(active_facial_embs, open(self.out_feat_path, 'wb'))
+
+        # print elapsed time, the modules overlap so their sum exceeds the wall time.
+        wall_time = time.time() - start_time
+        for k in self.elapsed_time:
+            self.elapsed_time[k] = sum(self.elapsed_time[k])
+        elapsed_time_msg = 'The total processing time for %s is %.2fs (RTF %.3f), including' % (
+            self.video_id, wall_time, wall_time / max(num_frames / 25, 1e-6))
+        for k in self.elapsed_time:
+            elapsed_time_msg += ' %s %.2fs,'%(k, self.elapsed_time[k])
+        print(elapsed_time_msg[:-1]+'.')
+
+    def read_shots(self, shot_queue):
+        # Decode the frames of the vad intervals and put them into shot_queue by shots.
+        try:
+            for shot in self.iter_shots():
+                shot_queue.put(shot)
+        except BaseException as e:
+            shot_queue.put(e)
+        shot_queue.put(None)
+
+    def detect_shots(self, shot_queue, det_queue):
+        while True:
+            item = shot_queue.get()
+            if item is None or isinstance(item, BaseException):
+                det_queue.put(item)
+                if item is not None:
+                    det_queue.put(None)
+                return
+            frames, face_det_frames, audio, frame_st = item
+            try:
+                curTime = time.time()
+                dets = self.face_detection(face_det_frames)
+                det_queue.put((frames, audio, frame_st, dets, time.time() - curTime))
+            except BaseException as e:
+                det_queue.put(e)
+                det_queue.put(None)
+                return
+
+    def iter_shots(self):
         frames, face_det_frames = [], []
         for [audio_sample_st, audio_sample_ed] in self.audio_vad:
             # frame_st and frame_ed are the starting and ending frames of current interval.
@@ -100,57 +194,41 @@ class VisionProcesser():
                 frames.append(frame)
                 if (index + 1) % self.shot_stride==0:
                     audio = self.audio[(frame_st + index + 1 - self.shot_stride)*640:(frame_st + index + 1)*640]
-                    self.process_one_shot(frames, face_det_frames, audio, frame_st + index + 1 - self.shot_stride)
+                    yield frames, face_det_frames, audio, frame_st + index + 1 - self.shot_stride
                     frames, face_det_frames = [], []
                 index += 1
             if len(frames) != 0:
                 audio = self.audio[(frame_st + index - len(frames))*640:(frame_st + index)*640]
-                self.process_one_shot(frames, face_det_frames, audio, frame_st + index - len(frames))
+                yield frames, face_det_frames, audio, frame_st + index - len(frames)
                 frames, face_det_frames = [], []
 
-        self.cap.release()
-        if self.out_video_path is not None:
-            self.v_out.release()
-
-        active_facial_embs = {'embeddings':self.active_facial_embs['feat'], 'times': self.active_facial_embs['frameI']*0.04}
-        pickle.dump(active_facial_embs, open(self.out_feat_path, 'wb'))
-
-        # print elapsed time
-        all_elapsed_time = 0
-        for k in self.elapsed_time:
-            all_elapsed_time += sum(self.elapsed_time[k])
-            self.elapsed_time[k] = sum(self.elapsed_time[k])
-        elapsed_time_msg = 'The total processing time for %s is %.2fs, including' % (self.video_id, all_elapsed_time)
-        for k in self.elapsed_time:
-            elapsed_time_msg += ' %s %.2fs,'%(k, self.elapsed_time[k])
-        print(elapsed_time_msg[:-1]+'.')
-
     def process_one_shot(self, frames, face_det_frames, audio, frame_st=None):
         curTime = time.time()
         dets = self.face_detection(face_det_frames)
+        self.elapsed_time['faceTime'].append(time.time()-curTime)
+        self.process_detected_shot(frames, audio, frame_st, dets)
+
+    def process_detected_shot(self, frames, audio, frame_st, dets):
         faceTime = time.time()
 
-        allTracks, vidTracks = [], []
-        allTracks.extend(self.track_shot(dets))
+        allTracks = self.track_shot(dets)
         trackTime = time.time()
 
-        for ii, track in enumerate(allTracks):
-            vidTracks.append(self.crop_video(track, frames, audio))
+        vidTracks = list(self.map(lambda track: self.crop_video(track, frames, audio), allTracks))
         cropTime = time.time()
 
         scores = self.evaluate_asd(vidTracks)
         asdTime = time.time()
 
         active_facial_embs = self.evaluate_fr(frames, vidTracks, scores)
-        self.active_facial_embs['frameI'] = np.append(self.active_facial_embs['frameI'], active_facial_embs['frameI'] + frame_st)
-        self.active_facial_embs['feat'] = np.append(self.active_facial_embs['feat'], active_facial_embs['feat'], axis=0)
+        self.active_facial_embs['frameI'].extend(active_facial_embs['frameI'] + frame_st)
+        self.active_facial_embs['feat'].extend(active_facial_embs['feat'])
         featTime = time.time()
 
         if self.out_video_path is not None:
             self.visualization(frames, vidTracks, scores)
         visTime = time.time()
 
-        self.elapsed_time['faceTime'].append(faceTime-curTime)
         self.elapsed_time['trackTime'].append(trackTime-faceTime)
         self.elapsed_time['cropTime'].append(cropTime-trackTime)
         self.elapsed_time['asdTime'].append(asdTime-cropTime)
@@ -158,11 +236,19 @@ class VisionProcesser():
         if self.out_video_path is not None:
             self.elapsed_time['visTime'].append(visTime-featTime)
 
+    def map(self, fn, items):
+        # run fn over items on the worker threads if any, keeping the order.
+        if getattr(self, 'pool', None) is None:
+            return map(fn, items)
+        return self.pool.map(fn, items)
+
     def face_detection(self, frames):
         dets = []
-        for fidx, image in enumerate(frames):
-            image_input = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-            bboxes, _, probs = self.face_detector(image_input, top_k=10, prob_threshold=0.9)
+        if len(frames) == 0:
+            return dets
+        image_inputs = [cv2.cvtColor(image, cv2.COLOR_BGR2RGB) for image in frames]
+        results = self.face_detector.predict_batch(image_inputs, top_k=10, prob_threshold=0.9)
+        for fidx, (bboxes, _, probs) in enumerate(results):
             bboxes = torch.cat([bboxes, probs.reshape(-1, 1)], dim=-1)
             dets.append([])
             for bbox in bboxes:
@@ -243,26 +329,26 @@ class VisionProcesser():
 
     def evaluate_asd(self, tracks):
         # active speaker detection by pretrained TalkNet
-        all_scores = []
-        for ins in tracks:
-            video, audio = ins['data']
-            audio_feature = python_speech_features.mfcc(audio, 16000, numcep = 13, winlen = 0.025, winstep = 0.010)
-            video_feature = []
-            for frame in video:
-                face = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-                face = cv2.resize(face, (224,224))
-                face = face[int(112-(112/2)):int(112+(112/2)), int(112-(112/2)):int(112+(112/2))]
-                video_feature.append(face)
-            video_feature = np.array(video_feature)
-            length = min((audio_feature.shape[0] - audio_feature.shape[0] % 4) / 100, video_feature.shape[0] / 25)
-            audio_feature = audio_feature[:int(round(length * 100)),:]
-            video_feature = video_feature[:int(round(length * 25)),:,:]
-            audio_feature = np.expand_dims(audio_feature, axis=0).astype(np.float32)
-            video_feature = np.expand_dims(video_feature, axis=0).astype(np.float32)
-            score = self.speaker_detector(audio_feature, video_feature)
-            all_score = np.round(score, 1).astype(float)
-            all_scores.append(all_score)	
-        return all_scores
+        return list(self.map(self.evaluate_asd_track, tracks))
+
+    def evaluate_asd_track(self, ins):
+        video, audio = ins['data']
+        audio_feature = python_speech_features.mfcc(audio, 16000, numcep = 13, winlen = 0.025, winstep = 0.010)
+        video_feature = []
+        for frame in video:
+            face = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            face = cv2.resize(face, (224,224))
+            face = face[int(112-(112/2)):int(112+(112/2)), int(112-(112/2)):int(112+(112/2))]
+            video_feature.append(face)
+        video_feature = np.array(video_feature)
+        length = min((audio_feature.shape[0] - audio_feature.shape[0] % 4) / 100, video_feature.shape[0] / 25)
+        audio_feature = audio_feature[:int(round(length * 100)),:]
+        video_feature = video_feature[:int(round(length * 25)),:,:]
+        audio_feature = np.expand_dims(audio_feature, axis=0).astype(np.float32)
+        video_feature = np.expand_dims(video_feature, axis=0).astype(np.float32)
+        score = self.speaker_detector(audio_feature, video_feature)
+        all_score = np.round(score, 1).astype(float)
+        return all_score
 
     def evaluate_fr(self, frames, tracks, scores):
         # extract high-quality facial embeddings 
@@ -276,7 +362,7 @@ class VisionProcesser():
                 face = frames[frame][max(int(bbox[1]), 0):min(int(bbox[3]), frames[frame].shape[0]), max(int(bbox[0]), 0):min(int(bbox[2]), frames[frame].shape[1])]
                 faces[frame].append({'track':tidx, 'score':float(s), 'facedata':face})
 
-        active_facial_embs={'frameI':np.empty((0,), dtype=int), 'feat':np.empty((0, 512), dtype=np.float32)}
+        active_faces = []
         for fidx in range(len(faces)):
             if fidx % self.face_det_stride != 0:
                 continue
@@ -288,15 +374,25 @@ class VisionProcesser():
                     active_face_num += 1
             # process frames containing only one active face.
             if active_face_num == 1:
-                # quality assessment
-                face_quality_score = self.face_quality_evaluator(active_face)
-                if face_quality_score < 0.7:
-                    continue
-                feature = self.face_embs_extractor(active_face)
-                active_facial_embs['frameI'] = np.append(active_facial_embs['frameI'], fidx)
-                active_facial_embs['feat'] = np.append(active_facial_embs['feat'], feature, axis=0)
+                active_faces.append((fidx, active_face))
+
+        frameI, feats = [], []
+        for fidx, feature in zip([i[0] for i in active_faces], self.map(self.extract_face_emb, [i[1] for i in active_faces])):
+            if feature is not None:
+                frameI.append(fidx)
+                feats.append(feature)
+        active_facial_embs = {
+            'frameI':np.array(frameI, dtype=int),
+            'feat':np.concatenate(feats, axis=0) if len(feats) > 0 else np.empty((0, 512), dtype=np.float32)}
         return active_facial_embs
 
+    def extract_face_emb(self, face):
+        # quality assessment
+        face_quality_score = self.face_quality_evaluator(face)
+        if face_quality_score < 0.7:
+            return None
+        return self.face_embs_extractor(face)
+
     def visualization(self, frames, tracks, scores):
         faces = [[] for i in range(len(frames))]
         for tidx, track in enumerate(tracks):
@@ -158,16 +158,31 @@ class Predictor:
         self.filter_threshold = filter_threshold
         self.candidate_size = candidate_size
         self.device = device
+        # exported models often have a fixed batch size of 1
+        self.dynamic_batch = not isinstance(self.ort_net.get_inputs()[0].shape[0], int)
 
     def __call__(self, image, top_k=-1, prob_threshold=None):
-        height, width, _ = image.shape
-        image = self.transform(image)
-        images = image.unsqueeze(0).numpy()
-        # net inference
-        inputs = {self.ort_net.get_inputs()[0].name:images}
-        scores, boxes = self.ort_net.run(None, inputs)
-        boxes = torch.from_numpy(boxes[0])
-        scores = torch.from_numpy(scores[0])
+        return self.predict_batch([image], top_k, prob_threshold)[0]
+
+    def predict_batch(self, images, top_k=-1, prob_threshold=None):
+        # Detect the faces of several images with one net inference if the
+        # onnx model has a dynamic batch dim, else one inference per image.
+        inputs = np.stack([self.transform(image).numpy() for image in images])
+        input_name = self.ort_net.get_inputs()[0].name
+        if self.dynamic_batch:
+            scores, boxes = self.ort_net.run(None, {input_name:inputs})
+        else:
+            outputs = [self.ort_net.run(None, {input_name:inputs[i:i+1]}) for i in range(len(images))]
+            scores = np.concatenate([i[0] for i in outputs])
+            boxes = np.concatenate([i[1] for i in outputs])
+        results = []
+        for i, image in enumerate(images):
+            height, width, _ = image.shape
+            results.append(self.postprocess(
+                torch.from_numpy(scores[i]), torch.from_numpy(boxes[i]), height, width, top_k, prob_threshold))
+        return results
+
+    def postprocess(self, scores, boxes, height, width, top_k=-1, prob_threshold=None):
         if not prob_threshold:
             prob_threshold = self.filter_threshold
         picked_box_probs = []
@@ -0,0 +1,127 @@
+# Copyright 3D-Speaker (https://github.com/alibaba-damo-academy/3D-Speaker). All Rights Reserved.
+# Licensed under the Apache License, Version 2.0 (http://www.apache.org/licenses/LICENSE-2.0)
+
+"""
+Benchmark the training data pipeline (wav reading, augmentation and fbank) built
+from a training config, without the model. Reports the overall samples/sec of the
+dataloader and the samples/sec of every worker, i.e. samples over the time the
+worker spent in the dataset. With --packed_dir, the shards written by
+speakerlab/bin/pack_sv_data.py are read with the same preprocessor and compared to
+the per-file dataset. Optionally compares the per-sample and the batched FFT
+reverberation.
+Usage:
+    python local/benchmark_dataloader.py --config conf/cam++.yaml --data data/3dspeaker/train/train.csv \
+        --noise data/musan/wav.scp --reverb data/rirs/wav.scp --num_workers 8 --num_batches 50 \
+        --packed_dir data/3dspeaker/train/packed
+"""
+
+import sys
+import time
+import argparse
+import torch
+
+from speakerlab.utils.config import build_config
+from speakerlab.utils.builder import build
+from speakerlab.dataset.dataset import PackedWavSVDataset
+from speakerlab.process.augmentation import addreverb, addreverb_batch
+
+parser = argparse.ArgumentParser(description='Training dataloader benchmark.')
+parser.add_argument('--config', default='', type=str, help='Config file for training')
+parser.add_argument('--num_workers', default=8, type=int, help='Num of dataloader workers')
+parser.add_argument('--batch_size', default=64, type=int, help='Batch size')
+parser.add_argument('--num_batches', default=50, type=int, help='Num of batches to load')
+parser.add_argument('--packed_dir', default=None, type=str, help='Also benchmark the packed shards in this dir')
+parser.add_argument('--reverb_batch', action='store_true', help='Also benchmark the batched reverb')
+
+
+class TimedDataset(torch.utils.data.Dataset):
+    def __init__(self, dataset):
+        self.dataset = dataset
+
+    def __len__(self):
+        return len(self.dataset)
+
+    def __getitem__(self, index):
+        st = time.perf_counter()
+        feat, spkid = self.dataset[index]
+        info = torch.utils.data.get_worker_info()
+        worker_id = info.id if info is not None else 0
+        return feat, spkid, worker_id, time.perf_counter() - st
+
+
+class TimedIterableDataset(torch.utils.data.IterableDataset):
+    def __init__(self, dataset):
+        self.dataset = dataset
+
+    def __iter__(self):
+        info = torch.utils.data.get_worker_info()
+        worker_id = info.id if info is not None else 0
+        data_iter = iter(self.dataset)
+        while True:
+            st = time.perf_counter()
+            try:
+                feat, spkid = next(data_iter)
+            except StopIteration:
+                return
+            yield feat, spkid, worker_id, time.perf_counter() - st
+
+
+def benchmark_loader(name, dataset, args):
+    dataloader = torch.utils.data.DataLoader(
+        dataset, batch_size=args.batch_size, shuffle=not isinstance(dataset, torch.utils.data.IterableDataset),
+        num_workers=args.num_workers, persistent_workers=args.num_workers > 0)
+
+    counts, busy = {}, {}
+    num_samples = 0
+    data_iter = iter(dataloader)
+    # the first batch includes the worker startup
+    next(data_iter)
+    st = time.perf_counter()
+    for i, (feats, _, worker_ids, times) in enumerate(data_iter):
+        for worker_id, t in zip(worker_ids.tolist(), times.tolist()):
+            counts[worker_id] = counts.get(worker_id, 0) + 1
+            busy[worker_id] = busy.get(worker_id, 0.) + t
+        num_samples += feats.shape[0]
+        if i + 1 >= args.num_batches:
+            break
+    elapsed = time.perf_counter() - st
+
+    print('%s: %d samples in %.2fs, %.1f samples/sec' % (
+        name, num_samples, elapsed, num_samples / elapsed))
+    for worker_id in sorted(counts):
+        print('  worker %d: %d samples, %.1f samples/sec' % (
+            worker_id, counts[worker_id], counts[worker_id] / busy[worker_id]))
+
+
+def benchmark_reverb(batch_size, wav_len, rir_len=8000, repeat=5):
+    wavs = torch.randn(batch_size, wav_len)
+    rirs = torch.randn(batch_size, rir_len) * torch.exp(-torch.arange(rir_len) / 1000.)
+    st = time.perf_counter()
+    for _ in range(repeat):
+        for i in range(batch_size):
+            addreverb(wavs[i], rirs[i])
+    loop_time = (time.perf_counter() - st) / repeat
+    st = time.perf_counter()
+    for _ in range(repeat):
+        addreverb_batch(wavs, rirs)
+    batch_time = (time.perf_counter() - st) / repeat
+    print('Reverb of %d x %d samples: per-sample %.1f ms, batched %.1f ms' % (
+        batch_size, wav_len, loop_time * 1000, batch_time * 1000))
+
+
+def main():
+    args, overrides = parser.parse_known_args(sys.argv[1:])
+    config = build_config(args.config, overrides)
+
+    dataset = build('dataset', config)
+    benchmark_loader('Per-file dataset', TimedDataset(dataset), args)
+    if args.packed_dir is not None:
+        packed_dataset = PackedWavSVDataset(args.packed_dir, dataset.preprocessor)
+        benchmark_loader('Packed dataset', TimedIterableDataset(packed_dataset), args)
+
+    if args.reverb_batch:
+        benchmark_reverb(args.batch_size, int(config.wav_len * config.sample_rate))
+
+
+if __name__ == '__main__':
+    main()
@@ -3,15 +3,11 @@
 
 import os
 import sys
-import re
 import argparse
-import numpy as np
-from tqdm import tqdm
-from kaldiio import ReadHelper
-from sklearn.metrics.pairwise import cosine_similarity
 
 from speakerlab.utils.utils import get_logger
 from speakerlab.utils.score_metrics import (compute_pmiss_pfa_rbst, compute_eer, compute_c_norm)
+from speakerlab.process.scoring import EmbeddingTable, Trials, CosineScorer
 
 parser = argparse.ArgumentParser(description='Compute score and metrics')
 parser.add_argument('--enrol_data', default='', type=str, help='Enroll data dir')
@@ -21,6 +17,10 @@ parser.add_argument('--trials', nargs='+', help='Trial')
 parser.add_argument('--p_target', default=0.01, type=float, help='p_target in DCF')
 parser.add_argument('--c_miss', default=1, type=float, help='c_miss in DCF')
 parser.add_argument('--c_fa', default=1, type=float, help='c_fa in DCF')
+parser.add_argument('--cohort_data', default=None, type=str, help='Cohort data dir, enables AS-norm')
+parser.add_argument('--top_k', default=300, type=int, help='Num of top cohort scores in AS-norm')
+parser.add_argument('--block_size', default=100000, type=int, help='Num of trials scored per block')
+parser.add_argument('--num_threads', default=4, type=int, help='Num of scoring threads')
 
 def main():
     args = parser.parse_args(sys.argv[1:])
@@ -29,50 +29,23 @@ def main():
     result_path = os.path.join(args.scores_dir, 'result.metrics')
     logger = get_logger(fpath=result_path, fmt = "%(message)s")
 
-    def collect(data_dir):
-        data_dict = {}
-        emb_arks = [os.path.join(data_dir, i) for i in os.listdir(data_dir) if re.search('.ark$',i)]
-        if len(emb_arks) == 0:
-            raise Exception(f'No embedding ark files found in {data_dir}')
-
-        # load embedding data
-        for ark in emb_arks:
-            with ReadHelper(f'ark:{ark}') as reader:
-                for key, array in reader:
-                    data_dict[key] = array
-
-        return data_dict
-
-    enrol_dict = collect(args.enrol_data)
-    test_dict = collect(args.test_data)
+    enrol_table = EmbeddingTable.from_ark_dir(args.enrol_data)
+    if os.path.realpath(args.test_data) == os.path.realpath(args.enrol_data):
+        test_table = enrol_table
+    else:
+        test_table = EmbeddingTable.from_ark_dir(args.test_data)
+    cohort_table = EmbeddingTable.from_ark_dir(args.cohort_data) if args.cohort_data else None
+    scorer = CosineScorer(block_size=args.block_size, num_threads=args.num_threads,
+                          cohort=cohort_table, top_k=args.top_k)
 
     for trial in args.trials:
-        scores = []
-        labels = []
-
         trial_name = os.path.basename(trial)
         score_path = os.path.join(args.scores_dir, f'{trial_name}.score')
-        with open(trial, 'r') as trial_f, open(score_path, 'w') as score_f:
-            lines = trial_f.readlines()
-            for line in tqdm(lines, desc=f'scoring trial {trial_name}'):
-                pair = line.strip().split()
-                enrol_emb, test_emb = enrol_dict[pair[0]], test_dict[pair[1]]
-                cosine_score = cosine_similarity(enrol_emb.reshape(1, -1),
-                                              test_emb.reshape(1, -1))[0][0]
-                # write the score
-                score_f.write(' '.join(pair)+' %.5f\n'%cosine_score)
-                scores.append(cosine_score)
-                if pair[2] == '1' or pair[2] == 'target':
-                    labels.append(1)
-                elif pair[2] == '0' or pair[2] == 'nontarget':
-                    labels.append(0)
-                else:
-                    raise Exception(f'Unrecognized label in {line}.')
+        trials = Trials(trial, enrol_table, test_table)
+        scores = scorer(enrol_table, test_table, trials, score_path)
+        labels = trials.labels
 
         # compute metrics
-        scores = np.array(scores)
-        labels = np.array(labels)
-
         fnr, fpr = compute_pmiss_pfa_rbst(scores, labels)
         eer, thres = compute_eer(fnr, fpr, scores)
         min_dcf = compute_c_norm(fnr,
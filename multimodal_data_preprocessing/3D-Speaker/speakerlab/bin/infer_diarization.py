@@ -30,6 +30,7 @@ except ImportError:
 from speakerlab.utils.builder import build
 from speakerlab.utils.utils import merge_vad, silent_print, download_model_from_modelscope, circle_pad
 from speakerlab.utils.fileio import load_audio
+from speakerlab.process.processor import FBank
 
 os.environ['MODELSCOPE_LOG_LEVEL'] = '40'
 warnings.filterwarnings("ignore")
@@ -98,6 +99,7 @@ def get_cluster_backend():
                 'min_cluster_size': 4,
                 'oracle_num': None,
                 'pval': 0.012,
+                'sparse_line': 4000,
             }
         }
     }
@@ -157,13 +159,15 @@ class Diarization3Dspeaker():
         speaker_num (int, default=None): Specify number of speakers.
         model_cache_dir (str, default=None): If specified, the pretrained model will be downloaded 
             to this directory; only pretrained from modelscope are supported.
+        share_feature (bool, default=True): Compute FBank once per VAD region and take the 
+            overlapping subsegments as windows of it, instead of once per subsegment.
     Usage:
         diarization_pipeline = Diarization3Dspeaker(device, include_overlap, hf_access_token)
         output = diarization_pipeline(input_audio) # input_audio can be a path to a WAV file, a NumPy array, or a PyTorch tensor
         print(output) # output: [[1.1, 2.2, 0], [3.1, 4.1, 1], ..., [st_n, ed_n, speaker_id]]
         diarization_pipeline.save_diar_output('audio.rttm') # or audio.json
     """
-    def __init__(self, device=None, include_overlap=False, hf_access_token=None, speaker_num=None, model_cache_dir=None):
+    def __init__(self, device=None, include_overlap=False, hf_access_token=None, speaker_num=None, model_cache_dir=None, share_feature=True):
         if include_overlap and hf_access_token is None:
             raise ValueError("hf_access_token is required when include_overlap is True.")
 
@@ -181,6 +185,9 @@ class Diarization3Dspeaker():
         self.fs = self.feature_extractor.sample_rate
         self.output_field_labels = None
         self.speaker_num = speaker_num
+        self.share_feature = share_feature
+        self.region_feature_extractor = FBank(
+            self.feature_extractor.n_mels, self.fs, mean_nor=False)
 
     def __call__(self, wav, wav_fs=None, speaker_num=None):
         wav_data = load_audio(wav, wav_fs, self.fs)
@@ -197,7 +204,10 @@ class Diarization3Dspeaker():
         chunks = [c for (st, ed) in vad_time for c in self.chunk(st, ed)]
 
         # stage 3: extract embeddings
-        embeddings = self.do_emb_extraction(chunks, wav_data)
+        if self.share_feature:
+            embeddings = self.do_emb_extraction_shared(vad_time, chunks, wav_data)
+        else:
+            embeddings = self.do_emb_extraction(chunks, wav_data)
 
         # stage 4: clustering
         speaker_num, output_field_labels = self.do_clustering(chunks, embeddings, speaker_num)
@@ -260,6 +270,57 @@ class Diarization3Dspeaker():
         embeddings = torch.cat(embeddings, dim=0).numpy()
         return embeddings
 
+    def do_emb_extraction_shared(self, vad_time, chunks, wav):
+        # vad_time: [[st1, ed1]...]
+        # chunks: [[st1, ed1]...], the subsegments of vad_time
+        # wav: [1, T]
+        max_len = max([int(ed*self.fs) - int(st*self.fs) for st, ed in chunks])
+        embeddings = []
+        batch = []
+        with torch.no_grad():
+            for st, ed in vad_time:
+                for feat in self.region_chunk_feats(st, ed, wav, max_len):
+                    batch.append(feat)
+                    if len(batch) == self.batchsize:
+                        embeddings.append(self.embed_feats(batch))
+                        batch = []
+            if len(batch) > 0:
+                embeddings.append(self.embed_feats(batch))
+        embeddings = torch.cat(embeddings, dim=0).numpy()
+        assert embeddings.shape[0] == len(chunks)
+        return embeddings
+
+    def region_chunk_feats(self, st, ed, wav, max_len, dur=1.5, step=0.75):
+        # Yield the FBank of every subsegment of the region [st, ed], in the order of self.chunk.
+        # Kaldi fbank frames only depend on their own 25ms window, so the frames of a full
+        # subsegment are a slice of the frames of the whole region, if the subsegment starts
+        # on the frame grid of the region (the float start times may be one sample off it).
+        # The other subsegments are circle-padded and computed on their own, as in do_emb_extraction.
+        frame_shift = int(0.01 * self.fs)
+        frame_length = int(0.025 * self.fs)
+        num_frames = 1 + (max_len - frame_length) // frame_shift
+        region_st = int(st*self.fs)
+        region_feats = None
+        for subseg_st, subseg_ed in self.chunk(st, ed, dur, step):
+            offset, remainder = divmod(int(subseg_st*self.fs) - region_st, frame_shift)
+            if subseg_st + dur <= ed and remainder == 0:
+                if region_feats is None:
+                    region_wav = wav[0, region_st:int(ed*self.fs)].to(self.device)
+                    region_feats = self.region_feature_extractor(region_wav)
+                if offset + num_frames <= region_feats.shape[0]:
+                    yield region_feats[offset:offset+num_frames]
+                    continue
+            x = wav[0, int(subseg_st*self.fs):int(subseg_ed*self.fs)]
+            x = circle_pad(x, max_len).to(self.device)
+            yield self.region_feature_extractor(x)
+
+    def embed_feats(self, feats):
+        # feats: list of [num_frames, n_mels] tensors, possibly views of a region's FBank
+        feats_batch = torch.stack(feats)
+        if self.feature_extractor.mean_nor:
+            feats_batch = feats_batch - feats_batch.mean(1, keepdim=True)
+        return self.embedding_model(feats_batch).cpu()
+
     def do_clustering(self, chunks, embeddings, speaker_num=None):
         cluster_labels = self.cluster(
             embeddings, 
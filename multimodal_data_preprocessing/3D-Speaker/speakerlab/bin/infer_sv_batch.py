@@ -6,13 +6,19 @@ This script will download pretrained models from modelscope (https://www.modelsc
 based on the given model id, and extract embeddings from input wav list, designed for large-scale 
 embedding extraction. 
 Please pre-install "modelscope".
+With --dynamic_batch, each utterance is split into equal chunks of at most 10s
+instead of being circle-padded to whole 10s chunks, and the chunks are sorted by
+length and batched under a frame budget, so that short clips are not padded.
+With --resume, the wavs whose embeddings are already in the output dir are skipped.
 Usage:
     `python infer_sv_batch.py --model_id $model_id --wavs $wav_list --feat_out_dir $feat_out_dir`
+    `python infer_sv_batch.py --model_id $model_id --wavs $wav_list --feat_out_dir $feat_out_dir --dynamic_batch --resume`
 """
 
 import os
 import sys
 import re
+import time
 import pathlib
 import numpy as np
 from tqdm import tqdm
@@ -41,6 +47,10 @@ parser.add_argument('--local_model_dir', default='pretrained', type=str, help='L
 parser.add_argument('--feat_out_dir', default='', type=str, help='Feat out dir')
 parser.add_argument('--feat_out_format', choices=['npy', 'ark'], default='npy', type=str, help='Feat out format, npy or ark')
 parser.add_argument('--batch_size', default=None, type=int, help='Batch size')
+parser.add_argument('--num_workers', default=16, type=int, help='Num of dataloader workers per process')
+parser.add_argument('--dynamic_batch', action='store_true', help='Batch chunks of similar length under a frame budget')
+parser.add_argument('--max_frames', default=None, type=int, help='Max frames per batch in dynamic batching, batch_size*1000 by default')
+parser.add_argument('--resume', action='store_true', help='Skip wavs whose embeddings already exist')
 parser.add_argument('--diable_progress_bar', action='store_true', help='Disable the progress bar')
 
 CAMPPLUS_VOX = {
@@ -256,6 +266,11 @@ def main():
     if args.batch_size is None:
         args.batch_size = conf['batch_size']
     print(f'[INFO]: Set the batch size to {args.batch_size}.')
+    if args.dynamic_batch:
+        if args.max_frames is None:
+            # as many frames as a batch of 10s chunks
+            args.max_frames = args.batch_size * 1000
+        print(f'[INFO]: Use dynamic batching with at most {args.max_frames} frames per batch.')
 
     # recommend using one GPU per process.
     ngpus = torch.cuda.device_count()
@@ -277,14 +292,44 @@ def main():
     args.feat_out_dir.mkdir(exist_ok=True, parents=True)
     print(f'[INFO]: Saving embedding dir is {args.feat_out_dir}')
 
+    if args.resume:
+        done_ids = get_done_ids(args.feat_out_dir, args.feat_out_format)
+        wav_list = [i for i in wav_list if get_wav_id(i) not in done_ids]
+        print(f'[INFO]: Skip {len(done_ids)} existing embeddings, {len(wav_list)} wavs left.')
+        if len(wav_list) == 0:
+            return
+        nprocs = min(len(wav_list), nprocs)
+
     mp.spawn(main_process, nprocs=nprocs, args=(nprocs, args, wav_list, embedding_model))
 
+def get_wav_id(wav_path):
+    return os.path.basename(wav_path).rsplit('.', 1)[0]
+
+def get_done_ids(feat_out_dir, feat_out_format):
+    if feat_out_format == 'npy':
+        return set(i.name[:-len('.npy')] for i in feat_out_dir.glob('*.npy'))
+    done_ids = set()
+    for scp in feat_out_dir.glob('embedding_*.scp'):
+        with open(scp, 'r') as f:
+            done_ids.update(i.split(' ', 1)[0] for i in f if i.strip())
+    return done_ids
+
 def main_process(rank, nprocs, args, wav_list, embedding_model):
     if args.feat_out_format == 'ark':
         save_ark = args.feat_out_dir / f'embedding_{rank}.ark'
         save_scp = args.feat_out_dir / f'embedding_{rank}.scp'
-        assert not save_ark.exists(), f'{save_ark} exists, please remove it manually.'
-        writer = WriteHelper(f'ark,scp:{save_ark},{save_scp}')
+        if args.resume:
+            # resumed runs write new parts
+            part = 0
+            while save_ark.exists():
+                part += 1
+                save_ark = args.feat_out_dir / f'embedding_{rank}.{part}.ark'
+                save_scp = args.feat_out_dir / f'embedding_{rank}.{part}.scp'
+        else:
+            assert not save_ark.exists(), f'{save_ark} exists, please remove it manually.'
+        # flushed after each embedding, so the scp never lists an id whose ark bytes are
+        # not on disk and --resume can trust it after a crash
+        writer = WriteHelper(f'ark,scp,f:{save_ark},{save_scp}')
 
     if not torch.cuda.is_available():
         device = torch.device('cpu')
@@ -293,39 +338,122 @@ def main_process(rank, nprocs, args, wav_list, embedding_model):
         device = torch.device('cuda:%d'%(rank%ngpus))
     embedding_model.to(device)
 
-    wav_dataset = IterWavList(wav_list, rank, nprocs, args.batch_size)
-    data_mp_context = 'fork' if 'fork' in mp.get_all_start_methods() else 'spawn'
+    if args.dynamic_batch:
+        wav_dataset = IterWavChunks(wav_list, rank, nprocs)
+        batch_size = None
+    else:
+        wav_dataset = IterWavList(wav_list, rank, nprocs, args.batch_size)
+        batch_size = 1
+    loader_args = {}
+    if args.num_workers > 0:
+        data_mp_context = 'fork' if 'fork' in mp.get_all_start_methods() else 'spawn'
+        loader_args = {'multiprocessing_context': data_mp_context, 'prefetch_factor': 2}
     wav_loader = torch.utils.data.DataLoader(
         wav_dataset, 
-        batch_size=1, 
-        multiprocessing_context=data_mp_context,
-        num_workers=16, pin_memory=True, prefetch_factor=2)
+        batch_size=batch_size, 
+        num_workers=args.num_workers, pin_memory=True, **loader_args)
     
     if rank == 0 and (not args.diable_progress_bar):
-        pbar = tqdm(total=len(wav_loader))
+        pbar = tqdm(total=len(wav_loader) if not args.dynamic_batch else len(wav_dataset))
         pbar.set_description("Processing")
 
+    def save_embedding(wav_id, wav_embedding):
+        if args.feat_out_format == 'npy':
+            save_path = args.feat_out_dir / f'{wav_id}.npy'
+            if os.path.exists(save_path):
+                print(f'[WARNING]: {save_path} already exists. Overwrite it.')
+            # write then rename, so an interrupted write never leaves a truncated .npy
+            tmp_path = args.feat_out_dir / f'{wav_id}.npy.tmp'
+            with open(tmp_path, 'wb') as f:
+                np.save(f, wav_embedding)
+            os.replace(tmp_path, save_path)
+        elif args.feat_out_format == 'ark':
+            writer(wav_id, wav_embedding)
+
+    num_embeddings = 0
+    num_chunks = 0
+    start_time = time.time()
     with torch.no_grad():
-        for wav_ids, feats, pos in wav_loader:
-            feats = feats.squeeze(0).to(device)
-            embeddings = embedding_model(feats).detach().cpu().numpy()
-            for i in range(len(wav_ids)):
-                wav_id = wav_ids[i][0]
-                wav_embeddings = embeddings[pos[i]:pos[i+1]]
-                wav_embedding = wav_embeddings.mean(0)
-
-                if args.feat_out_format == 'npy':
-                    save_path = args.feat_out_dir / f'{wav_id}.npy'
-                    if os.path.exists(save_path):
-                        print(f'[WARNING]: {save_path} already exists. Overwrite it.')
-                    np.save(save_path, wav_embedding)
-                elif args.feat_out_format == 'ark':
-                    writer(wav_id, wav_embedding)
-
-            if rank == 0 and (not args.diable_progress_bar):
-                pbar.update(len(wav_ids))
+        if args.dynamic_batch:
+            # chunks waiting for a batch: (num_frames, wav_id, feat)
+            pending = []
+            pending_frames = 0
+            # wav_id -> [sum of chunk embeddings, num of chunks, num of chunks left]
+            accumulators = {}
+
+            def run_pending():
+                nonlocal num_embeddings, num_chunks
+                for batch in make_dynamic_batches(pending, args.max_frames):
+                    max_len = batch[-1][0]
+                    feats = torch.stack([circle_pad(i[2], max_len) for i in batch]).to(device)
+                    embeddings = embedding_model(feats).detach().cpu().numpy()
+                    num_chunks += len(batch)
+                    for (_, wav_id, _), embedding in zip(batch, embeddings):
+                        acc = accumulators[wav_id]
+                        acc[0] = acc[0] + embedding
+                        acc[2] -= 1
+                        if acc[2] == 0:
+                            save_embedding(wav_id, acc[0] / acc[1])
+                            del accumulators[wav_id]
+                            num_embeddings += 1
+                            if rank == 0 and (not args.diable_progress_bar):
+                                pbar.update(1)
+                pending.clear()
+
+            for wav_id, feats in wav_loader:
+                accumulators[wav_id] = [0, len(feats), len(feats)]
+                for feat in feats:
+                    pending.append((feat.shape[0], wav_id, feat))
+                    pending_frames += feat.shape[0]
+                # sort within a window of several batches to keep the padding small
+                if pending_frames >= 8 * args.max_frames:
+                    run_pending()
+                    pending_frames = 0
+            run_pending()
+        else:
+            for wav_ids, feats, pos in wav_loader:
+                feats = feats.squeeze(0).to(device)
+                embeddings = embedding_model(feats).detach().cpu().numpy()
+                num_chunks += feats.shape[0]
+                for i in range(len(wav_ids)):
+                    wav_id = wav_ids[i][0]
+                    wav_embeddings = embeddings[pos[i]:pos[i+1]]
+                    wav_embedding = wav_embeddings.mean(0)
+                    save_embedding(wav_id, wav_embedding)
+                num_embeddings += len(wav_ids)
+
+                if rank == 0 and (not args.diable_progress_bar):
+                    pbar.update(len(wav_ids))
     if rank == 0 and (not args.diable_progress_bar):
         pbar.close()
+    if args.feat_out_format == 'ark':
+        writer.close()
+
+    elapsed = time.time() - start_time
+    print(f'[INFO]: Process {rank} extracted {num_embeddings} embeddings ({num_chunks} chunks) '
+          f'in {elapsed:.1f}s, {num_embeddings / max(elapsed, 1e-6):.1f} embeddings/sec.')
+
+
+def make_dynamic_batches(chunks, max_frames):
+    # Sort the chunks by length and group neighbours while the padded batch
+    # stays within max_frames.
+    chunks.sort(key=lambda x: x[0])
+    batch = []
+    for chunk in chunks:
+        if len(batch) > 0 and (len(batch) + 1) * chunk[0] > max_frames:
+            yield batch
+            batch = []
+        batch.append(chunk)
+    if len(batch) > 0:
+        yield batch
+
+
+def circle_pad(x, object_len):
+    # Repeat x along the first dim up to object_len.
+    n = int(np.ceil(object_len / x.shape[0]))
+    if n > 1:
+        x = torch.cat([x for i in range(n)])
+    return x[:object_len]
 
 
 class IterWavList(IterableDataset):
@@ -363,7 +491,7 @@ class IterWavList(IterableDataset):
             except:
                 print(f'[WARNING]: Error reading {data_path}, please check.')
                 continue
-            wav_id = os.path.basename(data_path).rsplit('.', 1)[0]
+            wav_id = get_wav_id(data_path)
             feats = []
             for wav in wavs:
                 feats.append(self.feature_extractor(wav))
@@ -386,13 +514,6 @@ class IterWavList(IterableDataset):
             yield wav_ids, feats, pos
     
     def chunk_wav(self, wav, chunk_sample_size):
-        def circle_pad(wav, object_len):
-            wav_len = wav.shape[0]
-            n = int(np.ceil(object_len/wav_len))
-            wav = [wav for i in range(n)]
-            wav = torch.cat(wav)
-            return wav[:object_len]
-
         n = int(np.ceil(wav.shape[0] / chunk_sample_size))
         wav = circle_pad(wav, n*chunk_sample_size)
         wavs = [wav[i*chunk_sample_size:(i+1)*chunk_sample_size] for i in range(n)]
@@ -402,7 +523,7 @@ class IterWavList(IterableDataset):
     def load_wav(self, wav_path, obj_fs=16000, chunk_size=10, max_load_len=90):
         wav, fs = torchaudio.load(wav_path)
         if fs != obj_fs:
-            print(f'[WARNING]: The sample rate of {wav_file} is not {obj_fs}, resample it.')
+            print(f'[WARNING]: The sample rate of {wav_path} is not {obj_fs}, resample it.')
             wav, fs = torchaudio.sox_effects.apply_effects_tensor(
                 wav, fs, effects=[['rate', str(obj_fs)]]
             )
@@ -411,5 +532,47 @@ class IterWavList(IterableDataset):
         wavs = self.chunk_wav(wav, int(chunk_size*obj_fs))
         return wavs
 
+
+class IterWavChunks(IterWavList):
+    """Yields the chunk features of each utterance for dynamic batching. The
+    fbank of the whole utterance is computed once and split into the fewest
+    equal chunks of at most chunk_size seconds, each mean normalized.
+    """
+    def __init__(self, wav_list, rank=0, world_size=1):
+        super().__init__(wav_list, rank, world_size)
+        self.feature_extractor = FBank(80, sample_rate=16000, mean_nor=False)
+
+    def __iter__(self):
+        self.initialize()
+        for index in self.indexes:
+            data_path = self.data[index]
+            try:
+                feats = self.load_feats(data_path)
+            except:
+                print(f'[WARNING]: Error reading {data_path}, please check.')
+                continue
+            yield get_wav_id(data_path), feats
+
+    def load_feats(self, wav_path, obj_fs=16000, chunk_size=10, max_load_len=90, min_size=1):
+        wav, fs = torchaudio.load(wav_path)
+        if fs != obj_fs:
+            print(f'[WARNING]: The sample rate of {wav_path} is not {obj_fs}, resample it.')
+            wav, fs = torchaudio.sox_effects.apply_effects_tensor(
+                wav, fs, effects=[['rate', str(obj_fs)]]
+            )
+        wav = wav.mean(dim=0)
+        wav = wav[:int(max_load_len*obj_fs)]
+        # very short clips are still circle padded
+        wav = circle_pad(wav, max(wav.shape[0], int(min_size*obj_fs)))
+        feat = self.feature_extractor(wav)
+        # 100 frames per second
+        n = int(np.ceil(feat.shape[0] / (chunk_size*100)))
+        bounds = np.linspace(0, feat.shape[0], n + 1).astype(int)
+        feats = []
+        for st, ed in zip(bounds[:-1], bounds[1:]):
+            feats.append(feat[st:ed] - feat[st:ed].mean(0, keepdim=True))
+        return feats
+
+
 if __name__ == '__main__':
     main()
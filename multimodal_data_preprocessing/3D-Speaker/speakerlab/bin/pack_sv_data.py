@@ -0,0 +1,90 @@
+# Copyright 3D-Speaker (https://github.com/alibaba-damo-academy/3D-Speaker). All Rights Reserved.
+# Licensed under the Apache License, Version 2.0 (http://www.apache.org/licenses/LICENSE-2.0)
+
+"""
+Pack the wav files of a training data csv into a few large shards, to be read by
+speakerlab.dataset.dataset.PackedWavSVDataset instead of opening one file per sample.
+Each shard is a "shard-xxxxx.bin" file of concatenated int16 PCM and a
+"shard-xxxxx.idx" text index with one "key spk offset num_samples" line per csv
+row. Rows of the same wav file point to the same samples, so the shards hold
+every file once. "info.json" is written last, once all the shards are complete;
+shards already written are kept when the packing is run again.
+Usage:
+    python speakerlab/bin/pack_sv_data.py --data data/3dspeaker/train/train.csv \
+        --out_dir data/3dspeaker/train/packed --num_workers 16
+"""
+
+import os
+import sys
+import random
+import argparse
+import numpy as np
+import torchaudio
+from multiprocessing import Pool
+
+from speakerlab.utils.utils import get_logger
+from speakerlab.utils.fileio import load_data_csv, write_json_file
+
+parser = argparse.ArgumentParser(description='Pack training wavs into shards.')
+parser.add_argument('--data', default='', type=str, help='Training data csv')
+parser.add_argument('--out_dir', default='', type=str, help='Output dir of the shards')
+parser.add_argument('--files_per_shard', default=5000, type=int, help='Num of wav files per shard')
+parser.add_argument('--sample_rate', default=16000, type=int, help='Sample rate')
+parser.add_argument('--num_workers', default=8, type=int, help='Num of processes packing shards')
+parser.add_argument('--seed', default=1234, type=int, help='Seed of the file order, mixing speakers across shards')
+
+
+def pack_shard(shard_prefix, path2rows, sample_rate):
+    if os.path.exists(shard_prefix + '.idx'):
+        return shard_prefix
+    index_lines = []
+    offset = 0
+    with open(shard_prefix + '.bin.tmp', 'wb') as f:
+        for path, rows in path2rows:
+            wav, fs = torchaudio.load(path)
+            assert fs == sample_rate, f'Unexpected sample rate {fs} of {path}.'
+            pcm = np.clip(np.round(wav[0].numpy() * 32768), -32768, 32767).astype(np.int16)
+            f.write(pcm.tobytes())
+            for key, spk in rows:
+                index_lines.append('%s %s %d %d\n' % (key, spk, offset, pcm.shape[0]))
+            offset += pcm.shape[0]
+    os.replace(shard_prefix + '.bin.tmp', shard_prefix + '.bin')
+    with open(shard_prefix + '.idx.tmp', 'w') as f:
+        f.writelines(index_lines)
+    # the index is written last and marks the shard as complete
+    os.replace(shard_prefix + '.idx.tmp', shard_prefix + '.idx')
+    return shard_prefix
+
+
+def main():
+    args = parser.parse_args(sys.argv[1:])
+    logger = get_logger()
+    os.makedirs(args.out_dir, exist_ok=True)
+
+    data = load_data_csv(args.data)
+    path2rows = {}
+    for key in data:
+        path2rows.setdefault(data[key]['path'], []).append((key, data[key]['spk']))
+    paths = sorted(path2rows)
+    random.Random(args.seed).shuffle(paths)
+
+    shards = []
+    for i, st in enumerate(range(0, len(paths), args.files_per_shard)):
+        shard_paths = paths[st:st + args.files_per_shard]
+        shards.append((os.path.join(args.out_dir, 'shard-%05d' % i),
+            [(p, path2rows[p]) for p in shard_paths], args.sample_rate))
+    logger.info(f'Packing {len(paths)} wav files of {len(data)} rows into {len(shards)} shards.')
+
+    with Pool(args.num_workers) as pool:
+        for shard_prefix in pool.starmap(pack_shard, shards):
+            logger.info(f'Packed {shard_prefix}.')
+
+    write_json_file(os.path.join(args.out_dir, 'info.json'), {
+        'sample_rate': args.sample_rate,
+        'num_records': len(data),
+        'shards': [os.path.basename(i[0]) for i in shards],
+    })
+
+
+if __name__ == '__main__':
+    main()
@@ -42,8 +42,12 @@ def main():
     # dataset
     train_dataset = build('dataset', config)
     # dataloader
-    train_sampler = torch.utils.data.distributed.DistributedSampler(train_dataset)
-    config.dataloader['args']['sampler'] = train_sampler
+    if isinstance(train_dataset, torch.utils.data.IterableDataset):
+        # packed datasets split the records across ranks themselves
+        train_sampler = train_dataset
+    else:
+        train_sampler = torch.utils.data.distributed.DistributedSampler(train_dataset)
+        config.dataloader['args']['sampler'] = train_sampler
     config.dataloader['args']['batch_size'] = int(config.batch_size / world_size)
     train_dataloader = build('dataloader', config)
 
@@ -1,8 +1,12 @@
 # Copyright 3D-Speaker (https://github.com/alibaba-damo-academy/3D-Speaker). All Rights Reserved.
 # Licensed under the Apache License, Version 2.0 (http://www.apache.org/licenses/LICENSE-2.0)
 
-from torch.utils.data import Dataset
-from speakerlab.utils.fileio import load_data_csv
+import os
+import random
+import numpy as np
+import torch.distributed as dist
+from torch.utils.data import Dataset, IterableDataset, get_worker_info
+from speakerlab.utils.fileio import load_data_csv, load_json_file, load_packed_index
 
 
 class BaseSVDataset(Dataset):
@@ -36,3 +40,81 @@ class WavSVDataset(BaseSVDataset):
 
     def read_file(self, data_file):
         return load_data_csv(data_file)
+
+
+class PackedWavSVDataset(IterableDataset):
+    """Streams the training samples from the shards written by
+    speakerlab/bin/pack_sv_data.py. In every epoch the shard order is shuffled
+    with the same seed on all ranks, the records are dealt to the DDP ranks and
+    then to the dataloader workers in turn, so that every rank gets the same
+    number of records, and each worker shuffles its records through a buffer.
+    """
+
+    def __init__(self, data_dir: str, preprocessor: dict, shuffle_buffer: int = 2000, seed: int = 0):
+        self.info = load_json_file(os.path.join(data_dir, 'info.json'))
+        self.shards = [os.path.join(data_dir, i) for i in self.info['shards']]
+        self.index = [load_packed_index(i + '.idx') for i in self.shards]
+        self.preprocessor = preprocessor
+        assert self.info['sample_rate'] == preprocessor['wav_reader'].sample_rate
+        self.shuffle_buffer = shuffle_buffer
+        self.seed = seed
+        self.epoch = 0
+        if dist.is_available() and dist.is_initialized():
+            self.rank, self.world_size = dist.get_rank(), dist.get_world_size()
+        else:
+            self.rank, self.world_size = 0, 1
+        self.num_records = sum(len(i[0]) for i in self.index)
+
+    def __len__(self):
+        # records per rank, the remainder is dropped
+        return self.num_records // self.world_size
+
+    def set_epoch(self, epoch):
+        self.epoch = epoch
+
+    def __iter__(self):
+        worker_info = get_worker_info()
+        if worker_info is None:
+            worker_id, num_workers = 0, 1
+        else:
+            worker_id, num_workers = worker_info.id, worker_info.num_workers
+        consumer_id = self.rank * num_workers + worker_id
+        rng = random.Random('%d-%d-%d' % (self.seed, self.epoch, consumer_id))
+
+        buffer = []
+        for record in self.get_records(worker_id, num_workers):
+            if len(buffer) < self.shuffle_buffer:
+                buffer.append(record)
+                continue
+            idx = rng.randrange(len(buffer))
+            buffer[idx], record = record, buffer[idx]
+            yield self.process(*record)
+        rng.shuffle(buffer)
+        for record in buffer:
+            yield self.process(*record)
+
+    def get_records(self, worker_id, num_workers):
+        shard_order = list(range(len(self.shards)))
+        random.Random('%d-%d' % (self.seed, self.epoch)).shuffle(shard_order)
+        limit = len(self) * self.world_size
+        base = 0
+        for shard_id in shard_order:
+            spks, offsets, lengths = self.index[shard_id]
+            # global position of each record in this epoch's stream
+            pos = base + np.arange(len(spks))
+            base += len(spks)
+            selected = np.nonzero((pos < limit) & (pos % self.world_size == self.rank)
+                & ((pos // self.world_size) % num_workers == worker_id))[0]
+            if len(selected) == 0:
+                continue
+            data = np.memmap(self.shards[shard_id] + '.bin', dtype=np.int16, mode='r')
+            for i in selected:
+                yield data[offsets[i]:offsets[i] + lengths[i]], spks[i]
+
+    def process(self, pcm, spk):
+        wav, speed_index = self.preprocessor['wav_reader'].from_pcm(pcm)
+        spkid = self.preprocessor['label_encoder'](spk, speed_index)
+        wav = self.preprocessor['augmentations'](wav)
+        feat = self.preprocessor['feature_extractor'](wav)
+
+        return feat, spkid
@@ -1,6 +1,9 @@
 # Copyright 3D-Speaker (https://github.com/alibaba-damo-academy/3D-Speaker). All Rights Reserved.
 # Licensed under the Apache License, Version 2.0 (http://www.apache.org/licenses/LICENSE-2.0)
 
+import os
+import fcntl
+import hashlib
 import torch
 import torchaudio
 from scipy import signal
@@ -15,12 +18,27 @@ def addreverb(wav, rir_wav):
     rir_wav = rir_wav.numpy()
     wav_len = wav.shape[0]
     rir_wav = rir_wav / np.sqrt(np.sum(rir_wav**2))
-    out_wav = signal.convolve(wav, rir_wav,
+    # taps beyond wav_len only reach the discarded tail of the full convolution
+    out_wav = signal.fftconvolve(wav, rir_wav[:wav_len],
                                 mode='full')[:wav_len]
 
     out_wav = out_wav / (np.max(np.abs(out_wav)) + 1e-6)
     return torch.from_numpy(out_wav)
 
+def addreverb_batch(wavs, rir_wavs):
+    # wavs: [B, T], rir_wavs: [B, R] zero-padded to the longest rir.
+    # Same as addreverb on each row, with one batched FFT convolution.
+    wav_len = wavs.shape[1]
+    rir_wavs = rir_wavs / rir_wavs.pow(2).sum(1, keepdim=True).sqrt()
+    rir_wavs = rir_wavs[:, :wav_len]
+    n_fft = wav_len + rir_wavs.shape[1] - 1
+    out_wavs = torch.fft.irfft(
+        torch.fft.rfft(wavs, n=n_fft) * torch.fft.rfft(rir_wavs, n=n_fft),
+        n=n_fft)[:, :wav_len]
+
+    out_wavs = out_wavs / (out_wavs.abs().amax(1, keepdim=True) + 1e-6)
+    return out_wavs
+
 def addnoise(wav, noise=None, snr_high=15, snr_low=0):
     # wav: [T,], noise: [T,]
     if noise is None:
@@ -48,6 +66,78 @@ def addnoise(wav, noise=None, snr_high=15, snr_low=0):
     return torch.from_numpy(out_wav)
 
 
+class WavPool(object):
+    """Waveforms of a wav.scp for random sampling during augmentation.
+    If pool_dir is given, all waveforms are decoded once into a single packed
+    float32 file and read back memory-mapped, so that every dataloader worker
+    and every later run shares the page cache instead of decoding the files
+    again. Otherwise each waveform is loaded from its path when sampled.
+    """
+
+    def __init__(self, wav_scp, pool_dir=None, sample_rate=16000):
+        self.wav_data = load_wav_scp(wav_scp)
+        self.wav_data_keys = list(self.wav_data.keys())
+        self.sample_rate = sample_rate
+        self.use_pool = pool_dir is not None
+        # memory-mapped lazily, after the dataloader workers are forked
+        self.data = None
+        if self.use_pool:
+            self.data_path, self.offsets_path = self.pool_paths(wav_scp, pool_dir)
+            self.build()
+            self.offsets = np.load(self.offsets_path)
+
+    def pool_paths(self, wav_scp, pool_dir):
+        wav_scp = os.path.abspath(wav_scp)
+        digest = hashlib.sha1(('%s %d %d' % (
+            wav_scp, os.stat(wav_scp).st_mtime_ns, self.sample_rate)).encode()).hexdigest()[:16]
+        prefix = os.path.join(pool_dir, '%s_%s' % (
+            os.path.basename(os.path.dirname(wav_scp)), digest))
+        return prefix + '.f32', prefix + '.offsets.npy'
+
+    def build(self):
+        if os.path.exists(self.offsets_path):
+            return
+        os.makedirs(os.path.dirname(self.offsets_path), exist_ok=True)
+        # only one process (e.g. one of the DDP ranks) decodes, the others wait for it
+        with open(self.offsets_path + '.lock', 'w') as lock_f:
+            fcntl.flock(lock_f, fcntl.LOCK_EX)
+            if os.path.exists(self.offsets_path):
+                return
+            offsets = [0]
+            tmp_data_path = self.data_path + '.%d.tmp' % os.getpid()
+            with open(tmp_data_path, 'wb') as f:
+                for key in self.wav_data_keys:
+                    wav, fs = torchaudio.load(self.wav_data[key])
+                    assert fs == self.sample_rate
+                    wav = wav[0].numpy().astype(np.float32)
+                    f.write(wav.tobytes())
+                    offsets.append(offsets[-1] + wav.shape[0])
+            os.replace(tmp_data_path, self.data_path)
+            tmp_offsets_path = self.offsets_path + '.%d.tmp.npy' % os.getpid()
+            np.save(tmp_offsets_path, np.array(offsets, dtype=np.int64))
+            # the offsets file is written last and marks the pool as complete
+            os.replace(tmp_offsets_path, self.offsets_path)
+
+    def sample(self, max_len=None):
+        # Return a random waveform, or a random segment of max_len samples of it.
+        idx = random.randrange(len(self.wav_data_keys))
+        if not self.use_pool:
+            wav, fs = torchaudio.load(self.wav_data[self.wav_data_keys[idx]])
+            assert fs == self.sample_rate
+            return wav[0]
+        if self.data is None:
+            self.data = np.memmap(self.data_path, dtype=np.float32, mode='r')
+        st, ed = int(self.offsets[idx]), int(self.offsets[idx + 1])
+        if max_len is not None and ed - st > max_len:
+            st = random.randint(st, ed - max_len)
+            ed = st + max_len
+        # copy only the selected samples out of the memory map
+        return torch.from_numpy(np.array(self.data[st:ed]))
+
+    def __len__(self):
+        return len(self.wav_data_keys)
+
+
 class NoiseReverbCorrupter(object):
     def __init__(
         self,
@@ -57,21 +147,20 @@ class NoiseReverbCorrupter(object):
         reverb_file=None,
         noise_snr_low=0,
         noise_snr_high=15,
+        pool_dir=None,
     ):
         if reverb_prob > 0.0:
             if reverb_file is None:
                 raise ValueError('Reverb_file not be assigned.')
             self.add_reverb = addreverb
-            self.reverb_data = load_wav_scp(reverb_file)
-            self.reverb_data_keys = list(self.reverb_data.keys())
+            self.reverb_pool = WavPool(reverb_file, pool_dir)
 
         if noise_prob > 0.0:
             if noise_file is None:
                 raise ValueError('Noise_file not be assigned.')
 
             self.add_noise = addnoise
-            self.noise_data = load_wav_scp(noise_file)
-            self.noise_data_keys = list(self.noise_data.keys())
+            self.noise_pool = WavPool(noise_file, pool_dir)
 
         self.reverb_prob = reverb_prob
         self.noise_prob = noise_prob
@@ -80,16 +169,14 @@ class NoiseReverbCorrupter(object):
 
     def __call__(self, wav, fs=16000):
         if self.reverb_prob > random.random():
-            reverb_path =  self.reverb_data[random.choice(self.reverb_data_keys)]
-            reverb, fs_rir = torchaudio.load(reverb_path)
-            assert fs_rir == fs
-            wav = self.add_reverb(wav, reverb[0])
+            assert self.reverb_pool.sample_rate == fs
+            reverb = self.reverb_pool.sample()
+            wav = self.add_reverb(wav, reverb)
         if self.noise_prob > random.random():
-            noise_path =  self.noise_data[random.choice(self.noise_data_keys)]
-            noise, fs_noise = torchaudio.load(noise_path)
-            assert fs_noise == fs
+            assert self.noise_pool.sample_rate == fs
+            noise = self.noise_pool.sample(max_len=wav.shape[0])
             wav = self.add_noise(
-                wav, noise[0],
+                wav, noise,
                 snr_high=self.noise_snr_high,
                 snr_low=self.noise_snr_low,)
         return wav
@@ -23,19 +23,41 @@ except ImportError:
 class SpectralCluster:
     """A spectral clustering method using unnormalized Laplacian of affinity matrix.
     This implementation is adapted from https://github.com/speechbrain/speechbrain.
+
+    For long recordings, two scalable modes are available:
+    - sparse_line: if the number of embeddings is not smaller than it, the pruned
+      affinity is built as a sparse k-NN graph by blocked matrix products and
+      argpartition, and the eigenproblem is solved on the sparse Laplacian. The
+      result is the same affinity as the dense path without the N x N matrices.
+    - refine_line: if the number of embeddings is not smaller than it, the
+      embeddings are first grouped into refine_num_centers k-means micro-clusters,
+      the micro-cluster centroids are spectrally clustered, and every embedding is
+      finally reassigned to the closest speaker centroid.
     """
 
-    def __init__(self, min_num_spks=1, max_num_spks=10, pval=0.02, min_pnum=6, oracle_num=None):
+    def __init__(self, min_num_spks=1, max_num_spks=10, pval=0.02, min_pnum=6, oracle_num=None,
+                 sparse_line=None, block_size=1024, refine_line=None, refine_num_centers=2000):
         self.min_num_spks = min_num_spks
         self.max_num_spks = max_num_spks
         self.min_pnum = min_pnum
         self.pval = pval
         self.k = oracle_num
+        self.sparse_line = sparse_line
+        self.block_size = block_size
+        self.refine_line = refine_line
+        self.refine_num_centers = refine_num_centers
 
     def __call__(self, X, **kwargs):
         pval = kwargs.get('pval', None)
         oracle_num = kwargs.get('speaker_num', None)
 
+        if self.refine_line is not None and X.shape[0] >= self.refine_line \
+            and X.shape[0] > self.refine_num_centers:
+            return self.cluster_then_refine(X, pval, oracle_num)
+
+        if self.sparse_line is not None and X.shape[0] >= self.sparse_line:
+            return self.sparse_cluster(X, pval, oracle_num)
+
         # Similarity matrix computation
         sim_mat = self.get_sim_mat(X)
 
@@ -104,6 +126,104 @@ class SpectralCluster:
         _, labels, _ = k_means(emb, k)
         return labels
 
+    def sparse_cluster(self, X, pval=None, oracle_num=None):
+        # Sparse k-NN affinity, identical to the output of p_pruning
+        sim_mat = self.get_sparse_sim_mat(X, pval)
+
+        # Symmetrization
+        sym_sim_mat = 0.5 * (sim_mat + sim_mat.T)
+
+        # Laplacian calculation
+        laplacian = self.get_sparse_laplacian(sym_sim_mat)
+
+        # Get Spectral Embeddings
+        emb, num_of_spk = self.get_sparse_spec_embs(laplacian, oracle_num)
+
+        # Perform clustering
+        labels = self.cluster_embs(emb, num_of_spk)
+
+        return labels
+
+    def get_sparse_sim_mat(self, X, pval=None):
+        if pval is None:
+            pval = self.pval
+        N = X.shape[0]
+        n_elems = int((1 - pval) * N)
+        n_elems = min(n_elems, N - self.min_pnum)
+        # number of largest similarities kept in each row
+        n_keep = N - n_elems
+
+        X = X.astype(np.float32)
+        X = X / np.linalg.norm(X, axis=1, keepdims=True)
+        indices = np.empty((N, n_keep), dtype=np.int64)
+        values = np.empty((N, n_keep), dtype=np.float32)
+        for st in range(0, N, self.block_size):
+            sim = X[st:st + self.block_size] @ X.T
+            idx = np.argpartition(sim, N - n_keep, axis=1)[:, N - n_keep:]
+            indices[st:st + self.block_size] = idx
+            values[st:st + self.block_size] = np.take_along_axis(sim, idx, axis=1)
+        indptr = np.arange(0, N * n_keep + 1, n_keep)
+        return scipy.sparse.csr_matrix(
+            (values.ravel(), indices.ravel(), indptr), shape=(N, N))
+
+    def get_sparse_laplacian(self, M):
+        M = M.tolil()
+        M.setdiag(0)
+        M = M.tocsr()
+        M.eliminate_zeros()
+        D = np.asarray(abs(M).sum(axis=1)).ravel()
+        L = scipy.sparse.diags(D) - M
+        return L.tocsr()
+
+    def get_sparse_spec_embs(self, L, k_oracle=None):
+        if k_oracle is None:
+            k_oracle = self.k
+
+        # The smallest eigenvalues of L are the largest of (c*I - L), where c bounds
+        # the spectrum (Gershgorin), which Lanczos finds much faster on sparse input.
+        c = 2 * L.diagonal().max() + 1.0
+        shifted = scipy.sparse.diags(np.full(L.shape[0], c)) - L
+        k = min(self.max_num_spks + 1, L.shape[0] - 1)
+        lambdas, eig_vecs = scipy.sparse.linalg.eigsh(shifted, k=k, which='LA')
+        lambdas = c - lambdas
+        order = np.argsort(lambdas)
+        lambdas, eig_vecs = lambdas[order], eig_vecs[:, order]
+
+        if k_oracle is not None:
+            num_of_spk = k_oracle
+        else:
+            lambda_gap_list = self.getEigenGaps(
+                lambdas[self.min_num_spks - 1:self.max_num_spks + 1])
+            num_of_spk = np.argmax(lambda_gap_list) + self.min_num_spks
+
+        emb = eig_vecs[:, :num_of_spk]
+        return emb, num_of_spk
+
+    def cluster_then_refine(self, X, pval=None, oracle_num=None):
+        # Stage 1: compress the embeddings into micro-clusters
+        norm_X = X / np.linalg.norm(X, axis=1, keepdims=True)
+        centers, micro_labels, _ = k_means(
+            norm_X, self.refine_num_centers, n_init=1, random_state=0)
+
+        # Stage 2: spectral clustering of the micro-cluster centroids
+        if self.sparse_line is not None and centers.shape[0] >= self.sparse_line:
+            center_labels = self.sparse_cluster(centers, pval, oracle_num)
+        else:
+            sim_mat = self.get_sim_mat(centers)
+            prunned_sim_mat = self.p_pruning(sim_mat, pval)
+            sym_prund_sim_mat = 0.5 * (prunned_sim_mat + prunned_sim_mat.T)
+            laplacian = self.get_laplacian(sym_prund_sim_mat)
+            emb, num_of_spk = self.get_spec_embs(laplacian, oracle_num)
+            center_labels = self.cluster_embs(emb, num_of_spk)
+        labels = center_labels[micro_labels]
+
+        # Refinement: reassign every embedding to the closest speaker centroid
+        cset = np.unique(labels)
+        spk_centers = np.stack([norm_X[labels == i].mean(0) for i in cset])
+        spk_centers = spk_centers / np.linalg.norm(spk_centers, axis=1, keepdims=True)
+        labels = cset[np.argmax(norm_X @ spk_centers.T, axis=1)]
+        return labels
+
     def getEigenGaps(self, eig_vals):
         eig_vals_gap_list = []
         for i in range(len(eig_vals) - 1):
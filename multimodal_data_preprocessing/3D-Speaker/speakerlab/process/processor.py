@@ -3,6 +3,7 @@
 
 import random
 import pickle
+import numpy as np
 import torch
 import torchaudio
 import torch.nn.functional as F
@@ -18,30 +19,58 @@ class WavReader(object):
         duration: float = 3.0,
         speed_pertub: bool = False,
         lm: bool = True,
+        seek_crop: bool = True,
     ):
         self.duration = duration
         self.sample_rate = sample_rate
         self.speed_pertub = speed_pertub
         self.lm = lm
+        self.speeds = [1.0, 0.9, 1.1]
+        # read only the random crop from the file instead of decoding all of it
+        self.seek_crop = seek_crop
+        self.num_frames = {}
 
     def __call__(self, wav_path):
-        wav, sr = torchaudio.load(wav_path)
-        assert sr == self.sample_rate
-        wav = wav[0]
+        speed_idx = self.sample_speed()
+        if self.seek_crop:
+            wav = self.read_crop(wav_path, self.crop_len(speed_idx))
+        else:
+            wav, sr = torchaudio.load(wav_path)
+            assert sr == self.sample_rate
+            wav = wav[0]
+
+        return self.perturb_and_crop(wav, speed_idx), speed_idx
 
+    def from_pcm(self, pcm):
+        # Same as __call__, on an int16 waveform already in memory, e.g. a packed record.
+        speed_idx = self.sample_speed()
+        crop_len = self.crop_len(speed_idx)
+        start = random.randint(0, max(0, pcm.shape[0] - crop_len))
+        wav = torch.from_numpy(pcm[start:start + crop_len].astype(np.float32) / 32768)
+
+        return self.perturb_and_crop(wav, speed_idx), speed_idx
+
+    def sample_speed(self):
         if self.speed_pertub and self.lm:
-            speeds = [1.0, 0.9, 1.1]
-            speed_idx = random.randint(0, 2)
-            if speed_idx > 0:
-                wav, _ = torchaudio.sox_effects.apply_effects_tensor(
-                    wav.unsqueeze(0), self.sample_rate, [['speed', str(speeds[speed_idx])], ['rate', str(self.sample_rate)]])
-        else:
-            speed_idx = 0
+            return random.randint(0, 2)
+        return 0
+
+    def crop_len(self, speed_idx):
+        chunk_len = int(self.duration * self.sample_rate)
+        if speed_idx > 0:
+            # 10ms margin so that the speed perturbed crop still covers chunk_len
+            return int(chunk_len * self.speeds[speed_idx]) + self.sample_rate // 100
+        return chunk_len
+
+    def perturb_and_crop(self, wav, speed_idx):
+        if speed_idx > 0:
+            wav, _ = torchaudio.sox_effects.apply_effects_tensor(
+                wav.unsqueeze(0), self.sample_rate, [['speed', str(self.speeds[speed_idx])], ['rate', str(self.sample_rate)]])
 
         wav = wav.squeeze(0)
         data_len = wav.shape[0]
 
-        chunk_len = int(self.duration * sr)
+        chunk_len = int(self.duration * self.sample_rate)
         if data_len >= chunk_len:
             start = random.randint(0, data_len - chunk_len)
             end = start + chunk_len
@@ -49,7 +78,24 @@ class WavReader(object):
         else:
             wav = F.pad(wav, (0, chunk_len - data_len))
 
-        return wav, speed_idx
+        return wav
+
+    def read_crop(self, wav_path, crop_len):
+        # Read a random crop of crop_len samples (or the whole file if shorter).
+        if wav_path not in self.num_frames:
+            info = torchaudio.info(wav_path)
+            assert info.sample_rate == self.sample_rate
+            self.num_frames[wav_path] = info.num_frames
+        data_len = self.num_frames[wav_path]
+        if data_len <= 0:
+            # the length is unknown from the header for some formats
+            wav, sr = torchaudio.load(wav_path)
+            assert sr == self.sample_rate
+            return wav[0]
+        start = random.randint(0, max(0, data_len - crop_len))
+        wav, sr = torchaudio.load(wav_path, frame_offset=start, num_frames=crop_len)
+        assert sr == self.sample_rate
+        return wav[0]
 
 class SpkLabelEncoder(object):
     def __init__(self, data_file):
@@ -101,22 +147,26 @@ class SpkVeriAug(object):
         aug_prob: float = 0.0,
         noise_file: str = None,
         reverb_file: str = None,
+        pool_dir: str = None,
     ):
         self.aug_prob = aug_prob
         if aug_prob > 0:
             self.add_noise = NoiseReverbCorrupter(
                 noise_prob=1.0,
                 noise_file=noise_file,
+                pool_dir=pool_dir,
                 )
             self.add_rir = NoiseReverbCorrupter(
                 reverb_prob=1.0,
                 reverb_file=reverb_file,
+                pool_dir=pool_dir,
                 )
             self.add_rir_noise = NoiseReverbCorrupter(
                 noise_prob=1.0,
                 reverb_prob=1.0,
                 noise_file=noise_file,
                 reverb_file=reverb_file,
+                pool_dir=pool_dir,
                 )
 
             self.augmentations = [self.add_noise, self.add_rir, self.add_rir_noise]
@@ -0,0 +1,140 @@
+# Copyright 3D-Speaker (https://github.com/alibaba-damo-academy/3D-Speaker). All Rights Reserved.
+# Licensed under the Apache License, Version 2.0 (http://www.apache.org/licenses/LICENSE-2.0)
+
+import os
+import re
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+
+class EmbeddingTable(object):
+    """L2-normalized embeddings packed in one contiguous [N, D] float32 matrix,
+    with a key -> row index map.
+    """
+
+    def __init__(self, keys, embeddings):
+        self.keys = list(keys)
+        self.key2idx = {k: i for i, k in enumerate(self.keys)}
+        if len(self.key2idx) != len(self.keys):
+            raise ValueError('Duplicate embedding keys found.')
+        embs = np.ascontiguousarray(embeddings, dtype=np.float32).reshape(len(self.keys), -1)
+        norm = np.linalg.norm(embs, axis=1, keepdims=True)
+        self.embs = embs / np.maximum(norm, 1e-12)
+
+    @classmethod
+    def from_ark_dir(cls, data_dir):
+        from kaldiio import ReadHelper
+        emb_arks = [os.path.join(data_dir, i) for i in os.listdir(data_dir) if re.search('.ark$',i)]
+        if len(emb_arks) == 0:
+            raise Exception(f'No embedding ark files found in {data_dir}')
+        keys, embs = [], []
+        for ark in sorted(emb_arks):
+            with ReadHelper(f'ark:{ark}') as reader:
+                for key, array in reader:
+                    keys.append(key)
+                    embs.append(array.reshape(-1))
+        return cls(keys, np.stack(embs))
+
+    def index(self, keys):
+        return np.fromiter((self.key2idx[k] for k in keys), dtype=np.int64, count=len(keys))
+
+    def __len__(self):
+        return len(self.keys)
+
+
+class Trials(object):
+    """Trial list mapped to row indices of the enrol and test tables once.
+    Each line is "enrol_key test_key label", label being 1/target or 0/nontarget.
+    """
+
+    def __init__(self, trial_file, enrol_table, test_table):
+        self.pairs = []
+        labels = []
+        with open(trial_file, 'r') as f:
+            for line in f:
+                pair = line.split()
+                if len(pair) == 0:
+                    continue
+                if pair[2] == '1' or pair[2] == 'target':
+                    labels.append(1)
+                elif pair[2] == '0' or pair[2] == 'nontarget':
+                    labels.append(0)
+                else:
+                    raise Exception(f'Unrecognized label in {line}.')
+                self.pairs.append(' '.join(pair))
+        self.labels = np.array(labels, dtype=np.int64)
+        self.enrol_idx = enrol_table.index([i.split(' ', 1)[0] for i in self.pairs])
+        self.test_idx = test_table.index([i.split(' ', 2)[1] for i in self.pairs])
+
+    def __len__(self):
+        return len(self.pairs)
+
+
+class CosineScorer(object):
+    """Cosine scoring of trials as blocked row-wise dot products of
+    normalized embedding matrices, with optional adaptive symmetric score
+    normalization (AS-norm) using the top_k closest cohort embeddings.
+    Args:
+        block_size: number of trials scored per block.
+        num_threads: number of threads scoring blocks in parallel.
+        cohort: EmbeddingTable of cohort embeddings, enables AS-norm.
+        top_k: number of top cohort scores used for the AS-norm statistics.
+    """
+
+    def __init__(self, block_size=100000, num_threads=1, cohort=None, top_k=300):
+        self.block_size = block_size
+        self.num_threads = num_threads
+        self.cohort = cohort
+        self.top_k = top_k
+
+    def __call__(self, enrol_table, test_table, trials, score_file=None):
+        blocks = [(st, min(st + self.block_size, len(trials)))
+                  for st in range(0, len(trials), self.block_size)]
+
+        if self.cohort is not None:
+            enrol_stats = self.cohort_stats(enrol_table.embs, np.unique(trials.enrol_idx))
+            test_stats = self.cohort_stats(test_table.embs, np.unique(trials.test_idx))
+        else:
+            enrol_stats, test_stats = None, None
+
+        def score_block(block):
+            st, ed = block
+            e_idx, t_idx = trials.enrol_idx[st:ed], trials.test_idx[st:ed]
+            scores = np.einsum('ij,ij->i', enrol_table.embs[e_idx], test_table.embs[t_idx])
+            if enrol_stats is not None:
+                scores = 0.5 * ((scores - enrol_stats[0][e_idx]) / enrol_stats[1][e_idx]
+                                + (scores - test_stats[0][t_idx]) / test_stats[1][t_idx])
+            return scores
+
+        scores = np.empty(len(trials), dtype=np.float32)
+        score_f = open(score_file, 'w') if score_file is not None else None
+        try:
+            with ThreadPoolExecutor(max_workers=self.num_threads) as executor:
+                # map() keeps the block order, so scores are streamed in trial order
+                for (st, ed), block_scores in zip(blocks, executor.map(score_block, blocks)):
+                    scores[st:ed] = block_scores
+                    if score_f is not None:
+                        self.write_block(score_f, trials, st, ed, block_scores)
+        finally:
+            if score_f is not None:
+                score_f.close()
+        return scores
+
+    def cohort_stats(self, embs, used_idx):
+        # Mean and std of the top_k cohort scores of every used embedding, in matrix form.
+        top_k = min(self.top_k, len(self.cohort))
+        mean = np.zeros(embs.shape[0], dtype=np.float32)
+        std = np.ones(embs.shape[0], dtype=np.float32)
+        # at most 2^24 cohort scores (64MB) in memory at once
+        cohort_block = max(1, (1 << 24) // len(self.cohort))
+        for st in range(0, len(used_idx), cohort_block):
+            idx = used_idx[st:st + cohort_block]
+            sim = embs[idx] @ self.cohort.embs.T
+            top = np.partition(sim, sim.shape[1] - top_k, axis=1)[:, -top_k:]
+            mean[idx] = top.mean(1)
+            std[idx] = np.maximum(top.std(1), 1e-6)
+        return mean, std
+
+    def write_block(self, score_f, trials, st, ed, scores):
+        score_f.write(''.join(
+            '%s %.5f\n' % (pair, score) for pair, score in zip(trials.pairs[st:ed], scores)))
@@ -49,6 +49,18 @@ def load_wav_scp(fpath):
     return result
 
 
+def load_packed_index(fpath):
+    # Index of a packed shard, one "key spk offset num_samples" line per record.
+    spks, offsets, lengths = [], [], []
+    with open(fpath) as f:
+        for line in f:
+            _, spk, offset, num_samples = line.split()
+            spks.append(spk)
+            offsets.append(int(offset))
+            lengths.append(int(num_samples))
+    return spks, np.array(offsets, dtype=np.int64), np.array(lengths, dtype=np.int64)
+
+
 def load_json_file(json_file):
     with codecs.open(json_file, "r", encoding="utf-8") as fr:
         data_dict = json.load(fr)
@@ -0,0 +1,80 @@
+import argparse
+import importlib
+import time
+
+import numpy as np
+import torch
+
+from utmosv2._settings._config import Config
+from utmosv2.dataset.multi_spec import _make_spctrogram
+from utmosv2.transform import MultiSpecFrontend
+
+
+def _librosa_frontend(cfg: Config, crops: np.ndarray) -> torch.Tensor:
+    # Mirrors `MultiSpecDataset._make_specs` for pre-selected crops.
+    specs = []
+    for frame in crops:
+        for i, spec_cfg in enumerate(cfg.dataset.specs):
+            spec = _make_spctrogram(cfg, spec_cfg, frame[0])
+            if frame.shape[0] > 1:
+                spec2 = _make_spctrogram(cfg, spec_cfg, frame[1 + i])
+                lmd = np.random.beta(
+                    cfg.dataset.spec_frames.mixup_alpha,
+                    cfg.dataset.spec_frames.mixup_alpha,
+                )
+                spec = lmd * spec + (1 - lmd) * spec2
+            spec = np.stack([spec, spec, spec], axis=0)
+            spec_tensor = cfg.transform["valid"](
+                torch.tensor(spec, dtype=torch.float32)
+            )
+            specs.append(spec_tensor)
+    return torch.stack(specs)
+
+
+def main(args: argparse.Namespace) -> None:
+    cfg = importlib.import_module("utmosv2.config." + args.config)
+    torch.set_num_threads(args.num_threads)
+    length = int(cfg.dataset.spec_frames.frame_sec * cfg.sr)
+    num_crops = 1 + (
+        len(cfg.dataset.specs) if cfg.dataset.spec_frames.mixup_inner else 0
+    )
+    waves = np.random.uniform(
+        -0.5,
+        0.5,
+        (args.num_files, cfg.dataset.spec_frames.num_frames, num_crops, length),
+    ).astype(np.float32)
+
+    start = time.perf_counter()
+    for crops in waves:
+        _librosa_frontend(cfg, crops)
+    librosa_sec = (time.perf_counter() - start) / args.num_files
+
+    frontend = MultiSpecFrontend(cfg).eval()
+    with torch.no_grad():
+        start = time.perf_counter()
+        for i in range(0, args.num_files, args.batch_size):
+            frontend(torch.from_numpy(waves[i : i + args.batch_size]))
+    torch_sec = (time.perf_counter() - start) / args.num_files
+
+    print(f"librosa (per sample): {librosa_sec * 1000:.1f} ms/file")
+    print(
+        f"torch (batch_size={args.batch_size}): {torch_sec * 1000:.1f} ms/file "
+        f"({librosa_sec / torch_sec:.2f}x)"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Per-file CPU cost of the librosa and torch spectrogram front-ends."
+    )
+    parser.add_argument(
+        "-c", "--config", type=str, default="fusion_stage3", help="config file name"
+    )
+    parser.add_argument(
+        "-n", "--num_files", type=int, default=32, help="number of files"
+    )
+    parser.add_argument("-b", "--batch_size", type=int, default=16, help="batch size")
+    parser.add_argument(
+        "-t", "--num_threads", type=int, default=1, help="number of torch threads"
+    )
+    main(parser.parse_args())
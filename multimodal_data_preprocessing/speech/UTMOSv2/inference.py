@@ -6,6 +6,7 @@ import torch
 
 from utmosv2._settings import configure_defaults, configure_inference_args
 from utmosv2._settings._config import Config
+from utmosv2.dataset import AudioCache
 from utmosv2.runner import run_inference
 from utmosv2.utils import (
     get_dataloader,
@@ -28,6 +29,12 @@ def main(cfg: Config) -> None:
     cfg.print_config = True  # type: ignore
 
     test_preds = np.zeros(data.shape[0])
+    # Decoded waveforms are reused across folds and TTA cycles.
+    audio_cache = (
+        AudioCache(cache_dir=cfg.inference.audio_cache_dir)
+        if cfg.inference.audio_cache_dir
+        else None
+    )
     if cfg.reproduce:
         test_metrics: dict[str, float] = {}
 
@@ -43,7 +50,7 @@ def main(cfg: Config) -> None:
         print(f"+*+*[[Fold {fold + 1}/{cfg.num_folds}]]" + "+*" * 30)
 
         for cycle in range(cfg.inference.num_tta):
-            test_dataset = get_dataset(cfg, data, "test")
+            test_dataset = get_dataset(cfg, data, "test", audio_cache)
             test_dataloader = get_dataloader(cfg, test_dataset, "test")
             test_preds_tta, test_metrics_tta = run_inference(
                 cfg, model, test_dataloader, cycle, data, device
@@ -110,6 +117,13 @@ if __name__ == "__main__":
         default=1,
         help="number of repetitions for prediction",
     )
+    parser.add_argument(
+        "-ac",
+        "--audio_cache_dir",
+        type=str,
+        default=None,
+        help="directory to cache decoded waveforms across folds and repetitions",
+    )
     parser.add_argument(
         "-e",
         "--reproduce",
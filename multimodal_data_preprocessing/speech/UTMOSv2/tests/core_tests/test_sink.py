@@ -0,0 +1,35 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+from utmosv2._core.model._sink import _in_shard, _ResultSink
+
+
+def test_result_sink_resumes_from_csv(tmp_path: Path) -> None:
+    out_path = tmp_path / "mos.csv"
+    sink = _ResultSink(out_path)
+    assert sink.done == set()
+    sink.write([{"file_path": "a.wav", "predicted_mos": 3.5}])
+    sink.write([{"file_path": "b.wav", "predicted_mos": 2.0}])
+    with open(out_path, "a") as f:
+        f.write("c.wa")  # a row cut off by a crash
+    sink = _ResultSink(out_path)
+    assert sink.done == {"a.wav", "b.wav"}
+    sink.write([{"file_path": "c.wav", "predicted_mos": 4.0}])
+    assert _ResultSink(out_path).done == {"a.wav", "b.wav", "c.wav"}
+    with open(out_path, "a") as f:
+        f.write("d.wav,3.1")  # a row cut off in the middle of the score
+    sink = _ResultSink(out_path)
+    assert sink.done == {"a.wav", "b.wav", "c.wav"}
+    sink.write([{"file_path": "d.wav", "predicted_mos": 3.1415}])
+    with open(out_path) as f:
+        assert f.read().splitlines()[-2:] == ["c.wav,4.0", "d.wav,3.1415"]
+    with open(out_path, "a") as f:
+        f.write("e.wav,n/a\n")  # a row whose score is not a number
+    assert _ResultSink(out_path).done == {"a.wav", "b.wav", "c.wav", "d.wav"}
+
+
+def test_in_shard_partitions_files() -> None:
+    files = [Path(f"sys{i:05d}-utt.wav") for i in range(100)]
+    shards = [[f for f in files if _in_shard(f, i, 4)] for i in range(4)]
+    assert sorted(f for shard in shards for f in shard) == sorted(files)
@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import numpy as np
+
+from utmosv2.dataset import AudioCache
+
+
+def _make_file(tmp_path: Path) -> Path:
+    file = tmp_path / "sample.wav"
+    file.write_bytes(b"dummy")
+    return file
+
+
+def test_audio_cache_decodes_once(tmp_path: Path) -> None:
+    file = _make_file(tmp_path)
+    calls = []
+
+    def decode(f: Path) -> np.ndarray:
+        calls.append(f)
+        return np.arange(10, dtype=np.float32)
+
+    cache = AudioCache(max_items=4)
+    y1 = cache.get(file, 16000, decode)
+    y2 = cache.get(file, 16000, decode)
+    assert len(calls) == 1
+    np.testing.assert_array_equal(y1, y2)
+    cache.get(file, 8000, decode)
+    assert len(calls) == 2
+
+
+def test_audio_cache_disk_store(tmp_path: Path) -> None:
+    file = _make_file(tmp_path)
+    calls = []
+
+    def decode(f: Path) -> np.ndarray:
+        calls.append(f)
+        return np.linspace(-1, 1, 100, dtype=np.float32)
+
+    AudioCache(cache_dir=tmp_path / "cache").get(file, 16000, decode)
+    y = AudioCache(cache_dir=tmp_path / "cache").get(file, 16000, decode)
+    assert len(calls) == 1
+    assert isinstance(y, np.memmap)
+    np.testing.assert_allclose(y, np.linspace(-1, 1, 100, dtype=np.float32))
@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+import torch
+
+from utmosv2.dataset.multi_spec import _make_melspec, _make_stft
+from utmosv2.transform import MultiSpecFrontend, Spectrogram
+
+SR = 16000
+
+
+@pytest.mark.parametrize("win_length", [4096, 1024, 512])
+def test_melspec_matches_librosa(win_length: int) -> None:
+    cfg = SimpleNamespace(sr=SR)
+    spec_cfg = SimpleNamespace(
+        mode="melspec",
+        n_fft=4096,
+        hop_length=32,
+        win_length=win_length,
+        n_mels=512,
+        norm=80,
+    )
+    rng = np.random.default_rng(0)
+    y = rng.uniform(-0.5, 0.5, size=(2, int(1.4 * SR)))
+    expected = np.stack([_make_melspec(cfg, spec_cfg, w) for w in y])
+    actual = Spectrogram(SR, spec_cfg)(torch.from_numpy(y)).numpy()
+    np.testing.assert_allclose(actual, expected, atol=1e-6)
+
+
+def test_stft_matches_librosa() -> None:
+    cfg = SimpleNamespace(sr=SR)
+    spec_cfg = SimpleNamespace(mode="stft", n_fft=512, hop_length=128)
+    rng = np.random.default_rng(0)
+    y = rng.uniform(-0.5, 0.5, size=(2, SR))
+    expected = np.stack([_make_stft(cfg, spec_cfg, w) for w in y])
+    actual = Spectrogram(SR, spec_cfg)(torch.from_numpy(y)).numpy()
+    np.testing.assert_allclose(actual, expected, atol=1e-6)
+
+
+def test_multi_spec_frontend_shape() -> None:
+    spec_cfgs = [
+        SimpleNamespace(
+            mode="melspec", n_fft=512, hop_length=64, win_length=w, n_mels=64, norm=80
+        )
+        for w in (512, 256)
+    ]
+    cfg = SimpleNamespace(
+        sr=SR,
+        dataset=SimpleNamespace(
+            specs=spec_cfgs,
+            spec_frames=SimpleNamespace(num_frames=2, mixup_alpha=0.4),
+        ),
+    )
+    waves = torch.rand(3, 2, 1 + len(spec_cfgs), SR)
+    x = MultiSpecFrontend(cfg)(waves)
+    assert x.shape == (3, 2 * len(spec_cfgs), 3, 64, SR // 64 + 1)
+    assert x.stride(2) == 0
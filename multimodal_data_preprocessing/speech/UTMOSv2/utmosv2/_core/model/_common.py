@@ -1,7 +1,9 @@
 from __future__ import annotations
 
 import abc
+import time
 import warnings
+from collections.abc import Iterator
 from pathlib import Path
 from typing import TYPE_CHECKING, Any
 
@@ -10,7 +12,9 @@ import torch
 from torch.cuda.amp import autocast
 from tqdm import tqdm
 
+from utmosv2._core.model._sink import _in_shard, _ResultSink
 from utmosv2._settings._config import Config
+from utmosv2.dataset._cache import AudioCache
 from utmosv2.dataset._schema import DatasetSchema
 from utmosv2.utils import get_dataset
 
@@ -49,6 +53,7 @@ class UTMOSv2ModelMixin(abc.ABC):
         batch_size: int = 16,
         num_repetitions: int = 1,
         remove_silent_section: bool = True,
+        audio_cache: AudioCache | None = None,
         verbose: bool = True,
     ) -> float | list[dict[str, str | float]]:
         """
@@ -77,8 +82,12 @@ class UTMOSv2ModelMixin(abc.ABC):
                 Number of prediction repetitions to average results. Defaults to 1.
             remove_silent_section (bool):
                 Whether to remove silent sections from the audio before prediction. Defaults to True.
+            audio_cache (AudioCache | None):
+                Cache of decoded waveforms. With an in-memory LRU large enough for the files
+                handled by one worker, or an on-disk `cache_dir`, each file is decoded only once
+                and later repetitions only redo the random crop and spectrograms. Defaults to None.
             verbose (bool):
-                Whether to display progress during prediction. Defaults to True.
+                Whether to display progress and throughput during prediction. Defaults to True.
 
         Returns:
             float: If the `input_path` is specified, returns the predicted MOS.
@@ -98,34 +107,169 @@ class UTMOSv2ModelMixin(abc.ABC):
             val_list_path,
             predict_dataset,
         )
+        dataloader = self._make_dataloader(
+            data,
+            num_workers,
+            batch_size,
+            num_repetitions,
+            remove_silent_section,
+            audio_cache,
+        )
+
+        pred = self._predict_impl(dataloader, num_repetitions, device, verbose)
+
+        if input_path is not None:
+            return float(pred[0])
+        else:
+            return [
+                {"file_path": d.file_path.as_posix(), "predicted_mos": float(p)}
+                for d, p in zip(data, pred)
+            ]
+
+    def predict_stream(
+        self,
+        *,
+        input_dir: Path | str,
+        out_path: Path | str | None = None,
+        val_list: list[str] | None = None,
+        val_list_path: Path | str | None = None,
+        predict_dataset: str = "sarulab",
+        device: str | torch.device = "cuda:0",
+        num_workers: int = 4,
+        batch_size: int = 16,
+        chunk_size: int = 1024,
+        num_repetitions: int = 1,
+        remove_silent_section: bool = True,
+        audio_cache: AudioCache | None = None,
+        shard_index: int = 0,
+        num_shards: int = 1,
+        verbose: bool = True,
+    ) -> Iterator[dict[str, str | float]]:
+        """
+        Predict the MOS of the `.wav` files in a directory, yielding the results as they are computed.
+
+        The files are scored in chunks of `chunk_size` files. After each chunk, its results are
+        appended to `out_path` (if given) and then yielded, so that a crash loses at most one chunk.
+        When `out_path` already contains results, the files listed there are skipped, which makes
+        reruns resume where the previous run stopped.
+
+        Args:
+            input_dir (Path | str):
+                Path to a directory of `.wav` files to predict MOS.
+            out_path (Path | str | None):
+                Path to the result store. A path ending with `.parquet` is a directory of Parquet
+                part files (requires `pandas` and `pyarrow`); any other path is a CSV file with the
+                columns `file_path` and `predicted_mos`. Defaults to None (results are only yielded).
+            val_list (list[str] | None):
+                List of filenames to include for prediction. Defaults to None.
+            val_list_path (Path | str | None):
+                Path to a text file containing a list of filenames to include for prediction. Defaults to None.
+            predict_dataset (str):
+                Name of the dataset to associate with the prediction. Defaults to "sarulab".
+            device (str | torch.device):
+                Device to use for prediction (e.g., "cuda:0" or "cpu"). Defaults to "cuda:0".
+            num_workers (int):
+                Number of workers for data loading. Defaults to 4.
+            batch_size (int):
+                Batch size for the data loader. Defaults to 16.
+            chunk_size (int):
+                Number of files scored (with all repetitions) before results are written and yielded.
+                Defaults to 1024.
+            num_repetitions (int):
+                Number of prediction repetitions to average results. Defaults to 1.
+            remove_silent_section (bool):
+                Whether to remove silent sections from the audio before prediction. Defaults to True.
+            audio_cache (AudioCache | None):
+                Cache of decoded waveforms. Defaults to None.
+            shard_index (int):
+                Index of the shard scored by this process. Defaults to 0.
+            num_shards (int):
+                Number of processes sharing the directory. Files are assigned to shards by a stable
+                hash of their name, so every process can be given the same `input_dir` and its own
+                `shard_index` and `out_path`. Defaults to 1.
+            verbose (bool):
+                Whether to display progress during prediction. Defaults to True.
+
+        Yields:
+            dict[str, str | float]: The file path and predicted MOS of each scored file.
+
+        Raises:
+            ValueError: If `shard_index` is not in `[0, num_shards)` or `chunk_size` is not positive.
+        """
+        if not 0 <= shard_index < num_shards:
+            raise ValueError(
+                f"`shard_index` must be in [0, {num_shards}), got {shard_index}"
+            )
+        if chunk_size <= 0:
+            raise ValueError(f"`chunk_size` must be positive, got {chunk_size}")
+        data = self._prepare_data(
+            None,
+            input_dir,
+            val_list,
+            val_list_path,
+            predict_dataset,
+        )
+        if num_shards > 1:
+            data = [d for d in data if _in_shard(d.file_path, shard_index, num_shards)]
+        sink = _ResultSink(Path(out_path)) if out_path is not None else None
+        if sink is not None and sink.done:
+            data = [d for d in data if d.file_path.as_posix() not in sink.done]
+            if verbose:
+                print(f"Skipping {len(sink.done)} files already scored in {out_path}")
+
+        for start in range(0, len(data), chunk_size):
+            chunk = data[start : start + chunk_size]
+            if verbose:
+                print(
+                    f"Chunk {start // chunk_size + 1}: "
+                    f"files {start + 1}-{start + len(chunk)} of {len(data)}"
+                )
+            dataloader = self._make_dataloader(
+                chunk,
+                num_workers,
+                batch_size,
+                num_repetitions,
+                remove_silent_section,
+                audio_cache,
+            )
+            pred = self._predict_impl(dataloader, num_repetitions, device, verbose)
+            results: list[dict[str, str | float]] = [
+                {"file_path": d.file_path.as_posix(), "predicted_mos": float(p)}
+                for d, p in zip(chunk, pred)
+            ]
+            if sink is not None:
+                sink.write(results)
+            yield from results
+
+    def _make_dataloader(
+        self,
+        data: list[DatasetSchema],
+        num_workers: int,
+        batch_size: int,
+        num_repetitions: int,
+        remove_silent_section: bool,
+        audio_cache: AudioCache | None,
+    ) -> torch.utils.data.DataLoader:
         if remove_silent_section:
             initial_state = (
                 hasattr(self._cfg.dataset, "remove_silent_section")
                 and self._cfg.dataset.remove_silent_section
             )
             self._cfg.dataset.remove_silent_section = True
-        dataset = get_dataset(self._cfg, data, self._cfg.phase)
+        dataset = get_dataset(self._cfg, data, self._cfg.phase, audio_cache)
         if remove_silent_section and not initial_state:
             self._cfg.dataset.remove_silent_section = False
 
-        dataloader = torch.utils.data.DataLoader(
+        return torch.utils.data.DataLoader(
             dataset,
             batch_size=batch_size,
             shuffle=False,
             num_workers=num_workers,
             pin_memory=True,
+            # Keep the workers (and their in-memory caches) alive across repetitions.
+            persistent_workers=num_workers > 0 and num_repetitions > 1,
         )
 
-        pred = self._predict_impl(dataloader, num_repetitions, device, verbose)
-
-        if input_path is not None:
-            return float(pred[0])
-        else:
-            return [
-                {"file_path": d.file_path.as_posix(), "predicted_mos": float(p)}
-                for d, p in zip(data, pred)
-            ]
-
     def _prepare_data(
         self,
         input_path: Path | str | None,
@@ -176,13 +320,8 @@ class UTMOSv2ModelMixin(abc.ABC):
             if not res:
                 raise ValueError(f"No wav files found in {input_dir}")
         if val_list is not None:
-            val_list = [d.replace(".wav", "") for d in val_list]
-            res = [
-                d
-                for d in res
-                if d.file_path.as_posix().split("/")[-1].replace(".wav", "")
-                in set(val_list)
-            ]
+            val_set = {d.replace(".wav", "") for d in val_list}
+            res = [d for d in res if d.file_path.name.replace(".wav", "") in val_set]
         if not res:
             raise ValueError(
                 f"None of the data were found in the validation list: {val_list_path}"
@@ -198,6 +337,7 @@ class UTMOSv2ModelMixin(abc.ABC):
     ) -> np.ndarray:
         self.eval().to(device)
         res = 0.0
+        start = time.perf_counter()
         for i in range(num_repetitions):
             pred = []
             pbar = tqdm(
@@ -219,4 +359,11 @@ class UTMOSv2ModelMixin(abc.ABC):
                     pred.append(output.cpu().numpy())
             res += np.concatenate(pred) / num_repetitions
         assert isinstance(res, np.ndarray)
+        if verbose:
+            elapsed = time.perf_counter() - start
+            num_files = len(res)
+            print(
+                f"Scored {num_files} files x {num_repetitions} repetitions "
+                f"in {elapsed:.2f}s ({num_files * num_repetitions / elapsed:.2f} files/s)"
+            )
         return res
@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import csv
+import zlib
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from utmosv2._import import _LazyImport
+
+if TYPE_CHECKING:
+    import pandas as pd
+else:
+    pd = _LazyImport("pandas")
+
+_FIELDS = ["file_path", "predicted_mos"]
+
+
+class _ResultSink:
+    """
+    Append-only store of prediction results used by `UTMOSv2ModelMixin.predict_stream`.
+
+    If `out_path` ends with `.parquet`, it is a directory of Parquet part files
+    (one per flushed chunk, requires `pandas` and `pyarrow`); otherwise it is a CSV file
+    with the columns `file_path` and `predicted_mos`. The file paths already present
+    in the store form the done-set used to skip scored files when a run is resumed.
+    """
+
+    def __init__(self, out_path: Path):
+        self.out_path = out_path
+        self.is_parquet = out_path.suffix == ".parquet"
+        self.done = self._load_done()
+        self._num_parts = (
+            len(list(out_path.glob("part-*.parquet")))
+            if self.is_parquet and out_path.exists()
+            else 0
+        )
+
+    def _load_done(self) -> set[str]:
+        if not self.out_path.exists():
+            return set()
+        if self.is_parquet:
+            done: set[str] = set()
+            for part in sorted(self.out_path.glob("part-*.parquet")):
+                done.update(pd.read_parquet(part, columns=["file_path"])["file_path"])
+            return done
+        with open(self.out_path, "r", newline="") as f:
+            lines = f.readlines()
+        # An unterminated last line was cut off by a crash, possibly in the middle of
+        # the score, so it is scored again.
+        if lines and not lines[-1].endswith("\n"):
+            lines.pop()
+        return {
+            row["file_path"]
+            for row in csv.DictReader(lines)
+            if _is_score(row.get("predicted_mos"))
+        }
+
+    def write(self, results: list[dict[str, str | float]]) -> None:
+        if not results:
+            return
+        if self.is_parquet:
+            self.out_path.mkdir(parents=True, exist_ok=True)
+            part = self.out_path / f"part-{self._num_parts:06d}.parquet"
+            tmp_part = part.with_suffix(".tmp")
+            pd.DataFrame(results, columns=_FIELDS).to_parquet(tmp_part, index=False)
+            # Parts are renamed into place so that a crash never leaves a partial part behind.
+            tmp_part.replace(part)
+            self._num_parts += 1
+        else:
+            self.out_path.parent.mkdir(parents=True, exist_ok=True)
+            if self.out_path.exists():
+                # A row cut off by a crash is dropped, not completed, so that a
+                # partially written score never becomes a valid row.
+                _truncate_partial_line(self.out_path)
+            write_header = (
+                not self.out_path.exists() or self.out_path.stat().st_size == 0
+            )
+            with open(self.out_path, "a", newline="") as f:
+                writer = csv.DictWriter(f, fieldnames=_FIELDS)
+                if write_header:
+                    writer.writeheader()
+                writer.writerows(results)
+                f.flush()
+        self.done.update(str(r["file_path"]) for r in results)
+
+
+def _is_score(value: str | None) -> bool:
+    if value is None:
+        return False
+    try:
+        float(value)
+    except ValueError:
+        return False
+    return True
+
+
+def _truncate_partial_line(path: Path, chunk_size: int = 1 << 16) -> None:
+    # Truncates the file after its last newline, reading backwards from the end.
+    with open(path, "rb+") as f:
+        end = f.seek(0, 2)
+        if end == 0:
+            return
+        f.seek(end - 1)
+        if f.read(1) == b"\n":
+            return
+        pos = end
+        while pos > 0:
+            step = min(chunk_size, pos)
+            pos -= step
+            f.seek(pos)
+            newline = f.read(step).rfind(b"\n")
+            if newline >= 0:
+                f.truncate(pos + newline + 1)
+                return
+        f.truncate(0)
+
+
+def _in_shard(file_path: Path, shard_index: int, num_shards: int) -> bool:
+    # `hash()` is salted per process, so use a stable checksum of the file name instead.
+    return zlib.crc32(file_path.name.encode()) % num_shards == shard_index
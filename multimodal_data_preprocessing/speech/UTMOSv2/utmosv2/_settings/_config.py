@@ -48,6 +48,11 @@ def configure_inference_args(cfg: Config, args: argparse.Namespace) -> None:
     cfg.predict_dataset = args.predict_dataset  # type: ignore
     cfg.final = args.final  # type: ignore
     cfg.inference.num_tta = args.num_repetitions  # type: ignore
+    audio_cache_dir: str | None = getattr(args, "audio_cache_dir", None)
+    if audio_cache_dir:
+        cfg.inference.audio_cache_dir = Path(audio_cache_dir)
+    else:
+        cfg.inference.audio_cache_dir = None
     cfg.reproduce = args.reproduce  # type: ignore
     cfg.out_path = args.out_path and Path(args.out_path)  # type: ignore
     cfg.data_config = None  # type: ignore
@@ -1,8 +1,10 @@
+from utmosv2.dataset._cache import AudioCache
 from utmosv2.dataset.multi_spec import MultiSpecDataset, MultiSpecExtDataset
 from utmosv2.dataset.ssl import SSLDataset, SSLExtDataset
 from utmosv2.dataset.ssl_multispec import SSLLMultiSpecExtDataset
 
 __all__ = [
+    "AudioCache",
     "MultiSpecDataset",
     "MultiSpecExtDataset",
     "SSLLMultiSpecExtDataset",
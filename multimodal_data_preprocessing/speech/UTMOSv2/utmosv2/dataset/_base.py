@@ -11,6 +11,7 @@ from utmosv2._settings._config import Config
 if TYPE_CHECKING:
     import pandas as pd
 
+    from utmosv2.dataset._cache import AudioCache
     from utmosv2.dataset._schema import DatasetSchema
 
 
@@ -21,11 +22,13 @@ class _BaseDataset(torch.utils.data.Dataset, abc.ABC):
         data: "pd.DataFrame" | list[DatasetSchema],
         phase: str,
         transform: dict[str, Callable[[torch.Tensor], torch.Tensor]] | None = None,
+        audio_cache: AudioCache | None = None,
     ):
         self.cfg = cfg
         self.data = data
         self.phase = phase
         self.transform = transform
+        self.audio_cache = audio_cache
 
     def __len__(self) -> int:
         return len(self.data)
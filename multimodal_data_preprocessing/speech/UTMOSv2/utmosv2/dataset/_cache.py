@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import hashlib
+import os
+from collections import OrderedDict
+from collections.abc import Callable
+from pathlib import Path
+
+import numpy as np
+
+
+class AudioCache:
+    """
+    Cache of decoded and resampled waveforms, shared by the dataset branches
+    and by the repetitions of a prediction run.
+
+    Entries are keyed by the resolved file path, its modification time and the
+    target sampling rate, so an edited file or a different `cfg.sr` never hits
+    a stale entry. Two optional storage layers are available:
+
+    - an in-memory LRU holding at most `max_items` waveforms (per process, i.e.
+      per DataLoader worker), and
+    - an on-disk store of `.npy` files under `cache_dir`, opened memory-mapped so
+      that every worker and every later run reads the decoded waveform from the
+      page cache instead of decoding it again.
+
+    Args:
+        max_items (int):
+            Maximum number of waveforms kept in memory. `0` disables the in-memory layer.
+            Defaults to 0.
+        cache_dir (Path | str | None):
+            Directory of the memory-mapped `.npy` store. Defaults to None (disabled).
+    """
+
+    def __init__(self, max_items: int = 0, cache_dir: Path | str | None = None):
+        if max_items < 0:
+            raise ValueError(f"`max_items` must be non-negative, got {max_items}")
+        self.max_items = max_items
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else None
+        if self.cache_dir is not None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._lru: OrderedDict[tuple[str, int, int], np.ndarray] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(
+        self, file: Path, sr: int, decode: Callable[[Path], np.ndarray]
+    ) -> np.ndarray:
+        """
+        Return the waveform of `file` at sampling rate `sr`, decoding it with `decode` on a miss.
+
+        The returned array may be a read-only memory map and must not be modified in place.
+
+        Args:
+            file (Path): Path to the audio file.
+            sr (int): Target sampling rate the waveform is resampled to.
+            decode (Callable[[Path], np.ndarray]): Function decoding and resampling `file`.
+
+        Returns:
+            np.ndarray: The decoded waveform.
+        """
+        key = _make_key(file, sr)
+        if key in self._lru:
+            self._lru.move_to_end(key)
+            self.hits += 1
+            return self._lru[key]
+        y = self._load_from_disk(key)
+        if y is None:
+            self.misses += 1
+            y = decode(file)
+            self._save_to_disk(key, y)
+        else:
+            self.hits += 1
+        if self.max_items > 0:
+            self._lru[key] = y
+            if len(self._lru) > self.max_items:
+                self._lru.popitem(last=False)
+        return y
+
+    def clear(self) -> None:
+        """
+        Drop every in-memory entry. The on-disk store is left untouched.
+        """
+        self._lru.clear()
+
+    def _disk_path(self, key: tuple[str, int, int]) -> Path | None:
+        if self.cache_dir is None:
+            return None
+        digest = hashlib.sha1(repr(key).encode()).hexdigest()
+        return self.cache_dir / digest[:2] / f"{digest}.npy"
+
+    def _load_from_disk(self, key: tuple[str, int, int]) -> np.ndarray | None:
+        path = self._disk_path(key)
+        if path is None or not path.exists():
+            return None
+        return np.load(path, mmap_mode="r")
+
+    def _save_to_disk(self, key: tuple[str, int, int], y: np.ndarray) -> None:
+        path = self._disk_path(key)
+        if path is None:
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, "wb") as f:
+            np.save(f, y)
+        # Atomic so that concurrent workers never observe a partially written file.
+        os.replace(tmp_path, path)
+
+
+def _make_key(file: Path, sr: int) -> tuple[str, int, int]:
+    resolved = Path(file).resolve()
+    return resolved.as_posix(), resolved.stat().st_mtime_ns, sr
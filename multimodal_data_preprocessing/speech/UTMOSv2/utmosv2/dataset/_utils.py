@@ -1,13 +1,25 @@
+from __future__ import annotations
+
 import json
 from pathlib import Path
+from typing import TYPE_CHECKING
 
 import librosa
 import numpy as np
 
 from utmosv2._settings._config import Config
 
+if TYPE_CHECKING:
+    from utmosv2.dataset._cache import AudioCache
+
+
+def load_audio(cfg: Config, file: Path, cache: AudioCache | None = None) -> np.ndarray:
+    if cache is not None and file.suffix in [".wav", ".flac"]:
+        return cache.get(file, cfg.sr, lambda f: _decode_audio(cfg, f))
+    return _decode_audio(cfg, file)
+
 
-def load_audio(cfg: Config, file: Path) -> np.ndarray:
+def _decode_audio(cfg: Config, file: Path) -> np.ndarray:
     if file.suffix in [".wav", ".flac"]:
         y, sr = librosa.load(file, sr=None)
         y = librosa.resample(y, orig_sr=sr, target_sr=cfg.sr)
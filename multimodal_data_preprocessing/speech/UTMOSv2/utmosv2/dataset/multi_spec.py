@@ -20,6 +20,7 @@ from utmosv2.preprocess._preprocess import remove_silent_section
 if TYPE_CHECKING:
     import pandas as pd
 
+    from utmosv2.dataset._cache import AudioCache
     from utmosv2.dataset._schema import DatasetSchema
 
 
@@ -34,6 +35,7 @@ class MultiSpecDataset(_BaseDataset):
         data (list[DatasetSchema] | pd.DataFrame): The dataset containing file paths and labels.
         phase (str): The phase of the dataset, either "train" or any other phase (e.g., "valid").
         transform (str, dict[Callable[[torch.Tensor], torch.Tensor]] | None): Transformation function to apply to spectrograms.
+        audio_cache (AudioCache | None): Cache of decoded waveforms. Defaults to None.
     """
 
     def __getitem__(self, idx: int) -> tuple[torch.Tensor, ...]:
@@ -45,18 +47,31 @@ class MultiSpecDataset(_BaseDataset):
 
         Returns:
             tuple: The spectrogram (torch.Tensor) and target MOS (torch.Tensor) for the sample.
+            If `cfg.dataset.spec_frontend` is "torch", raw waveform crops of shape
+            (num_frames, num_crops, num_samples) are returned instead of the spectrogram.
         """
         row = self.data[idx] if isinstance(self.data, list) else self.data.iloc[idx]
         file = row.file_path
-        y = load_audio(self.cfg, file)
+        y = load_audio(self.cfg, file, self.audio_cache)
         if (
             hasattr(self.cfg.dataset, "remove_silent_section")
             and self.cfg.dataset.remove_silent_section
         ):
             y = remove_silent_section(y)
-        specs = []
         length = int(self.cfg.dataset.spec_frames.frame_sec * self.cfg.sr)
         y = extend_audio(self.cfg, y, length, type=self.cfg.dataset.spec_frames.extend)
+        if _use_torch_frontend(self.cfg):
+            spec_tensor = _select_crops(self.cfg, y, length)
+        else:
+            spec_tensor = self._make_specs(y, length)
+
+        target = row.mos or 0.0
+        target = torch.tensor(target, dtype=torch.float32)
+
+        return spec_tensor, target
+
+    def _make_specs(self, y: np.ndarray, length: int) -> torch.Tensor:
+        specs = []
         for _ in range(self.cfg.dataset.spec_frames.num_frames):
             y1 = select_random_start(y, length)
             for spec_cfg in self.cfg.dataset.specs:
@@ -76,12 +91,7 @@ class MultiSpecDataset(_BaseDataset):
                 assert self.transform is not None, "Transform must be provided."
                 spec_tensor = self.transform[phase](spec_tensor)
                 specs.append(spec_tensor)
-        spec_tensor = torch.stack(specs).float()
-
-        target = row.mos or 0.0
-        target = torch.tensor(target, dtype=torch.float32)
-
-        return spec_tensor, target
+        return torch.stack(specs).float()
 
 
 class MultiSpecExtDataset(MultiSpecDataset):
@@ -97,6 +107,8 @@ class MultiSpecExtDataset(MultiSpecDataset):
             The phase of the dataset, either "train" or any other phase (e.g., "valid").
         transform (dict[str, Callable[[torch.Tensor], torch.Tensor]] | None):
             Transformation function to apply to spectrograms.
+        audio_cache (AudioCache | None):
+            Cache of decoded waveforms. Defaults to None.
     """
 
     def __init__(
@@ -105,8 +117,9 @@ class MultiSpecExtDataset(MultiSpecDataset):
         data: "pd.DataFrame" | list[DatasetSchema],
         phase: str,
         transform: dict[str, Callable[[torch.Tensor], torch.Tensor]] | None = None,
+        audio_cache: AudioCache | None = None,
     ):
-        super().__init__(cfg, data, phase, transform)
+        super().__init__(cfg, data, phase, transform, audio_cache)
         self.dataset_map = get_dataset_map(cfg)
 
     def __getitem__(self, idx: int) -> tuple[torch.Tensor, ...]:
@@ -130,6 +143,23 @@ class MultiSpecExtDataset(MultiSpecDataset):
         return spec, dt, target
 
 
+def _use_torch_frontend(cfg: Config) -> bool:
+    return getattr(cfg.dataset, "spec_frontend", "librosa") == "torch"
+
+
+def _select_crops(cfg: Config, y: np.ndarray, length: int) -> torch.Tensor:
+    # Raw crops for `utmosv2.transform.MultiSpecFrontend`, which computes the spectrograms
+    # of the whole batch on the model's device.
+    num_crops = 1
+    if cfg.dataset.spec_frames.mixup_inner:
+        num_crops += len(cfg.dataset.specs)
+    crops = [
+        np.stack([select_random_start(y, length) for _ in range(num_crops)])
+        for _ in range(cfg.dataset.spec_frames.num_frames)
+    ]
+    return torch.from_numpy(np.stack(crops)).float()
+
+
 def _make_spctrogram(cfg: Config, spec_cfg: Config, y: np.ndarray) -> np.ndarray:
     if spec_cfg.mode == "melspec":
         return _make_melspec(cfg, spec_cfg, y)
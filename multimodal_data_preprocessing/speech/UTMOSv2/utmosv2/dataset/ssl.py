@@ -18,6 +18,7 @@ from utmosv2.preprocess._preprocess import remove_silent_section
 if TYPE_CHECKING:
     import pandas as pd
 
+    from utmosv2.dataset._cache import AudioCache
     from utmosv2.dataset._schema import DatasetSchema
 
 
@@ -35,6 +36,8 @@ class SSLDataset(_BaseDataset):
             The phase of the dataset, either "train" or any other phase (e.g., "valid").
         transform (dict[str, Callable[[torch.Tensor], torch.Tensor]] | None):
             Transformation function to apply to spectrograms.
+        audio_cache (AudioCache | None):
+            Cache of decoded waveforms. Defaults to None.
     """
 
     def __getitem__(self, idx: int) -> tuple[torch.Tensor, ...]:
@@ -48,7 +51,7 @@ class SSLDataset(_BaseDataset):
         """
         row = self.data[idx] if isinstance(self.data, list) else self.data.iloc[idx]
         file = row.file_path
-        y = load_audio(self.cfg, file)
+        y = load_audio(self.cfg, file, self.audio_cache)
         if (
             hasattr(self.cfg.dataset, "remove_silent_section")
             and self.cfg.dataset.remove_silent_section
@@ -61,7 +64,8 @@ class SSLDataset(_BaseDataset):
         target = row.mos or 0.0
         target = torch.tensor(target, dtype=torch.float32)
 
-        return torch.from_numpy(y), target
+        # Cached waveforms may be read-only memory maps; copy only in that case.
+        return torch.from_numpy(np.require(y, requirements="W")), target
 
 
 class SSLExtDataset(SSLDataset):
@@ -75,12 +79,18 @@ class SSLExtDataset(SSLDataset):
             The dataset containing file paths and MOS labels.
         phase (str):
             The phase of the dataset, either "train" or any other phase (e.g., "valid").
+        audio_cache (AudioCache | None):
+            Cache of decoded waveforms. Defaults to None.
     """
 
     def __init__(
-        self, cfg: Config, data: "pd.DataFrame" | list[DatasetSchema], phase: str
+        self,
+        cfg: Config,
+        data: "pd.DataFrame" | list[DatasetSchema],
+        phase: str,
+        audio_cache: AudioCache | None = None,
     ):
-        super().__init__(cfg, data, phase)
+        super().__init__(cfg, data, phase, audio_cache=audio_cache)
         self.dataset_map = get_dataset_map(cfg)
 
     def __getitem__(self, idx: int) -> tuple[torch.Tensor, ...]:
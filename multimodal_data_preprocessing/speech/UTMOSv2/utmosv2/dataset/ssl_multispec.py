@@ -8,6 +8,7 @@ import torch
 from utmosv2._settings._config import Config
 from utmosv2.dataset import MultiSpecDataset, SSLExtDataset
 from utmosv2.dataset._base import _BaseDataset
+from utmosv2.dataset._cache import AudioCache
 
 if TYPE_CHECKING:
     import pandas as pd
@@ -30,6 +31,10 @@ class SSLLMultiSpecExtDataset(_BaseDataset):
             The phase of the dataset, either "train" or any other phase (e.g., "valid").
         transform (dict[str, Callable[[torch.Tensor], torch.Tensor]] | None):
             Transformation function to apply to spectrograms.
+        audio_cache (AudioCache | None):
+            Cache of decoded waveforms shared by both branches. If None, a single-entry
+            in-memory cache is used so that each file is decoded once per sample
+            instead of once per branch. Defaults to None.
     """
 
     def __init__(
@@ -38,10 +43,13 @@ class SSLLMultiSpecExtDataset(_BaseDataset):
         data: "pd.DataFrame" | list[DatasetSchema],
         phase: str,
         transform: dict[str, Callable[[torch.Tensor], torch.Tensor]] | None = None,
+        audio_cache: AudioCache | None = None,
     ):
-        super().__init__(cfg, data, phase, transform)
-        self.ssl = SSLExtDataset(cfg, data, phase)
-        self.multi_spec = MultiSpecDataset(cfg, data, phase, transform)
+        if audio_cache is None:
+            audio_cache = AudioCache(max_items=1)
+        super().__init__(cfg, data, phase, transform, audio_cache)
+        self.ssl = SSLExtDataset(cfg, data, phase, audio_cache)
+        self.multi_spec = MultiSpecDataset(cfg, data, phase, transform, audio_cache)
 
     def __len__(self) -> int:
         return len(self.data)
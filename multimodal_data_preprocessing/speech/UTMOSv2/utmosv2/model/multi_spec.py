@@ -7,6 +7,7 @@ import torch.nn.functional as F
 
 from utmosv2._settings._config import Config
 from utmosv2.dataset._utils import get_dataset_num
+from utmosv2.transform import MultiSpecFrontend
 
 
 class MultiSpecModelV2(nn.Module):
@@ -35,6 +36,7 @@ class MultiSpecModelV2(nn.Module):
         )
         for backbone in self.backbones:
             backbone.global_pool = nn.Identity()
+        self.frontend = MultiSpecFrontend(cfg)
 
         self.weights = nn.Parameter(
             F.softmax(torch.randn(len(cfg.dataset.specs)), dim=0)
@@ -77,12 +79,16 @@ class MultiSpecModelV2(nn.Module):
 
         Args:
             x (torch.Tensor):
-                Input tensor of shape (batch_size, num_frames, channels, width, height).
+                Input tensor of shape (batch_size, num_frames, channels, width, height),
+                or raw waveform crops of shape (batch_size, num_frames, num_crops, num_samples)
+                which are turned into spectrograms by `MultiSpecFrontend`.
 
         Returns:
             torch.Tensor:
                 Output tensor after applying backbones, pooling, and fully connected layers.
         """
+        if x.dim() == 4:
+            x = self.frontend(x)
         xl = [
             x[:, i, :, :, :].squeeze(1)
             for i in range(
@@ -142,6 +148,7 @@ class MultiSpecExtModel(nn.Module):
         )
         for backbone in self.backbones:
             backbone.global_pool = nn.Identity()
+        self.frontend = MultiSpecFrontend(cfg)
 
         self.weights = nn.Parameter(
             F.softmax(torch.randn(len(cfg.dataset.specs)), dim=0)
@@ -181,6 +188,8 @@ class MultiSpecExtModel(nn.Module):
         #     print(f"| Number of fc output features: {self.fc.out_features}")
 
     def forward(self, x: torch.Tensor, d: torch.Tensor) -> torch.Tensor:
+        if x.dim() == 4:
+            x = self.frontend(x)
         xl = [
             x[:, i, :, :, :].squeeze(1)
             for i in range(
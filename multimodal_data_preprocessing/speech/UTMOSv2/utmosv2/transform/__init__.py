@@ -1,3 +1,4 @@
+from utmosv2.transform._spectrogram import MultiSpecFrontend, Spectrogram
 from utmosv2.transform._xymasking import XYMasking
 
-__all__ = ["XYMasking"]
+__all__ = ["MultiSpecFrontend", "Spectrogram", "XYMasking"]
@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+from collections.abc import Callable
+
+import librosa
+import torch
+import torch.nn as nn
+
+from utmosv2._settings._config import Config
+
+_AMIN = 1e-10
+_TOP_DB = 80.0
+
+
+class Spectrogram(nn.Module):
+    """
+    Batched torch implementation of the spectrograms computed by
+    `utmosv2.dataset.multi_spec._make_melspec` and `_make_stft`.
+
+    The STFT follows `librosa.stft` (centered, zero-padded, periodic Hann window
+    padded to `n_fft`) and the mel filter bank is the one of `librosa.filters.mel`,
+    so the output matches the librosa front-end up to floating-point error.
+
+    Args:
+        sr (int):
+            Sampling rate of the input waveforms.
+        spec_cfg (SimpleNamespace):
+            One entry of `cfg.dataset.specs`.
+    """
+
+    def __init__(self, sr: int, spec_cfg: Config):
+        super().__init__()
+        if spec_cfg.mode not in ("melspec", "stft"):
+            raise NotImplementedError
+        self.mode = spec_cfg.mode
+        self.n_fft = spec_cfg.n_fft
+        self.hop_length = spec_cfg.hop_length
+        self.win_length = getattr(spec_cfg, "win_length", None) or spec_cfg.n_fft
+        self.norm = getattr(spec_cfg, "norm", None)
+        self.window: torch.Tensor
+        self.register_buffer(
+            "window",
+            torch.hann_window(self.win_length, periodic=True, dtype=torch.float64),
+            persistent=False,
+        )
+        self.mel_fb: torch.Tensor | None
+        if self.mode == "melspec":
+            mel_fb = librosa.filters.mel(
+                sr=sr, n_fft=self.n_fft, n_mels=spec_cfg.n_mels
+            )
+            self.register_buffer("mel_fb", torch.from_numpy(mel_fb), persistent=False)
+        else:
+            self.mel_fb = None
+
+    def forward(self, y: torch.Tensor) -> torch.Tensor:
+        """
+        Compute the spectrograms of a batch of waveforms.
+
+        Args:
+            y (torch.Tensor): Waveforms of shape (batch_size, num_samples).
+
+        Returns:
+            torch.Tensor: Spectrograms in dB of shape (batch_size, num_bins, num_frames).
+        """
+        stft = torch.stft(
+            y,
+            n_fft=self.n_fft,
+            hop_length=self.hop_length,
+            win_length=self.win_length,
+            window=self.window.to(y.dtype),
+            center=True,
+            pad_mode="constant",
+            return_complex=True,
+        )
+        power = stft.real**2 + stft.imag**2
+        if self.mel_fb is not None:
+            power = torch.matmul(self.mel_fb.to(y.dtype), power)
+            spec = _power_to_db(power, ref=power.amax(dim=(1, 2), keepdim=True))
+            if self.norm is not None:
+                spec = (spec + self.norm) / self.norm
+            return spec
+        return _power_to_db(power, ref=torch.ones_like(power[:, :1, :1]))
+
+
+class MultiSpecFrontend(nn.Module):
+    """
+    Compute the inputs of the multi-spectrogram models from raw waveform crops, on the
+    device and for the whole batch at once.
+
+    This replaces the per-sample librosa computation done in `MultiSpecDataset.__getitem__`
+    when `cfg.dataset.spec_frontend == "torch"`. In that mode the dataset returns crops of
+    shape (num_frames, 1 + num_specs, num_samples): the first crop of each frame is the
+    main one and, with `mixup_inner`, the `1 + i`-th crop is mixed into the `i`-th spectrogram.
+    The three identical channels expected by the image backbones are broadcast views.
+
+    The transforms in `cfg.transform` are applied to single-channel images before the
+    channels are broadcast, so they must treat every channel identically, as all the
+    provided transforms do.
+
+    Args:
+        cfg (SimpleNamespace | ModuleType):
+            Configuration object containing dataset settings.
+    """
+
+    def __init__(self, cfg: Config):
+        super().__init__()
+        self.cfg = cfg
+        self.specs = nn.ModuleList(
+            [Spectrogram(cfg.sr, spec_cfg) for spec_cfg in cfg.dataset.specs]
+        )
+
+    def forward(self, waves: torch.Tensor) -> torch.Tensor:
+        """
+        Args:
+            waves (torch.Tensor):
+                Waveform crops of shape (batch_size, num_frames, num_crops, num_samples).
+
+        Returns:
+            torch.Tensor:
+                Spectrograms of shape (batch_size, num_frames * num_specs, 3, height, width).
+        """
+        batch_size, num_frames, num_crops, length = waves.shape
+        transform = self._get_transform()
+        # The dB conversion overflows in half precision, so always run in float32 or wider.
+        with torch.autocast(device_type=waves.device.type, enabled=False):
+            if waves.dtype not in (torch.float32, torch.float64):
+                waves = waves.float()
+            y1 = waves[:, :, 0].reshape(-1, length)
+            specs = []
+            for i, spec_module in enumerate(self.specs):
+                spec = spec_module(y1)
+                if num_crops > 1:
+                    spec2 = spec_module(waves[:, :, 1 + i].reshape(-1, length))
+                    lmd = self._sample_lambda(spec.shape[0], spec)
+                    spec = lmd * spec + (1 - lmd) * spec2
+                spec = spec.float().unsqueeze(1)
+                if transform is not None:
+                    spec = torch.stack([transform(s) for s in spec])
+                specs.append(spec)
+        x = torch.stack(specs, dim=1)
+        x = x.reshape(batch_size, num_frames * len(self.specs), *x.shape[2:])
+        return x.expand(-1, -1, 3, -1, -1)
+
+    def _get_transform(self) -> Callable[[torch.Tensor], torch.Tensor] | None:
+        transform = getattr(self.cfg, "transform", None)
+        if transform is None:
+            return None
+        return transform["train" if self.training else "valid"]
+
+    def _sample_lambda(self, n: int, like: torch.Tensor) -> torch.Tensor:
+        alpha = self.cfg.dataset.spec_frames.mixup_alpha
+        beta = torch.distributions.Beta(
+            torch.tensor(float(alpha)), torch.tensor(float(alpha))
+        )
+        return beta.sample((n, 1, 1)).to(device=like.device, dtype=like.dtype)
+
+
+def _power_to_db(power: torch.Tensor, ref: torch.Tensor) -> torch.Tensor:
+    # Same as `librosa.power_to_db(power, ref=ref, amin=1e-10, top_db=80.0)`, per sample.
+    log_spec = 10.0 * torch.log10(torch.clamp(power, min=_AMIN))
+    log_spec = log_spec - 10.0 * torch.log10(torch.clamp(ref, min=_AMIN))
+    floor = log_spec.amax(dim=(1, 2), keepdim=True) - _TOP_DB
+    return torch.maximum(log_spec, floor)
@@ -14,6 +14,7 @@ import torch.nn as nn
 from utmosv2._import import _LazyImport
 from utmosv2._settings._config import Config
 from utmosv2.dataset import (
+    AudioCache,
     MultiSpecDataset,
     MultiSpecExtDataset,
     SSLDataset,
@@ -51,21 +52,24 @@ def get_data(cfg: Config) -> "pd.DataFrame":
 
 
 def get_dataset(
-    cfg: Config, data: "pd.DataFrame" | list[DatasetSchema], phase: str
+    cfg: Config,
+    data: "pd.DataFrame" | list[DatasetSchema],
+    phase: str,
+    audio_cache: AudioCache | None = None,
 ) -> torch.utils.data.Dataset:
     if cfg.print_config:
         print(f"Using dataset: {cfg.dataset.name}")
     res: torch.utils.data.Dataset
     if cfg.dataset.name == "multi_spec":
-        res = MultiSpecDataset(cfg, data, phase, cfg.transform)
+        res = MultiSpecDataset(cfg, data, phase, cfg.transform, audio_cache)
     elif cfg.dataset.name == "ssl":
-        res = SSLDataset(cfg, data, phase)
+        res = SSLDataset(cfg, data, phase, audio_cache=audio_cache)
     elif cfg.dataset.name == "sslext":
-        res = SSLExtDataset(cfg, data, phase)
+        res = SSLExtDataset(cfg, data, phase, audio_cache)
     elif cfg.dataset.name == "ssl_multispec_ext":
-        res = SSLLMultiSpecExtDataset(cfg, data, phase, cfg.transform)
+        res = SSLLMultiSpecExtDataset(cfg, data, phase, cfg.transform, audio_cache)
     elif cfg.dataset.name == "multi_spec_ext":
-        res = MultiSpecExtDataset(cfg, data, phase, cfg.transform)
+        res = MultiSpecExtDataset(cfg, data, phase, cfg.transform, audio_cache)
     else:
         raise NotImplementedError
     return res
@@ -102,6 +102,43 @@ class LoaderTest(unittest.TestCase):
     self.assertEqual(len(ret), 10)
     self.assert_psnr(ret)
 
+  def test_batch_workers(self):
+    d = Dataset('data/').include('*.png')
+    data = d.compile()
+    ret = []
+    for workers in (1, 3):
+      np.random.seed(0)
+      ld = Loader(data, data, threads=1)
+      ld.cropper(RandomCrop(1))
+      ld.image_augmentation()
+      ld.set_batch_workers(workers)
+      itr = ld.make_one_shot_iterator([4, 3, 16, 16], 10, True)
+      ret.append(list(itr))
+      ld.close_batch_workers()
+    self.assertEqual(len(ret[0]), 10)
+    self.assertEqual(ret[0][0]['hr'].shape, (4, 3, 16, 16))
+    self.assert_psnr(ret[0])
+    for x, y in zip(*ret):
+      self.assertEqual(x['name'], y['name'])
+      self.assertTrue(np.all(x['hr'] == y['hr']))
+      self.assertTrue(np.all(x['lr'] == y['lr']))
+    # interleaved iterators on one loader
+    ld = Loader(data, data, threads=1)
+    ld.cropper(RandomCrop(1))
+    ld.set_batch_workers(2)
+    itr1 = ld.make_one_shot_iterator([4, 3, 16, 16], 6)
+    self.assertEqual(next(itr1)['hr'].shape, (4, 3, 16, 16))
+    # a different shape replaces the workers of itr1
+    itr2 = ld.make_one_shot_iterator([2, 3, 8, 8], 3)
+    self.assertEqual(next(itr2)['hr'].shape, (2, 3, 8, 8))
+    ret1 = list(itr1)
+    self.assertEqual(len(ret1), 5)
+    self.assertEqual(ret1[0]['hr'].shape, (4, 3, 16, 16))
+    ret2 = list(itr2)
+    self.assertEqual(len(ret2), 2)
+    self.assertEqual(ret2[0]['hr'].shape, (2, 3, 8, 8))
+    ld.close_batch_workers()
+
   def test_auto_deduce_shape(self):
     d = Dataset('data').include_reg('set5')
     ld = Loader(d, scale=1)
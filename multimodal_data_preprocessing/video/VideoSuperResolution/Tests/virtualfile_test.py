@@ -2,7 +2,9 @@
 Unit test for DataLoader.VirtualFile
 """
 import os
+import tempfile
 import unittest
+from pathlib import Path
 
 if not os.getcwd().endswith('Tests'):
   os.chdir('Tests')
@@ -97,6 +99,38 @@ class VirtualFileTest(unittest.TestCase):
     self.assertTrue(np.all(F[1] == F[2]))
     self.assertTrue(np.all(F[3] == F[4]))
 
+  def test_raw_frame_array(self):
+    vf = RawFile(RAW, 'YV12', [32, 32])
+    raw = vf.read_frame(vf.frames)
+    for i in (0, 2, 1, -1):
+      self.assertTrue(np.all(vf.frame_array(i) == np.asarray(raw[i])))
+    y, u, v = vf.frame_view(0)
+    self.assertEqual(y.shape, (32, 32))
+    self.assertEqual(u.shape, (16, 16))
+    rgb = np.asarray(raw[0].convert('RGB')).astype('int32')
+    self.assertLessEqual(np.abs(vf.frame_array(0, 'RGB') - rgb).max(), 1)
+    with self.assertRaises(IndexError):
+      vf.frame_array(vf.frames)
+
+  def test_raw_bgr_read(self):
+    rgba = np.random.randint(0, 256, [2, 32, 32, 4], 'uint8')
+    with tempfile.TemporaryDirectory() as tmp:
+      bgr = Path(tmp) / 'raw_32x32.bgr'
+      bgra = Path(tmp) / 'raw_32x32.bgra'
+      rgba[..., 2::-1].tofile(str(bgr))
+      rgba[..., [2, 1, 0, 3]].tofile(str(bgra))
+      vf = RawFile(bgr, 'BGR', [32, 32])
+      for i, img in enumerate(vf.read_frame(2)):
+        self.assertTrue(np.all(np.asarray(img) == rgba[i, ..., :3]))
+        self.assertTrue(np.all(vf.frame_array(i) == rgba[i, ..., :3]))
+      vf = RawFile(bgra, 'BGRA', [32, 32])
+      for i, img in enumerate(vf.read_frame(2)):
+        self.assertEqual(img.mode, 'RGBA')
+        self.assertTrue(np.all(np.asarray(img) == rgba[i]))
+        self.assertTrue(np.all(vf.frame_array(i, 'RGB') == rgba[i, ..., :3]))
+      # release the mappings before the folder is removed
+      del vf
+
   def test_vf_copy(self):
     import copy
     vf0 = ImageFile(IMG, False)
@@ -0,0 +1,67 @@
+#  Copyright (c) 2017-2020 Wenyi Tang.
+#  Author: Wenyi Tang
+#  Email: wenyitang@outlook.com
+#  Update: 2020 - 2 - 7
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from VSR.DataLoader.VirtualFile import RawFile, _ALLOWED_RAW_FORMAT
+
+parser = argparse.ArgumentParser(
+  description="Decoding throughput of RawFile, per pixel format.")
+parser.add_argument("--width", type=int, default=1920)
+parser.add_argument("--height", type=int, default=1080)
+parser.add_argument("--frames", type=int, default=30,
+                    help="frames of the synthetic raw video.")
+parser.add_argument("--formats", nargs='*', default=_ALLOWED_RAW_FORMAT)
+FLAGS = parser.parse_args()
+
+YUV_FORMAT = ('YV12', 'YV21', 'NV12', 'NV21')
+
+
+def timeit(fn, frames):
+  start = time.perf_counter()
+  fn()
+  return frames / (time.perf_counter() - start)
+
+
+def bench(file, fmt):
+  size = [FLAGS.width, FLAGS.height]
+  fd = RawFile(file, fmt, size)
+  n = fd.frames
+  order = np.random.permutation(n)
+  results = {
+    'read_frame': timeit(lambda: fd.read_frame(n), n),
+    'frame_view': timeit(lambda: [fd.frame_view(i) for i in order], n),
+    'frame_array': timeit(lambda: [fd.frame_array(i) for i in order], n),
+  }
+  if fmt in YUV_FORMAT:
+    results['frame_array(RGB)'] = timeit(
+        lambda: [fd.frame_array(i, 'RGB') for i in order], n)
+  return results
+
+
+def main():
+  w, h = FLAGS.width, FLAGS.height
+  with tempfile.TemporaryDirectory() as tmp:
+    for fmt in FLAGS.formats:
+      fmt = fmt.upper()
+      # 4:2:0 YUV is 1.5 bytes per pixel, packed RGB 1 byte per channel
+      pitch = w * h * 3 // 2 if fmt in YUV_FORMAT else w * h * len(fmt)
+      file = Path(tmp) / f'bench_{w}x{h}.{fmt.lower()}'
+      np.random.randint(0, 256, pitch * FLAGS.frames, 'uint8').tofile(file)
+      # warm up the page cache so every method reads from memory
+      file.read_bytes()
+      results = bench(file, fmt)
+      print(f"{fmt:>5}: " + ', '.join(
+          f"{k} {v:8.1f} fps" for k, v in results.items()))
+      file.unlink()
+
+
+if __name__ == '__main__':
+  main()
@@ -29,6 +29,7 @@ g2 = parser.add_argument_group("device options")
 g2.add_argument("--cuda", action="store_true", help="using cuda gpu")
 g2.add_argument("--threads", type=int, default=8, help="specify loading threads number")
 g2.add_argument('--memory_limit', default=None, help="limit the CPU memory usage. i.e. '4GB', '1024MB'")
+g2.add_argument("--batch_workers", type=int, default=0, help="specify processes generating training batches ahead")
 g3 = parser.add_argument_group("advanced options")
 g3.add_argument("--traced_val", action="store_true")
 g3.add_argument("--pretrain", help="specify the pre-trained model checkpoint or will search into `save_dir` if not specified")
@@ -76,6 +77,8 @@ def main():
   # construct data loader for training
   lt = Loader(dataset.train.hr, dataset.train.lr, opt.scale, threads=opt.threads)
   lt.image_augmentation()
+  if opt.batch_workers:
+    lt.set_batch_workers(opt.batch_workers)
   # construct data loader for validating
   lv = None
   if dataset.val is not None:
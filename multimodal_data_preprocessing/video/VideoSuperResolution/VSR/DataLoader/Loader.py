@@ -4,7 +4,14 @@
 #  Update: 2020 - 2 - 7
 
 import logging
+import multiprocessing as mp
+import queue
+import signal
+import traceback
+import weakref
+from collections import Counter, deque
 from concurrent import futures
+from multiprocessing.shared_memory import SharedMemory
 
 import numpy as np
 from PIL import Image
@@ -42,6 +49,64 @@ def _augment(image, op):
   return image
 
 
+def _make_sample(loader, shape, caching, i, d):
+  """Generate the hr and lr arrays of frames `d` of clip `i`, each with a
+  leading batch dimension of 1."""
+  crop = loader.crop
+  cb_hr = (loader.hr['transform1'], loader.hr['transform2'])
+  cb_lr = (loader.lr['transform1'], loader.lr['transform2'])
+  hr = loader.data['hr'][i]
+  lr = loader.data['lr'][i]
+  # crop a video clip, clamp the depth index
+  d[d < 0] = 0
+  d[d >= len(hr)] = len(hr) - 1
+  name = loader.data['names'][i]
+  hr2 = [hr[j] for j in d]
+  if not loader.cache_map.get(f'hr-{name}-{i}-{d}'):
+    for fn in cb_hr[0]:
+      hr2 = [fn(img) for img in hr2]
+    hr2 = [img.convert(loader.hr['color']) for img in hr2]
+    if caching:
+      loader.data['hr'][i] = hr2
+      loader.cache_map[f'hr-{name}-{i}-{d}'] = True
+      LOG.debug(f"Caching hr-{name}-{i}-{d}...")
+  lr2 = [lr[j] for j in d]
+  if not loader.cache_map.get(f'lr-{name}-{i}-{d}'):
+    for fn in cb_lr[0]:
+      lr2 = [fn(img) for img in lr2]
+    lr2 = [img.convert(loader.lr['color']) for img in lr2]
+    if caching:
+      loader.data['lr'][i] = lr2
+      loader.cache_map[f'lr-{name}-{i}-{d}'] = True
+      LOG.debug(f"Caching lr-{name}-{i}-{d}...")
+  hr3 = np.stack([img_to_array(img, DATA_FORMAT) for img in hr2])
+  lr3 = np.stack([img_to_array(img, DATA_FORMAT) for img in lr2])
+  del hr2, lr2
+  if hr3.shape[0] == 1 and lr3.shape[0] == 1:
+    hr3 = hr3.squeeze(0)
+    lr3 = lr3.squeeze(0)
+    hr4, lr4 = crop((hr3, lr3), shape=shape[2:]) if crop else (hr3, lr3)
+  else:
+    hr4, lr4 = crop((hr3, lr3), shape=shape[1:]) if crop else (hr3, lr3)
+  del hr3, lr3
+  hr4 = np.expand_dims(hr4, 0)  # 4-D or 5-D
+  lr4 = np.expand_dims(lr4, 0)  # [1, (T,) C, H, W]
+  for fn in cb_hr[1]:
+    hr4 = fn(hr4)
+  for fn in cb_lr[1]:
+    lr4 = fn(lr4)
+
+  if loader.aux['augmentation']:
+    ops = np.random.randint(0, 2, [3])
+  else:
+    ops = [0, 0, 0]
+  _shape0 = hr4.shape
+  _shape1 = lr4.shape
+  hr5 = _augment(hr4.reshape([-1, *_shape0[-3:]]), ops)
+  lr5 = _augment(lr4.reshape([-1, *_shape1[-3:]]), ops)
+  return hr5.reshape(_shape0), lr5.reshape(_shape1)
+
+
 class EpochIterator:
   """An iterator for generating batch data in one epoch
 
@@ -99,67 +164,13 @@ class EpochIterator:
       raise StopIteration("All batch data generated.")
 
     slc = slice(self.count * self.shape[0], (self.count + 1) * self.shape[0])
-    crop = self.loader.crop
-    cb_hr = (self.loader.hr['transform1'], self.loader.hr['transform2'])
-    cb_lr = (self.loader.lr['transform1'], self.loader.lr['transform2'])
     for i, d in self.index[slc]:
       if i >= len(self.loader.data['hr']):
         continue
-      hr = self.loader.data['hr'][i]
-      lr = self.loader.data['lr'][i]
-      # crop a video clip, clamp the depth index
-      d[d < 0] = 0
-      d[d >= len(hr)] = len(hr) - 1
-      name = self.loader.data['names'][i]
-      hr2 = np.asarray(hr, dtype=object)[d]
-      if not self.loader.cache_map.get(f'hr-{name}-{i}-{d}'):
-        for fn in cb_hr[0]:
-          hr2 = [fn(img) for img in hr2]
-        hr2 = [img.convert(self.loader.hr['color']) for img in hr2]
-        if self.cache:
-          self.loader.data['hr'][i] = hr2
-          self.loader.cache_map[f'hr-{name}-{i}-{d}'] = True
-          LOG.debug(f"Caching hr-{name}-{i}-{d}...")
-      lr2 = np.asarray(lr, dtype=object)[d]
-      if not self.loader.cache_map.get(f'lr-{name}-{i}-{d}'):
-        for fn in cb_lr[0]:
-          lr2 = [fn(img) for img in lr2]
-        lr2 = [img.convert(self.loader.lr['color']) for img in lr2]
-        if self.cache:
-          self.loader.data['lr'][i] = lr2
-          self.loader.cache_map[f'lr-{name}-{i}-{d}'] = True
-          LOG.debug(f"Caching lr-{name}-{i}-{d}...")
-      hr3 = np.stack([img_to_array(img, DATA_FORMAT) for img in hr2])
-      lr3 = np.stack([img_to_array(img, DATA_FORMAT) for img in lr2])
-      del hr2, lr2
-      if hr3.shape[0] == 1 and lr3.shape[0] == 1:
-        hr3 = hr3.squeeze(0)
-        lr3 = lr3.squeeze(0)
-        hr4, lr4 = crop((hr3, lr3), shape=self.shape[2:]) if crop else (
-          hr3, lr3)
-      else:
-        hr4, lr4 = crop((hr3, lr3), shape=self.shape[1:]) if crop else (
-          hr3, lr3)
-      del hr3, lr3
-      hr4 = np.expand_dims(hr4, 0)  # 4-D or 5-D
-      lr4 = np.expand_dims(lr4, 0)  # [1, (T,) C, H, W]
-      for fn in cb_hr[1]:
-        hr4 = fn(hr4)
-      for fn in cb_lr[1]:
-        lr4 = fn(lr4)
-
-      if self.loader.aux['augmentation']:
-        ops = np.random.randint(0, 2, [3])
-      else:
-        ops = [0, 0, 0]
-      _shape0 = hr4.shape
-      _shape1 = lr4.shape
-      hr5 = _augment(hr4.reshape([-1, *_shape0[-3:]]), ops)
-      lr5 = _augment(lr4.reshape([-1, *_shape1[-3:]]), ops)
-      del hr4, lr4
-      pack['hr'].append(hr5.reshape(_shape0))
-      pack['lr'].append(lr5.reshape(_shape1))
-      pack['name'].append(name)
+      hr, lr = _make_sample(self.loader, self.shape, self.cache, i, d)
+      pack['hr'].append(hr)
+      pack['lr'].append(lr)
+      pack['name'].append(self.loader.data['names'][i])
 
     if pack['hr']:
       pack['hr'] = np.concatenate(pack['hr'])
@@ -169,6 +180,194 @@ class EpochIterator:
     return pack
 
 
+class ParallelEpochIterator(EpochIterator):
+  """An `EpochIterator` whose batches are generated ahead of time by the
+  worker processes of a `BatchProducer`, see `Loader.set_batch_workers`.
+
+  Every sample is generated under its own seed, derived from a seed drawn
+  from `np.random` at creation, so the batches are reproducible and don't
+  depend on the number of workers.
+  """
+
+  def __init__(self, loader, shape, steps, shuffle=None, caching=False):
+    super(ParallelEpochIterator, self).__init__(loader, shape, steps, shuffle,
+                                                caching)
+    self.seed = np.random.randint(2 ** 31)
+    self.producer = None
+
+  def sample_seed(self, position):
+    """The seed of the sample at `position` of `index`."""
+    return np.random.SeedSequence([self.seed, position]).generate_state(1)[0]
+
+  def __next__(self):
+    if self.count >= self.steps:
+      raise StopIteration("All batch data generated.")
+    # another iterator may have taken over or replaced the producer
+    if (self.producer is None or self.producer is not self.loader.producer or
+        self.producer.iterator() is not self):
+      self.producer = self.loader.get_batch_producer(self)
+    pack = self.producer.next_batch()
+    self.count += 1
+    return pack
+
+
+# arguments of the forked workers, only set while they are being started
+_WORKER_ARGS = None
+
+
+def _batch_worker(index):
+  loader, shape, caching, buffers, tasks, results = _WORKER_ARGS
+  # interrupts are handled by the main process
+  signal.signal(signal.SIGINT, signal.SIG_IGN)
+  views = [[np.ndarray(spec[0], spec[1], buffer=shm.buf)
+            for spec, shm in slot] for slot in buffers]
+  while True:
+    task = tasks[index].get()
+    if task is None:
+      break
+    serial, slot, samples = task
+    try:
+      for row, i, d, seed in samples:
+        np.random.seed(seed)
+        sample = _make_sample(loader, shape, caching, i, d)
+        for view, x in zip(views[slot], sample):
+          if x.shape[1:] != view.shape[1:] or x.dtype != view.dtype:
+            raise ValueError(
+                f"Sample of {x.shape[1:]} {x.dtype} doesn't fit the batch "
+                f"buffer of {view.shape[1:]} {view.dtype}")
+          view[row] = x[0]
+      results.put((serial, len(samples), None))
+    except Exception:
+      results.put((serial, len(samples), traceback.format_exc()))
+  del views
+  for slot in buffers:
+    for _, shm in slot:
+      shm.close()
+
+
+class BatchProducer:
+  """Forked worker processes that write batches into a ring of shared memory
+  buffers, ahead of the `ParallelEpochIterator` consuming them.
+
+  The samples of a batch are spread over the workers. With `caching`, all the
+  samples of a clip go to the same worker, so a clip is cached only once.
+
+  Args:
+      loader: the `Loader`, inherited by the workers with its loaded data.
+      shape: the 5-D batch shape of the iterators.
+      caching: cache the transformed images in the workers.
+      sample: an (hr, lr) sample, giving the shape and dtype of the buffers.
+      workers: number of worker processes.
+      ring_size: number of batches in flight.
+  """
+
+  def __init__(self, loader, shape, caching, sample, workers, ring_size):
+    global _WORKER_ARGS
+    ctx = mp.get_context('fork')
+    specs = [((shape[0], *x.shape[1:]), x.dtype) for x in sample]
+    self.buffers = [[(spec, SharedMemory(create=True, size=max(
+        1, int(np.prod(spec[0])) * spec[1].itemsize))) for spec in specs]
+                    for _ in range(ring_size)]
+    self.tasks = [ctx.SimpleQueue() for _ in range(workers)]
+    self.results = ctx.Queue()
+    self.procs = [ctx.Process(target=_batch_worker, args=(k,), daemon=True)
+                  for k in range(workers)]
+    _WORKER_ARGS = (loader, shape, caching, self.buffers, self.tasks,
+                    self.results)
+    try:
+      for proc in self.procs:
+        proc.start()
+    finally:
+      _WORKER_ARGS = None
+    self.caching = caching
+    self.pending = deque()
+    self.done = Counter()
+    self.outstanding = 0
+    self.serial = 0
+    self.iterator = None
+    self.scheduled = 0
+
+  def start(self, iterator):
+    """Start generating the batches of `iterator`."""
+    self._drain()
+    # not owning the iterator, which owns the loader
+    self.iterator = weakref.ref(iterator)
+    self.scheduled = iterator.count
+    for _ in self.buffers:
+      self._schedule()
+
+  def _schedule(self):
+    it = self.iterator()
+    if it is None or self.scheduled >= it.steps:
+      return
+    n = it.shape[0]
+    slot = self.serial % len(self.buffers)
+    names = []
+    samples = [[] for _ in self.procs]
+    for k, (i, d) in enumerate(it.index[self.scheduled * n:
+                                        (self.scheduled + 1) * n]):
+      if i >= len(it.loader.data['hr']):
+        continue
+      position = self.scheduled * n + k
+      worker = (i if self.caching else position) % len(self.procs)
+      samples[worker].append((len(names), i, d, it.sample_seed(position)))
+      names.append(it.loader.data['names'][i])
+    for tasks, task in zip(self.tasks, samples):
+      if task:
+        tasks.put((self.serial, slot, task))
+    self.pending.append((self.serial, slot, names))
+    self.outstanding += len(names)
+    self.serial += 1
+    self.scheduled += 1
+
+  def _wait(self, serial=None, rows=0):
+    """Collect results until batch `serial` has `rows` samples, or until
+    nothing is in flight if `serial` is None."""
+    while (self.outstanding if serial is None else
+           self.done[serial] < rows):
+      try:
+        finished, rows_done, error = self.results.get(timeout=1)
+      except queue.Empty:
+        if not all(proc.is_alive() for proc in self.procs):
+          raise RuntimeError("A batch worker exited unexpectedly.")
+        continue
+      self.outstanding -= rows_done
+      self.done[finished] += rows_done
+      if error and serial is not None:
+        raise RuntimeError(f"Batch worker failed:\n{error}")
+
+  def _drain(self):
+    self._wait()
+    self.pending.clear()
+    self.done.clear()
+
+  def next_batch(self):
+    serial, slot, names = self.pending.popleft()
+    self._wait(serial, len(names))
+    del self.done[serial]
+    pack = {'hr': [], 'lr': [], 'name': names}
+    if names:
+      # copied out, so the slot can be refilled while the batch is in use
+      pack['hr'], pack['lr'] = [
+        np.ndarray(spec[0], spec[1], buffer=shm.buf)[:len(names)].copy()
+        for spec, shm in self.buffers[slot]]
+    self._schedule()
+    return pack
+
+  def close(self):
+    for tasks in self.tasks:
+      tasks.put(None)
+    for proc in self.procs:
+      proc.join(timeout=5)
+      if proc.is_alive():
+        proc.terminate()
+    for slot in self.buffers:
+      for _, shm in slot:
+        shm.close()
+        shm.unlink()
+    self.buffers = []
+
+
 class Loader(object):
   """A parallel data loader that generates label and data batches each epoch.
 
@@ -246,6 +445,11 @@ class Loader(object):
     self.thp = futures.ThreadPoolExecutor(max_workers=threads)
     self.fs = []
     self.loaded = 0
+    self.batch_workers = 0
+    self.ring_size = 0
+    self.producer = None
+    self.producer_key = None
+    self.data_version = 0
     if self.hr['data'] is self.lr['data']:
       cap = self.hr['data'].capacity
     else:
@@ -304,6 +508,60 @@ class Loader(object):
     assert target.lower() in ('hr', 'lr')
     getattr(self, target.lower()).update(color=mode)
 
+  def set_batch_workers(self, workers, ring_size=4):
+    """Generate batches in `workers` forked processes, ahead of the training
+    loop, into a ring of `ring_size` shared memory batches.
+
+    Only iterators of a fixed shape (temporal length, height and width are not
+    -1) use the workers, on platforms supporting fork. The batches are seeded
+    per sample, see `ParallelEpochIterator`.
+
+    Args:
+        workers: number of processes, 0 to generate batches in the iterator.
+        ring_size: number of batches generated ahead.
+    """
+    self.close_batch_workers()
+    self.batch_workers = workers
+    self.ring_size = ring_size
+
+  def close_batch_workers(self):
+    """Stop the batch worker processes, they restart with the next
+    iterator."""
+    if self.producer is not None:
+      self._close_producer()
+      self.producer = None
+
+  def get_batch_producer(self, iterator):
+    """Get the `BatchProducer` of `iterator`, started for it. Workers are
+    forked again when the loaded data, transforms or batch shape changed."""
+    key = (self.data_version, tuple(iterator.shape), iterator.cache,
+           tuple(self.hr['transform1']), tuple(self.hr['transform2']),
+           self.hr['color'], tuple(self.lr['transform1']),
+           tuple(self.lr['transform2']), self.lr['color'], self.crop,
+           self.aux['augmentation'])
+    if self.producer is None or self.producer_key != key:
+      self.close_batch_workers()
+      self.producer = BatchProducer(self, iterator.shape, iterator.cache,
+                                    self._probe_sample(iterator),
+                                    self.batch_workers, self.ring_size)
+      self.producer_key = key
+      # stops the workers if the loader is collected
+      self._close_producer = weakref.finalize(self, self.producer.close)
+    self.producer.start(iterator)
+    return self.producer
+
+  def _probe_sample(self, iterator):
+    """The first sample of `iterator`, generated without touching the
+    random state and the cache."""
+    for position, (i, d) in enumerate(iterator.index):
+      if i < len(self.data['hr']):
+        state = np.random.get_state()
+        try:
+          np.random.seed(iterator.sample_seed(position))
+          return _make_sample(self, iterator.shape, False, i, d.copy())
+        finally:
+          np.random.set_state(state)
+
   def make_one_shot_iterator(self, batch_shape, steps, shuffle=None,
                              memory_limit=None, caching=False):
     """Make an iterator object to generate batch data for models.
@@ -346,6 +604,7 @@ class Loader(object):
     self.fs.clear()
     if not (self.loaded & int(2 ** self.threads - 1)):
       self.data, self.cache = self.cache, self.data
+      self.data_version += 1
       [self.cache[k].clear() for k in self.cache]
       loaded = self.loaded >> (self.threads * 2)
       if not shuffle:
@@ -353,6 +612,9 @@ class Loader(object):
         if loaded >= self.aux['cap'] / memory_limit:
           loaded = 0
       self.loaded = loaded << (self.threads * 2)
+    if (self.batch_workers and self.data['hr'] and min(shape[1], *shape[3:]) > 0
+        and 'fork' in mp.get_all_start_methods()):
+      return ParallelEpochIterator(self, shape, steps, shuffle, caching)
     return EpochIterator(self, shape, steps, shuffle, caching)
 
   def prefetch(self, shuffle=None, memory_usage=None):
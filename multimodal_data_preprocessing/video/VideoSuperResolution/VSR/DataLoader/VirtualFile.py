@@ -202,6 +202,97 @@ _ALLOWED_RAW_FORMAT = [
 ]
 
 
+# PIL image mode of the frames `RawFile.read_frame` returns
+_RAW_IMAGE_MODE = {
+  'YV12': 'YCbCr',
+  'YV21': 'YCbCr',
+  'NV12': 'YCbCr',
+  'NV21': 'YCbCr',
+  'RGB': 'RGB',
+  'BGR': 'RGB',
+  'RGBA': 'RGBA',
+  'BGRA': 'RGBA',
+}
+
+
+def _raw_planes(data, mode, size):
+  """Split one raw frame into planes, as views of `data`.
+
+  Args:
+      data: an 1-D uint8 array holding exactly one frame.
+      mode: one of `_ALLOWED_RAW_FORMAT`.
+      size: a tuple of int (width, height).
+
+  Return:
+      a tuple of (Y, U, V) for YUV modes, where U and V are [H/2, W/2];
+      an array of [H, W, C] for RGB modes.
+  """
+  w, h = size
+  if mode in ('YV12', 'YV21'):
+    y = data[:h * w].reshape([h, w])
+    c1 = data[h * w:h * w * 5 // 4].reshape([h // 2, w // 2])
+    c2 = data[h * w * 5 // 4:h * w * 3 // 2].reshape([h // 2, w // 2])
+    return (y, c1, c2) if mode == 'YV12' else (y, c2, c1)
+  if mode in ('NV12', 'NV21'):
+    y = data[:h * w].reshape([h, w])
+    uv = data[h * w:h * w * 3 // 2].reshape([h // 2, w // 2, 2])
+    if mode == 'NV12':
+      return y, uv[..., 0], uv[..., 1]
+    return y, uv[..., 1], uv[..., 0]
+  c = 3 if mode in ('RGB', 'BGR') else 4
+  return data[:h * w * c].reshape([h, w, c])
+
+
+def _upsample(chroma):
+  """Nearest neighbour 2x upsampling of a chroma plane."""
+  return chroma.repeat(2, axis=0).repeat(2, axis=1)
+
+
+def _raw_to_array(planes, mode, color=None):
+  """Convert planes of `_raw_planes` to an uint8 array of [H, W, C].
+
+  Packed frames already in `color` order are returned as views, BGR as a
+  reversed strided view. Chroma is upsampled by nearest neighbour like the
+  registered PIL decoders, and YUV to RGB uses the full range BT.601 of
+  PIL's YCbCr images, in 16-bit fixed point.
+
+  Args:
+      planes: the output of `_raw_planes`.
+      mode: one of `_ALLOWED_RAW_FORMAT`.
+      color: 'YCbCr', 'RGB' or 'L' for YUV modes, 'RGB' or 'RGBA' for RGB
+        modes. Default is `_RAW_IMAGE_MODE[mode]`.
+  """
+  color = color or _RAW_IMAGE_MODE[mode]
+  if mode in ('RGB', 'RGBA', 'BGR', 'BGRA'):
+    rgb = planes if mode in ('RGB', 'RGBA') else planes[..., 2::-1]
+    if color == 'RGB':
+      return rgb[..., :3]
+    if color == 'RGBA' and mode == 'RGBA':
+      return planes
+    if color == 'RGBA' and mode == 'BGRA':
+      ret = planes.copy()
+      ret[..., 0] = planes[..., 2]
+      ret[..., 2] = planes[..., 0]
+      return ret
+    raise ValueError(f'can not convert {mode} to {color}')
+  y, u, v = planes
+  if color == 'L':
+    return y[..., None]
+  if color == 'YCbCr':
+    return np.stack([y, _upsample(u), _upsample(v)], axis=-1)
+  if color != 'RGB':
+    raise ValueError(f'can not convert {mode} to {color}')
+  cb = u.astype('int32') - 128
+  cr = v.astype('int32') - 128
+  # chroma terms at chroma resolution: 1.402, 0.344136, 0.714136, 1.772
+  r = (91881 * cr + 32768) >> 16
+  g = (-22554 * cb - 46802 * cr + 32768) >> 16
+  b = (116130 * cb + 32768) >> 16
+  y = y.astype('int16')
+  return np.stack([np.clip(y + _upsample(c.astype('int16')), 0, 255)
+                   for c in (r, g, b)], axis=-1).astype('uint8')
+
+
 class RawFile(File):
   """For reading raw files. The file is lazy loaded, which means
   the file is opened but not loaded into memory at initialization.
@@ -227,6 +318,7 @@ class RawFile(File):
     self.pitch, self.channel_pitch = self._get_frame_pitch()
     super(RawFile, self).__init__(path, rewind)
     self._pair = None
+    self._maps = None
 
   def _get_frame_pitch(self):
     """Get bytes length of one frame.
@@ -272,35 +364,76 @@ class RawFile(File):
     Args:
         frames: number of frames to be loaded.
     """
-    if self.mode in ('YV12', 'YV21', 'NV12', 'NV21',):
-      ret = []
-      for _ in range(frames):
-        data = self.read(self.pitch)
-        ret.append(Image.frombytes('YCbCr', self._size, data, self.mode))
-      return ret
-    elif self.mode in ('RGB', 'RGBA'):
-      ret = []
-      for _ in range(frames):
-        data = self.read(self.pitch)
-        ret.append(Image.frombytes(self.mode, self._size, data))
-      return ret
-    elif self.mode in ('BGR',):
-      _image_mode = 'RGB'
-      ret = []
-      for _ in range(frames):
-        data = b''.join(
-            (self.read(3)[::-1] for _ in range(self.pitch // 3)))
-        ret.append(Image.frombytes('RGB', self._size, data))
-      return ret
-    elif self.mode in ('BGRA',):
-      ret = []
-      for _ in range(frames):
-        buf = bytes()
-        for _ in range(self.pitch // 4):
-          c = self.read(4)
-          buf.join((c[2::-1], c[3:]))
-        ret.append(Image.frombytes('RGBA', self._size, buf))
-      return ret
+    ret = []
+    for _ in range(frames):
+      data = np.frombuffer(self.read(self.pitch), 'uint8')
+      img = _raw_to_array(_raw_planes(data, self.mode, self._size), self.mode)
+      ret.append(Image.frombytes(
+          _RAW_IMAGE_MODE[self.mode], self._size, img.tobytes()))
+    return ret
+
+  def _get_frame_maps(self):
+    """Map every file of the node into memory once.
+
+    Return:
+        a list of uint8 `np.memmap` and the index of the first frame of each.
+    """
+    if self._maps is None:
+      maps, starts, frames = [], [], 0
+      files = self.file_
+      for i, file in enumerate(files):
+        length = self.length[file.name]
+        if length % self.pitch and i < len(files) - 1:
+          raise ValueError(
+              f"{file.name} is not a whole number of frames, frames of "
+              f"{self.name} can't be mapped.")
+        if length // self.pitch == 0:
+          continue
+        maps.append(np.memmap(file, 'uint8', 'r',
+                              shape=(length // self.pitch * self.pitch,)))
+        starts.append(frames)
+        frames += length // self.pitch
+      self._maps = maps, np.array(starts, 'int64')
+    return self._maps
+
+  def frame_view(self, index):
+    """Random access to the raw planes of frame `index`, without moving the
+    read pointer. The file is mapped at the first call, the planes are
+    read-only views of the mapping.
+
+    Args:
+        index: an int, negative values count from the end.
+
+    Return:
+        a tuple of (Y, U, V) planes for YUV modes, U and V in [H/2, W/2];
+        an array of [H, W, C] in file channel order for RGB modes.
+    """
+    frames = self.frames
+    if index < 0:
+      index += frames
+    if not 0 <= index < frames:
+      raise IndexError(f'frame {index} out of range of {frames} frames')
+    maps, starts = self._get_frame_maps()
+    i = int(np.searchsorted(starts, index, 'right')) - 1
+    offset = (index - int(starts[i])) * self.pitch
+    return _raw_planes(maps[i][offset:offset + self.pitch], self.mode,
+                       self._size)
+
+  def frame_array(self, index, color=None):
+    """Random access to frame `index` as an uint8 array of [H, W, C].
+
+    Args:
+        index: an int, negative values count from the end.
+        color: 'YCbCr', 'RGB' or 'L' for YUV modes, 'RGB' or 'RGBA' for RGB
+          modes. Default is the mode of the images `read_frame` returns.
+    """
+    return _raw_to_array(self.frame_view(index), self.mode, color)
+
+  def __getstate__(self):
+    # mappings are re-created lazily by copies, not copied
+    state = self.__dict__.copy()
+    state['_maps'] = None
+    return state
 
   def seek(self, offset, where=SEEK_SET):
     """Seek the position by `offset` relative to `where`.
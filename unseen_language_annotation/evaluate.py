@@ -0,0 +1,205 @@
+import argparse
+import os
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+
+import librosa
+import numpy as np
+import pandas as pd
+import torch
+from rapidfuzz.distance import Levenshtein
+
+from table_io import read_table, write_table
+
+SAMPLE_RATE = 16000
+METRICS = ['lang_prob', 'asr_text', 'cer', 'speech_rate_ref', 'speech_rate_gen', 'speed_diff', 'spk_sim', 'emo_sim']
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(
+        description="all metrics of the synthesized audio of a summary file in one pass: whisper language "
+                    "probability, ASR and CER, speech rate difference, speaker and emotion similarity"
+    )
+    parser.add_argument('--summary', required=True, help='s2st / tts / fr2it / it2it summary, .csv or .parquet')
+    parser.add_argument('--output', required=True, help='results table, .csv or .parquet')
+    parser.add_argument('--ref_col', default='Original Audio Path', help='column of the reference (prompt) audio')
+    parser.add_argument('--gen_col', default='Generated Audio Path', help='column of the synthesized audio')
+    parser.add_argument('--text_col', default='Text', help='column of the text the audio was synthesized from')
+    parser.add_argument('--language', default='it', help='language the probability is measured for')
+    parser.add_argument('--whisper_model', default='large-v3-turbo')
+    parser.add_argument('--emo_model', default='iic/emotion2vec_plus_large')
+    parser.add_argument('--hub', default='ms', help='"ms" for modelscope, "hf" for huggingface')
+    parser.add_argument('--weights', type=float, nargs=4, default=[1., 1., 1., 1.],
+                        help='weights of CER, speaker similarity, emotion similarity and speed difference '
+                             'in the weighted harmonic score')
+    parser.add_argument('--device', default='cuda:0' if torch.cuda.is_available() else 'cpu')
+    parser.add_argument('--batch_size', type=int, default=16, help='summary rows per batch')
+    parser.add_argument('--num_workers', type=int, default=8, help='processes decoding the audio')
+
+    return parser
+
+
+def load_clip(path):
+    """Decode a clip once, for all backends: 16kHz waveform and the Resemblyzer input."""
+    from resemblyzer import preprocess_wav
+    try:
+        wav, _ = librosa.load(path, sr=SAMPLE_RATE)
+    except Exception as e:
+        print("failed to load {}: {}".format(path, e))
+        return None
+    return wav.astype(np.float32), preprocess_wav(wav, source_sr=SAMPLE_RATE)
+
+
+def normalize_text(text):
+    text = unicodedata.normalize('NFKC', str(text)).lower()
+    return ''.join(c for c in text if not c.isspace() and not unicodedata.category(c).startswith('P'))
+
+
+def char_error_rate(ref, hyp):
+    ref, hyp = normalize_text(ref), normalize_text(hyp)
+    return Levenshtein.distance(ref, hyp) / max(len(ref), 1)
+
+
+def harmonic_score(df, weights):
+    """Weighted harmonic mean of the four metrics, each mapped to [0, 1] with 1 the best."""
+    terms = np.stack([
+        1 - np.clip(df['cer'].to_numpy(dtype=float), 0, 1),
+        np.clip(df['spk_sim'].to_numpy(dtype=float), 0, 1),
+        np.clip(df['emo_sim'].to_numpy(dtype=float), 0, 1),
+        1 - np.clip(df['speed_diff'].to_numpy(dtype=float), 0, 1),
+    ], axis=1)
+    weights = np.asarray(weights, dtype=float)
+    return weights.sum() / (weights / np.maximum(terms, 1e-6)).sum(axis=1)
+
+
+class Evaluator(object):
+    def __init__(self, args):
+        import whisper
+        from funasr import AutoModel
+        from resemblyzer import VoiceEncoder
+
+        self.args = args
+        self.device = args.device
+        self.whisper = whisper.load_model(args.whisper_model, device=args.device)
+        self.spk_encoder = VoiceEncoder(device=args.device)
+        self.emo_model = AutoModel(model=args.emo_model, hub=args.hub, device=args.device)
+
+    @torch.no_grad()
+    def analyze(self, clips):
+        """Language probabilities, transcript, speech rate and embeddings of decoded clips."""
+        import whisper
+
+        wavs = [wav for wav, _ in clips]
+        fp16 = self.device != 'cpu'
+        # language ID and transcription share the mel batch
+        mels = torch.stack([
+            whisper.log_mel_spectrogram(whisper.pad_or_trim(torch.from_numpy(wav)), self.whisper.dims.n_mels)
+            for wav in wavs
+        ]).to(self.device)
+        mels = mels.half() if fp16 else mels
+        _, lang_probs = self.whisper.detect_language(mels)
+        decoded = whisper.decode(self.whisper, mels, whisper.DecodingOptions(fp16=fp16))
+
+        emo = self.emo_model.generate(wavs, granularity='utterance', extract_embedding=True,
+                                      batch_size=len(wavs), disable_pbar=True)
+        infos = []
+        for (wav, spk_wav), probs, result, emo_result in zip(clips, lang_probs, decoded, emo):
+            text = result.text.strip()
+            emo_emb = np.asarray(emo_result['feats'], dtype=np.float32).reshape(-1)
+            infos.append({
+                'lang_prob': float(probs.get(self.args.language, 0.)),
+                'text': text,
+                'speech_rate': len(normalize_text(text)) / max(len(wav) / SAMPLE_RATE, 1e-3),
+                'spk': self.spk_encoder.embed_utterance(spk_wav),
+                'emo': emo_emb / max(np.linalg.norm(emo_emb), 1e-12),
+            })
+        return infos
+
+
+def score_rows(rows, ref_paths, gen_paths, texts, info):
+    """Metrics of summary rows from the analyzed clips, NaN where a clip failed to load."""
+    records = []
+    for row, ref_path, gen_path, text in zip(rows, ref_paths, gen_paths, texts):
+        ref, gen = info.get(ref_path), info.get(gen_path)
+        record = {'row': row, 'gen_path': gen_path}
+        if ref is None or gen is None:
+            record.update({m: np.nan for m in METRICS})
+        else:
+            record.update({
+                'lang_prob': gen['lang_prob'],
+                'asr_text': gen['text'],
+                'cer': char_error_rate(text, gen['text']),
+                'speech_rate_ref': ref['speech_rate'],
+                'speech_rate_gen': gen['speech_rate'],
+                'speed_diff': abs(gen['speech_rate'] - ref['speech_rate']) / max(ref['speech_rate'], 1e-6),
+                'spk_sim': float(np.dot(ref['spk'], gen['spk'])),
+                'emo_sim': float(np.dot(ref['emo'], gen['emo'])),
+            })
+        records.append(record)
+    return pd.DataFrame(records, columns=['row', 'gen_path'] + METRICS)
+
+
+def main():
+    parser = get_parser()
+    args = parser.parse_args()
+    print(args)
+
+    df = read_table(args.summary)
+    # rows are appended as they are scored, a rerun skips them
+    progress_file = args.output + '.progress.csv'
+    done = set()
+    if os.path.exists(progress_file):
+        progress = pd.read_csv(progress_file, usecols=['row', 'lang_prob'])
+        # rows whose audio failed to load are scored again
+        done = set(progress.dropna(subset=['lang_prob'])['row'].tolist())
+    todo = [i for i in range(len(df)) if i not in done]
+    print("{} rows, {} done, {} to score".format(len(df), len(done), len(todo)))
+
+    if todo:
+        evaluator = Evaluator(args)
+        ref_col, gen_col = df[args.ref_col].tolist(), df[args.gen_col].tolist()
+        text_col = df[args.text_col].tolist()
+        batches = [todo[i:i + args.batch_size] for i in range(0, len(todo), args.batch_size)]
+        # a prompt seeding many syntheses is decoded and analyzed once
+        ref_info, requested_refs = {}, set()
+
+        def submit(pool, batch):
+            paths = [gen_col[i] for i in batch]
+            for i in batch:
+                if ref_col[i] not in requested_refs:
+                    requested_refs.add(ref_col[i])
+                    paths.append(ref_col[i])
+            paths = list(dict.fromkeys(paths))
+            return paths, [pool.submit(load_clip, path) for path in paths]
+
+        with ProcessPoolExecutor(args.num_workers) as pool:
+            pending = submit(pool, batches[0])
+            for k, batch in enumerate(batches):
+                paths, futures = pending
+                # the next batch is decoded while this one runs on the models
+                if k + 1 < len(batches):
+                    pending = submit(pool, batches[k + 1])
+
+                clips = [(path, f.result()) for path, f in zip(paths, futures)]
+                clips = [(path, clip) for path, clip in clips if clip is not None]
+                info = {}
+                if clips:
+                    info = dict(zip([path for path, _ in clips], evaluator.analyze([clip for _, clip in clips])))
+                ref_info.update({path: info[path] for path in info if path in requested_refs})
+                info.update(ref_info)
+
+                records = score_rows(batch, [ref_col[i] for i in batch], [gen_col[i] for i in batch],
+                                     [text_col[i] for i in batch], info)
+                records.to_csv(progress_file, mode='a', header=not os.path.exists(progress_file), index=False)
+                print("scored {}/{} rows".format(min((k + 1) * args.batch_size, len(todo)), len(todo)))
+
+    results = pd.read_csv(progress_file).drop_duplicates('row', keep='last').set_index('row').sort_index()
+    results = results.drop(columns=['gen_path']).reindex(range(len(df)))
+    results['score'] = harmonic_score(results, args.weights)
+    df = df.drop(columns=[c for c in results.columns if c in df.columns])
+    write_table(pd.concat([df, results.set_index(df.index)], axis=1), args.output)
+    print("wrote {}".format(args.output))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+import argparse
+import time
+
+import numpy as np
+
+from subset_matching import match_subset, subset_loss
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(
+        description="subset_matching.match_subset against simulated annealing, on synthetic DNSMOS scores"
+    )
+    parser.add_argument('--num_candidates', type=int, default=300000)
+    parser.add_argument('--size', type=int, default=2000)
+    parser.add_argument('--anneal_steps', type=int, default=200000)
+    parser.add_argument('--seeds', type=int, nargs='+', default=[0, 1, 2])
+
+    return parser
+
+
+def synthetic_scores(num, shift, rng):
+    """Correlated OVRL, SIG, BAK scores, clipped to the DNSMOS range."""
+    base = rng.normal(0, 1, (num, 1))
+    noise = rng.normal(0, 1, (num, 3))
+    scores = np.array([2.9, 3.3, 3.7]) + shift + 0.35 * base + np.array([0.15, 0.2, 0.25]) * noise
+    return np.clip(scores, 1, 5)
+
+
+def simulated_annealing(values, target_values, size, steps, seed, temp=1e-2, cooling=0.99995):
+    """Random swaps accepted by the Metropolis rule, mean and variance recomputed per step."""
+    rng = np.random.default_rng(seed)
+    target_mean = target_values.mean(0)
+    target_var = target_values.var(0)
+    perm = rng.permutation(len(values))
+    sel_idx, unsel_idx = perm[:size].copy(), perm[size:].copy()
+
+    def loss_of(idx):
+        sub = values[idx]
+        return subset_loss(sub.sum(0), (sub ** 2).sum(0), size, target_mean, target_var)
+
+    loss = loss_of(sel_idx)
+    for _ in range(steps):
+        a, b = rng.integers(len(sel_idx)), rng.integers(len(unsel_idx))
+        sel_idx[a], unsel_idx[b] = unsel_idx[b], sel_idx[a]
+        new_loss = loss_of(sel_idx)
+        if new_loss < loss or rng.random() < np.exp((loss - new_loss) / temp):
+            loss = new_loss
+        else:
+            sel_idx[a], unsel_idx[b] = unsel_idx[b], sel_idx[a]
+        temp *= cooling
+    return np.sort(sel_idx)
+
+
+def report(name, values, idx, target_values, seconds):
+    sub = values[idx]
+    loss = subset_loss(sub.sum(0), (sub ** 2).sum(0), len(idx), target_values.mean(0), target_values.var(0))
+    print("{:>10}: {:8.2f}s, loss {:.3e}, mean err {}, var err {}".format(
+        name, seconds, loss,
+        np.array2string(np.abs(sub.mean(0) - target_values.mean(0)), precision=5),
+        np.array2string(np.abs(sub.var(0) - target_values.var(0)), precision=5)))
+
+
+def main():
+    parser = get_parser()
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(1234)
+    values = synthetic_scores(args.num_candidates, 0.0, rng)
+    target_values = synthetic_scores(args.size, 0.1, rng)
+    print("{} candidates, {} benchmark clips".format(args.num_candidates, args.size))
+
+    for seed in args.seeds:
+        beg = time.time()
+        idx = match_subset(values, target_values, args.size, seed=seed)
+        report('matching', values, idx, target_values, time.time() - beg)
+        again = match_subset(values, target_values, args.size, seed=seed)
+        assert np.array_equal(idx, again), "match_subset is not deterministic"
+
+        beg = time.time()
+        idx = simulated_annealing(values, target_values, args.size, args.anneal_steps, seed)
+        report('annealing', values, idx, target_values, time.time() - beg)
+
+
+if __name__ == '__main__':
+    main()
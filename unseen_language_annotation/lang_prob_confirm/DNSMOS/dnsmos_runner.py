@@ -0,0 +1,174 @@
+import argparse
+import csv
+import glob
+import os
+from multiprocessing import Pool
+
+import librosa
+import numpy as np
+import onnxruntime as ort
+
+SAMPLING_RATE = 16000
+INPUT_LENGTH = 9.01
+COLUMNS = ['filename', 'len_in_sec', 'sr', 'num_hops', 'OVRL_raw', 'SIG_raw', 'BAK_raw', 'OVRL', 'SIG', 'BAK', 'P808_MOS']
+AUDIO_EXTS = ('.wav', '.mp3', '.flac')
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(
+        description="DNSMOS scores of wav/mp3/flac files, decoded in memory and scored in worker processes; "
+                    "same output csv as dnsmos_local.py"
+    )
+    parser.add_argument('-t', '--testset_dir', default=None, help='directory searched recursively for audio')
+    parser.add_argument('--file_list', default=None, help='text file with one audio path per line, instead of -t')
+    parser.add_argument('-o', '--csv_path', required=True, help='output csv, appended to and resumed from')
+    parser.add_argument('-p', '--personalized_MOS', action='store_true', help='use the personalized DNSMOS model')
+    parser.add_argument('--primary_model', default=None,
+                        help='defaults to DNSMOS/sig_bak_ovr.onnx, or pDNSMOS/sig_bak_ovr.onnx with -p')
+    parser.add_argument('--p808_model', default='DNSMOS/model_v8.onnx')
+    parser.add_argument('--num_workers', type=int, default=8, help='processes, each with its own onnx sessions')
+    parser.add_argument('--num_threads', type=int, default=1, help='onnx intra-op threads per worker')
+    parser.add_argument('--batch_size', type=int, default=64, help='9.01s segments per onnx run')
+    parser.add_argument('--files_per_task', type=int, default=16, help='files decoded and batched together')
+
+    return parser
+
+
+def audio_melspec(audio, n_mels=120, frame_size=320, hop_length=160, sr=16000, to_db=True):
+    mel_spec = librosa.feature.melspectrogram(y=audio, sr=sr, n_fft=frame_size + 1, hop_length=hop_length, n_mels=n_mels)
+    if to_db:
+        mel_spec = (librosa.power_to_db(mel_spec, ref=np.max) + 40) / 40
+    return mel_spec.T
+
+
+def get_polyfit_val(sig, bak, ovr, is_personalized_MOS):
+    if is_personalized_MOS:
+        p_ovr = np.poly1d([-0.00533021, 0.005101, 1.18058466, -0.11236046])
+        p_sig = np.poly1d([-0.01019296, 0.02751166, 1.19576786, -0.24348726])
+        p_bak = np.poly1d([-0.04976499, 0.44276479, -0.1644611, 0.96883132])
+    else:
+        p_ovr = np.poly1d([-0.06766283, 1.11546468, 0.04602535])
+        p_sig = np.poly1d([-0.08397278, 1.22083953, 0.0052439])
+        p_bak = np.poly1d([-0.13166888, 1.60915514, -0.39604546])
+    return p_sig(sig), p_bak(bak), p_ovr(ovr)
+
+
+def segment(audio, fs=SAMPLING_RATE):
+    """The 9.01s segments of a clip, 1s apart, as cut by dnsmos_local.py."""
+    len_samples = int(INPUT_LENGTH * fs)
+    while len(audio) < len_samples:
+        audio = np.append(audio, audio)
+    num_hops = int(np.floor(len(audio) / fs) - INPUT_LENGTH) + 1
+    segments = [audio[int(idx * fs): int((idx + INPUT_LENGTH) * fs)] for idx in range(num_hops)]
+    return [seg for seg in segments if len(seg) >= len_samples], num_hops
+
+
+class DNSMOSWorker(object):
+    """The onnx sessions of one worker process."""
+
+    def __init__(self, primary_model, p808_model, personalized, num_threads, batch_size):
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = num_threads
+        options.inter_op_num_threads = 1
+        self.onnx_sess = ort.InferenceSession(primary_model, options, providers=['CPUExecutionProvider'])
+        self.p808_onnx_sess = ort.InferenceSession(p808_model, options, providers=['CPUExecutionProvider'])
+        self.personalized = personalized
+        # models exported with a fixed batch dimension run one segment at a time
+        batch_dims = [sess.get_inputs()[0].shape[0] for sess in (self.onnx_sess, self.p808_onnx_sess)]
+        self.batch_size = batch_size if all(not isinstance(d, int) for d in batch_dims) else 1
+
+    def run(self, segments):
+        """Raw SIG, BAK, OVRL [N, 3] and P808 [N] of equal length segments."""
+        mos, p808 = [], []
+        for st in range(0, len(segments), self.batch_size):
+            batch = np.stack(segments[st:st + self.batch_size]).astype('float32')
+            p808_batch = np.stack([audio_melspec(seg[:-160]) for seg in batch]).astype('float32')
+            mos.append(self.onnx_sess.run(None, {'input_1': batch})[0].reshape(len(batch), 3))
+            p808.append(self.p808_onnx_sess.run(None, {'input_1': p808_batch})[0].reshape(len(batch)))
+        return np.concatenate(mos), np.concatenate(p808)
+
+    def score_files(self, paths):
+        rows, clips = [], []
+        for path in paths:
+            try:
+                # mp3 is decoded in memory, no wav staging
+                audio, _ = librosa.load(path, sr=SAMPLING_RATE)
+            except Exception as e:
+                print("failed to load {}: {}".format(path, e))
+                continue
+            segments, num_hops = segment(audio)
+            clips.append((path, len(audio), num_hops, segments))
+
+        all_segments = [seg for clip in clips for seg in clip[3]]
+        if not all_segments:
+            return rows
+        mos, p808 = self.run(all_segments)
+
+        st = 0
+        for path, length, num_hops, segments in clips:
+            sig_raw, bak_raw, ovr_raw = mos[st:st + len(segments)].T
+            sig, bak, ovr = get_polyfit_val(sig_raw, bak_raw, ovr_raw, self.personalized)
+            rows.append({
+                'filename': path, 'len_in_sec': length / SAMPLING_RATE, 'sr': SAMPLING_RATE, 'num_hops': num_hops,
+                'OVRL_raw': np.mean(ovr_raw), 'SIG_raw': np.mean(sig_raw), 'BAK_raw': np.mean(bak_raw),
+                'OVRL': np.mean(ovr), 'SIG': np.mean(sig), 'BAK': np.mean(bak),
+                'P808_MOS': np.mean(p808[st:st + len(segments)]),
+            })
+            st += len(segments)
+        return rows
+
+
+_worker = None
+
+
+def init_worker(*args):
+    global _worker
+    _worker = DNSMOSWorker(*args)
+
+
+def score_files(paths):
+    return _worker.score_files(paths)
+
+
+def list_audio(args):
+    if args.file_list is not None:
+        with open(args.file_list) as f:
+            return [line.strip() for line in f if line.strip()]
+    paths = glob.glob(os.path.join(args.testset_dir, '**', '*'), recursive=True)
+    return sorted(p for p in paths if p.lower().endswith(AUDIO_EXTS))
+
+
+def main():
+    parser = get_parser()
+    args = parser.parse_args()
+    print(args)
+    assert (args.testset_dir is None) != (args.file_list is None), "Give one of -t and --file_list"
+    if args.primary_model is None:
+        args.primary_model = 'pDNSMOS/sig_bak_ovr.onnx' if args.personalized_MOS else 'DNSMOS/sig_bak_ovr.onnx'
+
+    paths = list_audio(args)
+    done = set()
+    if os.path.exists(args.csv_path):
+        with open(args.csv_path, newline='') as f:
+            done = set(row['filename'] for row in csv.DictReader(f))
+    todo = [p for p in paths if p not in done]
+    print("{} files, {} scored, {} to score".format(len(paths), len(done), len(todo)))
+
+    tasks = [todo[i:i + args.files_per_task] for i in range(0, len(todo), args.files_per_task)]
+    init_args = (args.primary_model, args.p808_model, args.personalized_MOS, args.num_threads, args.batch_size)
+    write_header = not os.path.exists(args.csv_path) or os.path.getsize(args.csv_path) == 0
+    with open(args.csv_path, 'a', newline='') as f, Pool(args.num_workers, init_worker, init_args) as pool:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS)
+        if write_header:
+            writer.writeheader()
+        num_scored = 0
+        for rows in pool.imap_unordered(score_files, tasks):
+            writer.writerows(rows)
+            # flushed per task, so an interrupted run resumes from the scored files
+            f.flush()
+            num_scored += len(rows)
+            print("scored {}/{} files".format(num_scored, len(todo)))
+
+
+if __name__ == '__main__':
+    main()
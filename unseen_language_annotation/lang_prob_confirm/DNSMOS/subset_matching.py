@@ -0,0 +1,128 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(
+        description="select the candidate clips whose DNSMOS mean and variance match a benchmark set"
+    )
+    parser.add_argument('--benchmark', required=True, help='DNSMOS csv of the benchmark (French) clips')
+    parser.add_argument('--candidates', required=True, help='DNSMOS csv of the clips to select from')
+    parser.add_argument('--output', required=True, help='csv of the selected candidate rows')
+    parser.add_argument('--axes', nargs='+', default=['OVRL', 'SIG', 'BAK'], help='DNSMOS columns to match')
+    parser.add_argument('--size', type=int, default=None, help='clips to select, defaults to the benchmark size')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max_iters', type=int, default=20000, help='max swap rounds')
+
+    return parser
+
+
+def subset_loss(sum1, sum2, size, target_mean, target_var):
+    """Squared relative errors of the mean and variance of every axis, summed over the axes.
+
+    sum1 and sum2 are the sums of the values and squared values of the subset, [..., K].
+    """
+    mean = sum1 / size
+    var = sum2 / size - mean ** 2
+    mean_err = (mean - target_mean) / np.sqrt(target_var)
+    var_err = (var - target_var) / target_var
+    return (mean_err ** 2 + var_err ** 2).sum(-1)
+
+
+def quantile_init(values, target_values, size):
+    """Distinct candidates nearest to `size` quantiles of the target, in O(N log N).
+
+    values: [N] candidate values, target_values: [M] benchmark values on the same axis.
+    """
+    order = np.argsort(values, kind='stable')
+    sorted_values = values[order]
+    targets = np.quantile(target_values, (np.arange(size) + 0.5) / size)
+    idx = np.searchsorted(sorted_values, targets)
+    # the nearer of the two neighbours
+    left = np.clip(idx - 1, 0, len(values) - 1)
+    right = np.clip(idx, 0, len(values) - 1)
+    idx = np.where(np.abs(sorted_values[left] - targets) <= np.abs(sorted_values[right] - targets), left, right)
+    # strictly increasing positions, so every quantile gets its own candidate
+    rank = np.arange(size)
+    idx = np.minimum(np.maximum.accumulate(idx - rank) + rank, len(values) - size + rank)
+    return order[idx]
+
+
+def match_subset(values, target_values, size, seed=0, init_axis=0, max_iters=20000,
+                 num_out=64, num_in=2048, patience=50, tol=1e-10):
+    """Indices of `size` rows of values whose per-axis mean and variance match target_values.
+
+    values: [N, K] candidate scores, target_values: [M, K] benchmark scores. The subset is
+    initialized by quantile matching on init_axis and refined by swaps: every round, the
+    best of num_out x num_in random (selected, unselected) pairs is swapped if it lowers
+    the loss. The loss of a swap only needs the running sums, so a round is one vectorized
+    [num_out, num_in, K] evaluation. Deterministic for a given seed.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    target_values = np.asarray(target_values, dtype=np.float64)
+    if values.ndim == 1:
+        values, target_values = values[:, None], target_values[:, None]
+    num = len(values)
+    assert size <= num, "cannot select {} of {} candidates".format(size, num)
+    rng = np.random.default_rng(seed)
+    target_mean = target_values.mean(0)
+    target_var = np.maximum(target_values.var(0), 1e-12)
+
+    selected = np.zeros(num, dtype=bool)
+    selected[quantile_init(values[:, init_axis], target_values[:, init_axis], size)] = True
+    sel_idx = np.flatnonzero(selected)
+    unsel_idx = np.flatnonzero(~selected)
+    squares = values ** 2
+    sum1 = values[sel_idx].sum(0)
+    sum2 = squares[sel_idx].sum(0)
+    loss = subset_loss(sum1, sum2, size, target_mean, target_var)
+
+    stale = 0
+    for _ in range(max_iters):
+        if loss < tol or stale >= patience or len(unsel_idx) == 0:
+            break
+        out_pos = rng.choice(len(sel_idx), min(num_out, len(sel_idx)), replace=False)
+        in_pos = rng.choice(len(unsel_idx), min(num_in, len(unsel_idx)), replace=False)
+        i, j = sel_idx[out_pos], unsel_idx[in_pos]
+        new_sum1 = sum1 + values[j][None, :, :] - values[i][:, None, :]
+        new_sum2 = sum2 + squares[j][None, :, :] - squares[i][:, None, :]
+        new_loss = subset_loss(new_sum1, new_sum2, size, target_mean, target_var)
+        best = np.unravel_index(np.argmin(new_loss), new_loss.shape)
+        if new_loss[best] >= loss:
+            stale += 1
+            continue
+        stale = 0
+        a, b = out_pos[best[0]], in_pos[best[1]]
+        sum1, sum2, loss = new_sum1[best], new_sum2[best], new_loss[best]
+        sel_idx[a], unsel_idx[b] = unsel_idx[b], sel_idx[a]
+
+    return np.sort(sel_idx)
+
+
+def main():
+    parser = get_parser()
+    args = parser.parse_args()
+    print(args)
+
+    benchmark = pd.read_csv(args.benchmark)
+    candidates = pd.read_csv(args.candidates)
+    size = args.size or len(benchmark)
+
+    beg = time.time()
+    idx = match_subset(candidates[args.axes].to_numpy(), benchmark[args.axes].to_numpy(), size,
+                       seed=args.seed, max_iters=args.max_iters)
+    print("selected {} of {} clips in {:.2f}s".format(size, len(candidates), time.time() - beg))
+
+    selected = candidates.iloc[idx]
+    for axis in args.axes:
+        print("{}: benchmark mean {:.4f} var {:.4f}, selected mean {:.4f} var {:.4f}".format(
+            axis, benchmark[axis].mean(), benchmark[axis].var(ddof=0),
+            selected[axis].mean(), selected[axis].var(ddof=0)))
+    selected.to_csv(args.output, index=False)
+
+
+if __name__ == '__main__':
+    main()
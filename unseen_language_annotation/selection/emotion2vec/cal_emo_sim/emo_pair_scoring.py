@@ -0,0 +1,139 @@
+import argparse
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from table_io import read_table, write_table
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(
+        description="emotion2vec similarity of every (reference, synthesized) audio pair of a summary file, "
+                    "written straight into the summary"
+    )
+    parser.add_argument('--summary', required=True, help='fr2it / it2it summary, .csv or .parquet')
+    parser.add_argument('--output', default=None, help='.csv or .parquet, defaults to overwriting --summary')
+    parser.add_argument('--ref_col', default='Original Audio Path', help='column of the reference (prompt) audio')
+    parser.add_argument('--gen_col', default='Generated Audio Path', help='column of the synthesized audio')
+    parser.add_argument('--score_col', default='Emotion Similarity', help='column the similarities are written to')
+    parser.add_argument('--model', default='iic/emotion2vec_plus_large')
+    parser.add_argument('--hub', default='ms', help='"ms" for modelscope, "hf" for huggingface')
+    parser.add_argument('--device', default='cuda:0')
+    parser.add_argument('--cache_dir', default='./emo_cache', help='embeddings on disk, keyed by audio content hash')
+    parser.add_argument('--batch_size', type=int, default=32, help='unique clips per model call')
+    parser.add_argument('--num_workers', type=int, default=8, help='threads hashing the audio files')
+
+    return parser
+
+
+def file_hash(path, chunk_size=1 << 20):
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(chunk_size), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+class EmbeddingCache(object):
+    """Utterance embeddings of one model, one .npy per audio content hash."""
+
+    def __init__(self, cache_dir, model_id):
+        self.cache_dir = os.path.join(cache_dir, model_id.replace('/', '_'))
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + '.npy')
+
+    def get(self, key):
+        path = self.path(key)
+        return np.load(path) if os.path.exists(path) else None
+
+    def put(self, key, emb):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + '.%d.tmp' % os.getpid()
+        with open(tmp_path, 'wb') as f:
+            np.save(f, emb)
+        # renamed into place, so concurrent runs never read a partial file
+        os.replace(tmp_path, path)
+
+
+def embed_unique(paths, load_model, cache, batch_size=32, num_workers=8):
+    """Embeddings [len(paths), D] of unique audio paths, each audio content embedded once.
+
+    The model is only loaded (by calling load_model) when some audio is not in the cache.
+    """
+    with ThreadPoolExecutor(num_workers) as pool:
+        hashes = list(pool.map(file_hash, paths))
+
+    first_path = {}
+    for path, key in zip(paths, hashes):
+        first_path.setdefault(key, path)
+
+    embs, todo = {}, []
+    for key in first_path:
+        emb = cache.get(key)
+        if emb is None:
+            todo.append(key)
+        else:
+            embs[key] = emb
+    print("{} files, {} unique audios, {} to embed".format(len(paths), len(first_path), len(todo)))
+
+    if todo:
+        model = load_model()
+        for st in range(0, len(todo), batch_size):
+            batch = todo[st:st + batch_size]
+            res = model.generate([first_path[key] for key in batch], granularity='utterance',
+                                 extract_embedding=True, batch_size=len(batch), disable_pbar=True)
+            for key, r in zip(batch, res):
+                emb = np.asarray(r['feats'], dtype=np.float32).reshape(-1)
+                cache.put(key, emb)
+                embs[key] = emb
+
+    return np.stack([embs[key] for key in hashes])
+
+
+def pair_cosine(embs, ref_idx, gen_idx):
+    """Cosine similarity of the rows ref_idx and gen_idx of embs, for all pairs at once."""
+    embs = embs / np.maximum(np.linalg.norm(embs, axis=1, keepdims=True), 1e-12)
+    return np.einsum('ij,ij->i', embs[ref_idx], embs[gen_idx])
+
+
+def main():
+    parser = get_parser()
+    args = parser.parse_args()
+    print(args)
+
+    df = read_table(args.summary)
+    ref_paths, gen_paths = df[args.ref_col], df[args.gen_col]
+    valid = np.array([
+        isinstance(r, str) and isinstance(g, str) and os.path.exists(r) and os.path.exists(g)
+        for r, g in zip(ref_paths, gen_paths)
+    ], dtype=bool)
+    print("{} pairs, {} skipped for missing audio".format(len(df), int((~valid).sum())))
+
+    # a prompt seeding many syntheses is embedded once
+    paths = list(dict.fromkeys(list(ref_paths[valid]) + list(gen_paths[valid])))
+    path_idx = {path: i for i, path in enumerate(paths)}
+
+    def load_model():
+        from funasr import AutoModel
+        return AutoModel(model=args.model, hub=args.hub, device=args.device)
+
+    scores = np.full(len(df), np.nan, dtype=np.float32)
+    if paths:
+        cache = EmbeddingCache(args.cache_dir, args.model)
+        embs = embed_unique(paths, load_model, cache, args.batch_size, args.num_workers)
+        ref_idx = np.array([path_idx[p] for p in ref_paths[valid]], dtype=np.int64)
+        gen_idx = np.array([path_idx[p] for p in gen_paths[valid]], dtype=np.int64)
+        scores[valid] = pair_cosine(embs, ref_idx, gen_idx)
+
+    df[args.score_col] = scores
+    output = args.output or args.summary
+    write_table(df, output)
+    print("wrote {} to {}, mean {:.4f}".format(args.score_col, output, float(np.nanmean(scores)) if valid.any() else float('nan')))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,18 @@
+"""Reading and writing the summary tables (.csv or .parquet) shared by the scoring scripts."""
+import os
+
+import pandas as pd
+
+
+def read_table(path):
+    return pd.read_parquet(path) if path.endswith('.parquet') else pd.read_csv(path)
+
+
+def write_table(df, path):
+    """Write through a temporary file, so an interrupted run never leaves a truncated table."""
+    tmp_path = path + '.tmp'
+    if path.endswith('.parquet'):
+        df.to_parquet(tmp_path, index=False)
+    else:
+        df.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)